@@ -0,0 +1 @@
+"""Benchmark utilities for TH-RAG."""
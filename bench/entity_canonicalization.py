@@ -0,0 +1,272 @@
+"""Graph, index-size, and latency report for entity canonicalization.
+
+The entity labels of a dataset's extracted graph JSON (or of a synthetic graph
+in which a share of the labels is replaced by case, punctuation, and article
+variants) are clustered with ``index.entity_canonicalization``. The graph is
+then built twice, as extracted and with the canonical labels, and for each
+build the report records node and edge counts, GEXF, index, and payload sizes,
+graph load time, and the latency of unfiltered and subtopic-filtered edge
+searches over the same queries.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+
+import argparse
+import json
+import random
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any
+
+from bench.scaling import git_revision
+from bench.synthetic_graph import SyntheticGraphSpec, iter_synthetic_blocks
+from config import get_config
+from index.edge_embedding import EdgeEmbedderFAISS
+from index.embedders import Embedder, HashingEmbedder, create_embedder
+from index.entity_canonicalization import canonicalize_entries
+from index.json_to_gexf import GraphAccumulator, block_entries, clean_id, load_entries, write_graph
+from utils.tracing import summarize_latencies
+
+LABEL_VARIANTS = (
+    lambda label: label.upper(),
+    lambda label: f"{label}.",
+    lambda label: f"The {label}",
+    lambda label: label.replace(" ", "-"),
+)
+
+
+def synthetic_entries(triples: int, variant_rate: float, seed: int) -> list[dict[str, Any]]:
+    """Synthetic triples with ``variant_rate`` of the entity mentions rewritten as label variants."""
+
+    rng = random.Random(seed)
+    entries: list[dict[str, Any]] = []
+    for block in iter_synthetic_blocks(SyntheticGraphSpec(triples=triples, seed=seed)):
+        for entry in block_entries(block):
+            subject, predicate, object_ = entry["triple"]
+            if rng.random() < variant_rate:
+                subject = rng.choice(LABEL_VARIANTS)(subject)
+            if rng.random() < variant_rate:
+                object_ = rng.choice(LABEL_VARIANTS)(object_)
+            entries.append({**entry, "triple": [subject, predicate, object_]})
+    return entries
+
+
+def measure_build(
+    name: str,
+    entries: list[dict[str, Any]],
+    aliases: dict[str, str],
+    queries: list[dict[str, Any]],
+    embedder: Embedder,
+    work_dir: Path,
+    *,
+    top_k: int,
+    max_workers: int,
+) -> dict[str, Any]:
+    accumulator = GraphAccumulator({"entity": aliases})
+    for entry in entries:
+        accumulator.add(entry)
+    graph = accumulator.finish()
+    gexf_path, index_path, payload_path = (work_dir / f"{name}{suffix}" for suffix in (".gexf", ".faiss", ".npy"))
+    write_graph(graph, gexf_path)
+
+    started = time.perf_counter()
+    searcher = EdgeEmbedderFAISS(
+        gexf_path=str(gexf_path),
+        embedding_model="",
+        openai_api_key=None,
+        index_path=str(index_path),
+        payload_path=str(payload_path),
+        embedder=embedder,
+    )
+    load_seconds = time.perf_counter() - started
+    searcher.build_index(max_workers=max_workers)
+
+    unfiltered: list[float] = []
+    filtered: list[float] = []
+    filter_sizes: list[int] = []
+    for query in queries:
+        label = aliases.get(query["subject"], query["subject"])
+        subtopic_id = next(
+            (
+                neighbor
+                for neighbor in graph.neighbors(f"entity_{clean_id(label)}")
+                if graph.nodes[neighbor].get("type") == "subtopic"
+            ),
+            None,
+        )
+        entity_filter = {
+            neighbor
+            for neighbor in (graph.neighbors(subtopic_id) if subtopic_id else ())
+            if graph.nodes[neighbor].get("type") == "entity"
+        }
+        filter_sizes.append(len(entity_filter))
+
+        started = time.perf_counter()
+        searcher.search(query["text"], top_k=top_k)
+        unfiltered.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        searcher.search(query["text"], top_k=top_k, filter_entities=entity_filter or None)
+        filtered.append(time.perf_counter() - started)
+
+    return {
+        "nodes": graph.number_of_nodes(),
+        "edges": graph.number_of_edges(),
+        "index_vectors": int(searcher.index.ntotal),
+        "gexf_bytes": gexf_path.stat().st_size,
+        "index_bytes": index_path.stat().st_size,
+        "payload_bytes": payload_path.stat().st_size,
+        "graph_load_seconds": load_seconds,
+        "mean_filter_entities": sum(filter_sizes) / len(filter_sizes) if filter_sizes else 0.0,
+        "search_unfiltered": summarize_latencies(unfiltered),
+        "search_filtered": summarize_latencies(filtered),
+    }
+
+
+def run_report(
+    entries: list[dict[str, Any]],
+    embedder: Embedder,
+    *,
+    queries: int,
+    top_k: int,
+    max_workers: int,
+    seed: int,
+    work_dir: Path | None = None,
+    **options: Any,
+) -> dict[str, Any]:
+    if not entries:
+        raise ValueError("No valid triples to canonicalize.")
+    result = canonicalize_entries(entries, embedder, max_workers=max_workers, **options)
+    sampled = random.Random(seed).sample(entries, min(queries, len(entries)))
+    query_set = [
+        {
+            "text": str(entry.get("sentence") or " ".join(map(str, entry["triple"]))),
+            "subject": str(entry["triple"][0]).strip(),
+        }
+        for entry in sampled
+    ]
+
+    builds: dict[str, Any] = {}
+    with tempfile.TemporaryDirectory(dir=work_dir) as temp_dir:
+        for name, aliases in (("original", {}), ("canonical", result["aliases"])):
+            print(f"Building the {name} graph and index")
+            builds[name] = measure_build(
+                name,
+                entries,
+                aliases,
+                query_set,
+                embedder,
+                Path(temp_dir),
+                top_k=top_k,
+                max_workers=max_workers,
+            )
+
+    original, canonical = builds["original"], builds["canonical"]
+    change = {
+        key: canonical[key] / original[key] - 1 if original[key] else 0.0
+        for key in ("nodes", "edges", "index_vectors", "gexf_bytes", "index_bytes", "payload_bytes")
+    }
+    for search in ("search_unfiltered", "search_filtered"):
+        change[f"{search}_p50"] = (
+            canonical[search]["p50"] / original[search]["p50"] - 1 if original[search]["p50"] else 0.0
+        )
+    return {
+        "embedder": embedder.identity(),
+        "canonicalization": result["report"],
+        "largest_clusters": result["clusters"][:20],
+        "queries": len(query_set),
+        "top_k": top_k,
+        "builds": builds,
+        "change": change,
+    }
+
+
+def print_table(report: dict[str, Any]) -> None:
+    original, canonical = report["builds"]["original"], report["builds"]["canonical"]
+    rows = [
+        ("nodes", "nodes", "{:.0f}"),
+        ("edges", "edges", "{:.0f}"),
+        ("index vectors", "index_vectors", "{:.0f}"),
+        ("index MB", "index_bytes", "{:.2f}"),
+        ("payload MB", "payload_bytes", "{:.2f}"),
+        ("GEXF MB", "gexf_bytes", "{:.2f}"),
+    ]
+    print(f"{'':<24}{'original':>12}{'canonical':>12}{'change':>10}")
+    for title, key, number in rows:
+        scale = 1e6 if key.endswith("_bytes") else 1
+        print(
+            f"{title:<24}{number.format(original[key] / scale):>12}{number.format(canonical[key] / scale):>12}"
+            f"{report['change'][key]:>10.1%}"
+        )
+    for title, key in (("search p50 ms", "search_unfiltered"), ("filtered search p50 ms", "search_filtered")):
+        print(
+            f"{title:<24}{original[key]['p50'] * 1000:>12.3f}{canonical[key]['p50'] * 1000:>12.3f}"
+            f"{report['change'][key + '_p50']:>10.1%}"
+        )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Measure the graph, index, and latency effect of entity canonicalization."
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dataset", help="Use the extracted graph JSON of a dataset and its configured embedder")
+    source.add_argument("--synthetic", type=int, help="Use this many synthetic triples with the hashing embedder")
+    parser.add_argument("--variant-rate", type=float, default=0.3, help="Share of synthetic entity mentions rewritten")
+    parser.add_argument("--queries", type=int, default=200, help="Edge searches per build")
+    parser.add_argument("--top-k", type=int, default=10, help="Results per search")
+    parser.add_argument("--max-workers", type=int, default=4, help="Embedding worker threads")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for variants and queries")
+    parser.add_argument(
+        "--output", help="Report path (default: results/benchmarks/entity_canonicalization_<source>.json)"
+    )
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    config = get_config(args.dataset) if args.dataset else get_config()
+    if args.dataset:
+        entries = load_entries(config.get_graph_json_file())
+        embedder = create_embedder(config)
+        source_name = args.dataset
+    else:
+        entries = synthetic_entries(args.synthetic, args.variant_rate, args.seed)
+        embedder = HashingEmbedder(dim=config.hashing_embed_dim)
+        source_name = f"synthetic{args.synthetic}"
+
+    report = run_report(
+        entries,
+        embedder,
+        queries=args.queries,
+        top_k=args.top_k,
+        max_workers=args.max_workers,
+        seed=args.seed,
+        string_threshold=config.canonical_string_threshold,
+        embed_threshold=config.canonical_embed_threshold,
+        max_block_size=config.canonical_max_block_size,
+    )
+    report.update(
+        {
+            "benchmark": "entity_canonicalization",
+            "source": source_name,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+        }
+    )
+    output_path = (
+        Path(args.output) if args.output else config.get_benchmark_file(f"entity_canonicalization_{source_name}")
+    )
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with output_path.open("w", encoding="utf-8") as handle:
+        json.dump(report, handle, indent=2)
+    print_table(report)
+    print(f"Entity canonicalization report written to {output_path}")
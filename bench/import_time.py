@@ -0,0 +1,146 @@
+"""Import-time benchmark for the TH-RAG command-line entry points.
+
+Each entry-point module is imported in a fresh interpreter with
+``python -X importtime`` several times. The report records the fastest
+cumulative import time of the module (interpreter start-up and ``site`` are not
+included) and its slowest direct imports, and compares it against a per-module
+target so regressions such as a heavy library imported at module level show up.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+
+import argparse
+import json
+import platform
+import re
+import subprocess
+from datetime import datetime, timezone
+from typing import Any
+
+from bench.scaling import git_revision
+from config import get_config
+
+# Entry-point modules and their import-time targets in milliseconds.
+ENTRY_POINT_TARGETS_MS = {
+    "config": 50,
+    "pipeline": 100,
+    "index.build_graph": 100,
+    "index.graph_construction": 250,
+    "index.edge_embedding": 250,
+    "generate.answer_generation_short": 350,
+    "generate.answer_generation_long": 350,
+    "generate.server": 350,
+    "evaluate.judge_F1": 100,
+    "evaluate.judge_Ultradomain": 200,
+}
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def parse_importtime(stderr: str, module: str) -> dict[str, Any]:
+    """Cumulative microseconds of ``module`` and of each of its direct imports."""
+
+    children: list[tuple[str, int]] = []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match is None:
+            continue
+        cumulative, depth, name = int(match.group(2)), (len(match.group(3)) - 1) // 2, match.group(4)
+        if depth == 0:
+            if name == module:
+                return {"cumulative_us": cumulative, "children": children}
+            children = []
+        elif depth == 1:
+            children.append((name, cumulative))
+    raise ValueError(f"{module} does not appear in the -X importtime output")
+
+
+def measure_import(module: str, repeats: int) -> dict[str, Any]:
+    runs: list[dict[str, Any]] = []
+    for _ in range(repeats):
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=PROJECT_ROOT,
+            capture_output=True,
+            text=True,
+        )
+        if completed.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+        runs.append(parse_importtime(completed.stderr, module))
+
+    fastest = min(runs, key=lambda run: run["cumulative_us"])
+    slowest_children = sorted(fastest["children"], key=lambda child: child[1], reverse=True)[:5]
+    return {
+        "module": module,
+        "import_ms": fastest["cumulative_us"] / 1000,
+        "runs_ms": [run["cumulative_us"] / 1000 for run in runs],
+        "slowest_imports_ms": {name: cumulative / 1000 for name, cumulative in slowest_children},
+    }
+
+
+def run_benchmark(modules: dict[str, float], output_path: Path, *, repeats: int = 5) -> dict[str, Any]:
+    results = []
+    for module, target_ms in modules.items():
+        print(f"Measuring import time of {module}")
+        result = measure_import(module, repeats)
+        result["target_ms"] = target_ms
+        result["within_target"] = result["import_ms"] <= target_ms
+        results.append(result)
+
+    report = {
+        "benchmark": "import_time",
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {"repeats": repeats},
+        "modules": results,
+    }
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with output_path.open("w", encoding="utf-8") as handle:
+        json.dump(report, handle, indent=2)
+
+    print(f"{'module':<36}{'import ms':>11}{'target ms':>11}  slowest import")
+    for result in results:
+        slowest = next(iter(result["slowest_imports_ms"].items()), ("-", 0.0))
+        flag = "" if result["within_target"] else "  OVER TARGET"
+        print(
+            f"{result['module']:<36}{result['import_ms']:>11.1f}{result['target_ms']:>11.0f}"
+            f"  {slowest[0]} ({slowest[1]:.1f} ms){flag}"
+        )
+    print(f"Import-time report written to {output_path}")
+    return report
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Measure import time of the TH-RAG command-line entry points.")
+    parser.add_argument("--modules", nargs="+", help="Modules to measure (default: every entry point)")
+    parser.add_argument("--repeats", type=int, default=5, help="Fresh interpreters per module; the fastest counts")
+    parser.add_argument("--output", help="Report path (default: results/benchmarks/import_time_<timestamp>.json)")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 if a module is over its target")
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    default_name = f"import_time_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    modules = (
+        {module: ENTRY_POINT_TARGETS_MS.get(module, 250) for module in args.modules}
+        if args.modules
+        else ENTRY_POINT_TARGETS_MS
+    )
+    report = run_benchmark(
+        modules,
+        Path(args.output) if args.output else get_config().get_benchmark_file(default_name),
+        repeats=args.repeats,
+    )
+    if args.check and not all(result["within_target"] for result in report["modules"]):
+        raise SystemExit(1)
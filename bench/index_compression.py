@@ -0,0 +1,228 @@
+"""Recall-versus-memory report for reduced-dimension and quantized edge indexes.
+
+Edge sentences are embedded once at full precision. A held-out sample of those
+sentences (plus, for real datasets, the questions in ``qa.json``) is used as the
+query set, and every storage option is scored by recall@k against exact
+full-precision inner-product search together with its serialized index size and
+search latency.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timezone
+from typing import Any
+
+import faiss
+import numpy as np
+
+from bench.scaling import git_revision
+from bench.synthetic_graph import SyntheticGraphSpec, iter_synthetic_blocks
+from config import get_config
+from index.edge_embedding import built_index_storage, create_faiss_index
+from index.embedders import Embedder, HashingEmbedder, create_embedder, normalize_rows
+
+
+def load_dataset_sentences(dataset_name: str) -> tuple[list[str], list[str]]:
+    """Return edge sentences and qa.json questions for a built dataset."""
+
+    config = get_config(dataset_name)
+    payload_path = config.get_edge_payload_file()
+    if payload_path.exists():
+        payloads = np.load(payload_path, allow_pickle=True).tolist()
+        sentences = [str(item["sentence"]) for item in payloads]
+    else:
+        with config.get_graph_json_file().open("r", encoding="utf-8") as handle:
+            blocks = json.load(handle)
+        sentences = list(
+            dict.fromkeys(
+                str(item.get("sentence", "")).strip()
+                for block in blocks
+                for item in block.get("triples", [])
+                if str(item.get("sentence", "")).strip()
+            )
+        )
+
+    questions: list[str] = []
+    qa_path = config.get_questions_file()
+    if qa_path.exists():
+        with qa_path.open("r", encoding="utf-8") as handle:
+            questions = [str(item["query"]) for item in json.load(handle) if isinstance(item, dict) and "query" in item]
+    return sentences, questions
+
+
+def synthetic_sentences(triples: int, seed: int) -> list[str]:
+    return [
+        item["sentence"]
+        for block in iter_synthetic_blocks(SyntheticGraphSpec(triples=triples, seed=seed))
+        for item in block["triples"]
+    ]
+
+
+def storage_options(dim: int, dims: list[int], pq_ms: list[int]) -> list[dict[str, Any]]:
+    options: list[dict[str, Any]] = [
+        {"name": "flat", "dim": dim, "storage": "flat"},
+        {"name": "fp16", "dim": dim, "storage": "fp16"},
+        {"name": "sq8", "dim": dim, "storage": "sq8"},
+    ]
+    options.extend(
+        {"name": f"pq{m}", "dim": dim, "storage": "pq", "pq_m": m}
+        for m in pq_ms
+        if dim % m == 0
+    )
+    for reduced in dims:
+        if 0 < reduced < dim:
+            options.append({"name": f"truncate{reduced}-flat", "dim": reduced, "storage": "flat"})
+            options.append({"name": f"truncate{reduced}-sq8", "dim": reduced, "storage": "sq8"})
+    return options
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = [len(set(row_found[row_found >= 0]) & set(row_truth)) for row_found, row_truth in zip(found, truth, strict=False)]
+    return float(np.mean(hits) / truth.shape[1]) if len(hits) else 0.0
+
+
+def evaluate_options(
+    base: np.ndarray,
+    queries: np.ndarray,
+    options: list[dict[str, Any]],
+    top_k: int,
+) -> list[dict[str, Any]]:
+    exact = faiss.IndexFlatIP(base.shape[1])
+    exact.add(base)
+    _scores, truth = exact.search(queries, top_k)
+
+    results: list[dict[str, Any]] = []
+    for option in options:
+        option_base = normalize_rows(base[:, : option["dim"]])
+        option_queries = normalize_rows(queries[:, : option["dim"]])
+
+        started = time.perf_counter()
+        index = create_faiss_index(option_base, option["storage"], option.get("pq_m", 32))
+        build_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for row in range(len(option_queries)):
+            index.search(option_queries[row : row + 1], top_k)
+        search_seconds = time.perf_counter() - started
+        _scores, found = index.search(option_queries, top_k)
+
+        index_bytes = len(faiss.serialize_index(index))
+        results.append(
+            {
+                **option,
+                "storage": built_index_storage(index),
+                "index_type": type(index).__name__,
+                "recall_at_k": recall_at_k(found, truth),
+                "index_bytes": index_bytes,
+                "bytes_per_vector": index_bytes / len(option_base),
+                "build_seconds": build_seconds,
+                "search_ms_per_query": search_seconds * 1000 / max(1, len(option_queries)),
+            }
+        )
+    return results
+
+
+def run_report(
+    sentences: list[str],
+    questions: list[str],
+    embedder: Embedder,
+    *,
+    holdout: int,
+    top_k: int,
+    dims: list[int],
+    pq_ms: list[int],
+    max_workers: int,
+    seed: int,
+) -> dict[str, Any]:
+    rng = random.Random(seed)
+    held_out = set(rng.sample(range(len(sentences)), min(holdout, max(0, len(sentences) - top_k))))
+    base_sentences = [sentence for index, sentence in enumerate(sentences) if index not in held_out]
+    query_texts = [sentences[index] for index in sorted(held_out)] + questions
+    if not base_sentences or not query_texts:
+        raise ValueError("Not enough sentences to build a base set and a held-out query set.")
+
+    base = embedder.embed_many(base_sentences, max_workers=max_workers, desc="Embedding base sentences")
+    queries = embedder.embed_many(query_texts, max_workers=max_workers, desc="Embedding held-out queries")
+    options = storage_options(base.shape[1], dims, pq_ms)
+    return {
+        "embedder": embedder.identity(),
+        "base_vectors": len(base_sentences),
+        "queries": len(query_texts),
+        "top_k": min(top_k, len(base_sentences)),
+        "results": evaluate_options(base, queries, options, min(top_k, len(base_sentences))),
+    }
+
+
+def print_table(report: dict[str, Any]) -> None:
+    print(f"{'option':<22}{'recall@k':>10}{'bytes/vec':>12}{'index MB':>11}{'ms/query':>10}")
+    for item in report["results"]:
+        print(
+            f"{item['name']:<22}{item['recall_at_k']:>10.3f}{item['bytes_per_vector']:>12.1f}"
+            f"{item['index_bytes'] / 1e6:>11.2f}{item['search_ms_per_query']:>10.3f}"
+        )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Measure recall versus memory for edge-index storage options.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dataset", help="Use the edge sentences of a built dataset")
+    source.add_argument("--synthetic", type=int, help="Use this many synthetic triples with the hashing embedder")
+    parser.add_argument("--holdout", type=int, default=200, help="Sentences held out as queries")
+    parser.add_argument("--top-k", type=int, default=10, help="k for recall@k")
+    parser.add_argument("--dims", nargs="*", type=int, default=[512, 256], help="Truncated dimensions to test")
+    parser.add_argument("--pq-m", nargs="*", type=int, default=[16, 32, 64], help="PQ sub-quantizer counts")
+    parser.add_argument("--max-workers", type=int, default=4, help="Embedding worker threads")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the held-out split")
+    parser.add_argument("--output", help="Report path (default: results/benchmarks/index_compression_<source>.json)")
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    config = get_config(args.dataset) if args.dataset else get_config()
+    if args.dataset:
+        sentences, questions = load_dataset_sentences(args.dataset)
+        embedder = create_embedder(config)
+        source_name = args.dataset
+    else:
+        sentences, questions = synthetic_sentences(args.synthetic, args.seed), []
+        embedder = HashingEmbedder(dim=config.hashing_embed_dim)
+        source_name = f"synthetic{args.synthetic}"
+
+    report = run_report(
+        sentences,
+        questions,
+        embedder,
+        holdout=args.holdout,
+        top_k=args.top_k,
+        dims=args.dims,
+        pq_ms=args.pq_m,
+        max_workers=args.max_workers,
+        seed=args.seed,
+    )
+    report.update(
+        {
+            "benchmark": "index_compression",
+            "source": source_name,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+        }
+    )
+    output_path = Path(args.output) if args.output else config.get_benchmark_file(f"index_compression_{source_name}")
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with output_path.open("w", encoding="utf-8") as handle:
+        json.dump(report, handle, indent=2)
+    print_table(report)
+    print(f"Index compression report written to {output_path}")
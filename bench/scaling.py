@@ -0,0 +1,291 @@
+"""Scaling benchmark for the graph-building and retrieval hot paths.
+
+For each requested triple count this runner generates a synthetic graph JSON file,
+then times and memory-profiles GEXF conversion, GEXF loading, edge-record
+collection, the topic/subtopic helpers, FAISS index construction, and edge search.
+Model calls go through the offline fake backend, so the report measures our own
+code rather than the API. Results are written as JSON for comparison across commits.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+
+import argparse
+import json
+import platform
+import random
+import resource
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Iterator
+
+import networkx as nx
+
+from bench.synthetic_graph import SyntheticGraphSpec, write_synthetic_graph_json
+from config import get_config
+from index.edge_embedding import EdgeEmbedderFAISS
+from index.json_to_gexf import convert_json_to_gexf
+from index.subtopic_choice import extract_subtopics_for_topic
+from index.topic_choice import extract_graph_topic_labels
+from utils.fake_openai import FakeBackendSettings, FakeOpenAI
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+
+
+class StageRecorder:
+    """Collect wall time and peak traced memory for named benchmark stages."""
+
+    def __init__(self, trace_memory: bool = True) -> None:
+        self.trace_memory = trace_memory
+        self.stages: dict[str, dict[str, Any]] = {}
+
+    @contextmanager
+    def stage(self, name: str, **attributes: Any) -> Iterator[None]:
+        if self.trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            record: dict[str, Any] = {"seconds": elapsed, **attributes}
+            if self.trace_memory:
+                _current, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                record["peak_bytes"] = peak
+            self.stages[name] = record
+
+
+def git_revision() -> str | None:
+    try:
+        completed = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=PROJECT_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return completed.stdout.strip() or None
+
+
+def max_rss_bytes() -> int:
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+def run_scale(
+    spec: SyntheticGraphSpec,
+    work_dir: Path,
+    *,
+    queries: int,
+    top_k: int,
+    embed_dim: int,
+    max_workers: int,
+    trace_memory: bool,
+) -> dict[str, Any]:
+    recorder = StageRecorder(trace_memory=trace_memory)
+    graph_json = work_dir / f"synthetic_{spec.triples}.json"
+    graph_gexf = work_dir / f"synthetic_{spec.triples}.gexf"
+    index_path = work_dir / f"synthetic_{spec.triples}.faiss"
+    payload_path = work_dir / f"synthetic_{spec.triples}.npy"
+    client = FakeOpenAI(FakeBackendSettings(embedding_dim=embed_dim))
+
+    with recorder.stage("generate"):
+        resolved = write_synthetic_graph_json(graph_json, spec)
+
+    with recorder.stage("convert_json_to_gexf"):
+        convert_json_to_gexf(str(graph_json), str(graph_gexf))
+
+    with recorder.stage("read_gexf"):
+        graph = nx.read_gexf(graph_gexf)
+
+    with recorder.stage("embedder_init"):
+        embedder = EdgeEmbedderFAISS(
+            gexf_path=str(graph_gexf),
+            embedding_model="fake",
+            openai_api_key=None,
+            index_path=str(index_path),
+            payload_path=str(payload_path),
+            client=client,
+        )
+
+    with recorder.stage("collect_edge_records"):
+        records = embedder._collect_edge_records()
+
+    with recorder.stage("topic_labels"):
+        topic_labels = extract_graph_topic_labels(graph)
+
+    topic_ids = [node_id for node_id, data in graph.nodes(data=True) if data.get("type") == "topic"]
+    with recorder.stage("subtopic_lists", topics=len(topic_ids)):
+        subtopic_lists = {topic_id: extract_subtopics_for_topic(graph, topic_id) for topic_id in topic_ids}
+
+    with recorder.stage("build_index", vectors=len(records)):
+        embedder.build_index(max_workers=max_workers)
+
+    rng = random.Random(spec.seed)
+    sampled = rng.sample(records, min(queries, len(records)))
+    entity_filters = []
+    for record in sampled:
+        subtopic_id = next(
+            (
+                neighbor
+                for neighbor in graph.neighbors(record["source_id"])
+                if graph.nodes[neighbor].get("type") == "subtopic"
+            ),
+            None,
+        )
+        entity_filters.append(
+            {
+                neighbor
+                for neighbor in graph.neighbors(subtopic_id)
+                if graph.nodes[neighbor].get("type") == "entity"
+            }
+            if subtopic_id
+            else set()
+        )
+
+    with recorder.stage("search_unfiltered", queries=len(sampled)):
+        for record in sampled:
+            embedder.search(record["sentence"], top_k=top_k)
+
+    with recorder.stage("search_filtered", queries=len(sampled)):
+        for record, entity_filter in zip(sampled, entity_filters, strict=False):
+            embedder.search(record["sentence"], top_k=top_k, filter_entities=entity_filter or None)
+
+    return {
+        "spec": resolved,
+        "graph": {
+            "nodes": graph.number_of_nodes(),
+            "edges": graph.number_of_edges(),
+            "topics": len(topic_labels),
+            "max_subtopics_per_topic": max((len(items) for items in subtopic_lists.values()), default=0),
+            "edge_sentences": len(records),
+        },
+        "files": {
+            "graph_json_bytes": graph_json.stat().st_size,
+            "graph_gexf_bytes": graph_gexf.stat().st_size,
+            "index_bytes": index_path.stat().st_size,
+            "payload_bytes": payload_path.stat().st_size,
+        },
+        "stages": recorder.stages,
+        "max_rss_bytes": max_rss_bytes(),
+    }
+
+
+def run_benchmark(
+    sizes: list[int],
+    output_path: Path,
+    *,
+    topics: int = 50,
+    subtopics_per_topic: int = 20,
+    skew: float = 1.1,
+    seed: int = 0,
+    queries: int = 100,
+    top_k: int = 10,
+    embed_dim: int = 64,
+    max_workers: int = 4,
+    trace_memory: bool = True,
+    work_dir: Path | None = None,
+) -> dict[str, Any]:
+    runs: list[dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(dir=work_dir) as temp_dir:
+        for size in sizes:
+            print(f"Benchmarking {size} triples")
+            spec = SyntheticGraphSpec(
+                triples=size,
+                topics=topics,
+                subtopics_per_topic=subtopics_per_topic,
+                skew=skew,
+                seed=seed,
+            )
+            runs.append(
+                run_scale(
+                    spec,
+                    Path(temp_dir),
+                    queries=queries,
+                    top_k=top_k,
+                    embed_dim=embed_dim,
+                    max_workers=max_workers,
+                    trace_memory=trace_memory,
+                )
+            )
+
+    report = {
+        "benchmark": "scaling",
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {
+            "queries": queries,
+            "top_k": top_k,
+            "embed_dim": embed_dim,
+            "max_workers": max_workers,
+            "trace_memory": trace_memory,
+        },
+        "runs": runs,
+    }
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with output_path.open("w", encoding="utf-8") as handle:
+        json.dump(report, handle, indent=2)
+    print(f"Scaling report written to {output_path}")
+    return report
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Time and memory-profile TH-RAG stages on synthetic graphs.")
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        type=int,
+        default=DEFAULT_SIZES,
+        help="Triple counts to benchmark, for example 1000 10000 100000 1000000 10000000",
+    )
+    parser.add_argument("--output", help="Report path (default: results/benchmarks/scaling_<timestamp>.json)")
+    parser.add_argument("--topics", type=int, default=50, help="Number of main topics")
+    parser.add_argument("--subtopics-per-topic", type=int, default=20, help="Subtopics per main topic")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent for entity popularity")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--queries", type=int, default=100, help="Search queries per size")
+    parser.add_argument("--top-k", type=int, default=10, help="Edges returned per search")
+    parser.add_argument("--embed-dim", type=int, default=64, help="Fake embedding dimension")
+    parser.add_argument("--max-workers", type=int, default=4, help="Embedding worker threads")
+    parser.add_argument("--work-dir", help="Directory for temporary benchmark artifacts")
+    parser.add_argument(
+        "--no-tracemalloc",
+        action="store_true",
+        help="Skip per-stage tracemalloc peaks; timings are less perturbed at large sizes.",
+    )
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    default_name = f"scaling_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    run_benchmark(
+        args.sizes,
+        Path(args.output) if args.output else get_config().get_benchmark_file(default_name),
+        topics=args.topics,
+        subtopics_per_topic=args.subtopics_per_topic,
+        skew=args.skew,
+        seed=args.seed,
+        queries=args.queries,
+        top_k=args.top_k,
+        embed_dim=args.embed_dim,
+        max_workers=args.max_workers,
+        trace_memory=not args.no_tracemalloc,
+        work_dir=Path(args.work_dir) if args.work_dir else None,
+    )
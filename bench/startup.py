@@ -0,0 +1,166 @@
+"""Startup benchmark for the query-side edge index.
+
+Builds a synthetic graph and its FAISS index once, then measures how long it takes
+(and how much memory is traced) to get a searchable index with the build-side
+``EdgeEmbedderFAISS`` (which reads the GEXF and collects edge records) versus the
+query-only ``EdgeIndexSearcher``, plus the full ``Retriever`` initialisation.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+
+import argparse
+import json
+import platform
+import tempfile
+from datetime import datetime, timezone
+from typing import Any
+
+from bench.scaling import StageRecorder, git_revision, max_rss_bytes
+from bench.synthetic_graph import SyntheticGraphSpec, write_synthetic_graph_json
+from config import get_config
+from generate.Retriever import Retriever
+from index.edge_embedding import EdgeEmbedderFAISS, EdgeIndexSearcher
+from index.embedders import HashingEmbedder
+from index.json_to_gexf import convert_json_to_gexf
+from utils.fake_openai import FakeOpenAI
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+
+
+def run_startup(spec: SyntheticGraphSpec, work_dir: Path, *, embed_dim: int, trace_memory: bool) -> dict[str, Any]:
+    graph_json = work_dir / f"synthetic_{spec.triples}.json"
+    graph_gexf = work_dir / f"synthetic_{spec.triples}.gexf"
+    paths = {
+        "index_path": str(work_dir / f"synthetic_{spec.triples}.faiss"),
+        "payload_path": str(work_dir / f"synthetic_{spec.triples}.npy"),
+    }
+    embedder = HashingEmbedder(dim=embed_dim)
+
+    resolved = write_synthetic_graph_json(graph_json, spec)
+    convert_json_to_gexf(str(graph_json), str(graph_gexf))
+    EdgeEmbedderFAISS(
+        gexf_path=str(graph_gexf),
+        embedding_model="",
+        openai_api_key=None,
+        embedder=embedder,
+        **paths,
+    ).build_index()
+
+    recorder = StageRecorder(trace_memory=trace_memory)
+    with recorder.stage("builder_load"):
+        builder = EdgeEmbedderFAISS(
+            gexf_path=str(graph_gexf),
+            embedding_model="",
+            openai_api_key=None,
+            embedder=embedder,
+            **paths,
+        )
+        builder.load_index()
+        # Touch the lazy property so loading the edge records is timed in this stage.
+        _ = builder.edge_records
+    del builder
+
+    with recorder.stage("searcher_load"):
+        searcher = EdgeIndexSearcher(embedder=embedder, **paths)
+        searcher.load_index()
+    del searcher
+
+    with recorder.stage("retriever_init"):
+        retriever = Retriever(
+            gexf_path=str(graph_gexf),
+            embedding_model="",
+            openai_api_key=None,
+            client=FakeOpenAI(),
+            embedder=embedder,
+            **paths,
+        )
+    del retriever
+
+    return {
+        "spec": resolved,
+        "files": {
+            "graph_gexf_bytes": graph_gexf.stat().st_size,
+            "index_bytes": Path(paths["index_path"]).stat().st_size,
+            "payload_bytes": Path(paths["payload_path"]).stat().st_size,
+        },
+        "stages": recorder.stages,
+        "max_rss_bytes": max_rss_bytes(),
+    }
+
+
+def run_benchmark(
+    sizes: list[int],
+    output_path: Path,
+    *,
+    embed_dim: int = 64,
+    seed: int = 0,
+    trace_memory: bool = True,
+    work_dir: Path | None = None,
+) -> dict[str, Any]:
+    runs: list[dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(dir=work_dir) as temp_dir:
+        for size in sizes:
+            print(f"Measuring startup for {size} triples")
+            runs.append(
+                run_startup(
+                    SyntheticGraphSpec(triples=size, seed=seed),
+                    Path(temp_dir),
+                    embed_dim=embed_dim,
+                    trace_memory=trace_memory,
+                )
+            )
+
+    report = {
+        "benchmark": "startup",
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {"embed_dim": embed_dim, "seed": seed, "trace_memory": trace_memory},
+        "runs": runs,
+    }
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with output_path.open("w", encoding="utf-8") as handle:
+        json.dump(report, handle, indent=2)
+
+    print(f"{'triples':>10}{'builder s':>12}{'searcher s':>12}{'retriever s':>13}")
+    for run in runs:
+        stages = run["stages"]
+        print(
+            f"{run['spec']['triples']:>10}{stages['builder_load']['seconds']:>12.3f}"
+            f"{stages['searcher_load']['seconds']:>12.3f}{stages['retriever_init']['seconds']:>13.3f}"
+        )
+    print(f"Startup report written to {output_path}")
+    return report
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Compare edge-index startup cost for builder and searcher objects.")
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES, help="Triple counts to benchmark")
+    parser.add_argument("--output", help="Report path (default: results/benchmarks/startup_<timestamp>.json)")
+    parser.add_argument("--embed-dim", type=int, default=64, help="Hashing embedding dimension")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--work-dir", help="Directory for temporary benchmark artifacts")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="Skip per-stage tracemalloc peaks")
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    default_name = f"startup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    run_benchmark(
+        args.sizes,
+        Path(args.output) if args.output else get_config().get_benchmark_file(default_name),
+        embed_dim=args.embed_dim,
+        seed=args.seed,
+        trace_memory=not args.no_tracemalloc,
+        work_dir=Path(args.work_dir) if args.work_dir else None,
+    )
@@ -0,0 +1,146 @@
+"""Synthetic graph-JSON generator for scaling benchmarks.
+
+The generator emits blocks in the same shape as ``index/graph_construction.py``
+(``chunk_id``, ``content``, ``triples``) so every downstream stage can be timed on
+corpora far larger than the bundled test dataset. Entity popularity follows a
+Zipf-like distribution controlled by ``skew``.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+
+import argparse
+import json
+from dataclasses import asdict, dataclass
+from typing import Any, Iterator
+
+import numpy as np
+
+PREDICATES = ["related to", "part of", "located in", "created", "influenced", "member of", "uses", "owns"]
+
+
+@dataclass
+class SyntheticGraphSpec:
+    triples: int = 1000
+    chunks: int | None = None
+    entities: int | None = None
+    topics: int = 50
+    subtopics_per_topic: int = 20
+    skew: float = 1.1
+    seed: int = 0
+
+    def resolved(self) -> "SyntheticGraphSpec":
+        """Fill unset counts with ratios typical of real extraction output."""
+
+        return SyntheticGraphSpec(
+            triples=self.triples,
+            chunks=self.chunks or max(1, self.triples // 10),
+            entities=self.entities or max(2, self.triples // 5),
+            topics=self.topics,
+            subtopics_per_topic=self.subtopics_per_topic,
+            skew=self.skew,
+            seed=self.seed,
+        )
+
+
+def entity_probabilities(count: int, skew: float) -> np.ndarray:
+    ranks = np.arange(1, count + 1, dtype="float64")
+    weights = 1.0 / np.power(ranks, skew) if skew > 0 else np.ones(count)
+    return weights / weights.sum()
+
+
+def iter_synthetic_blocks(spec: SyntheticGraphSpec) -> Iterator[dict[str, Any]]:
+    """Yield graph-JSON blocks one chunk at a time."""
+
+    spec = spec.resolved()
+    chunk_count = int(spec.chunks or 1)
+    entity_count = int(spec.entities or 2)
+    rng = np.random.default_rng(spec.seed)
+
+    probabilities = entity_probabilities(entity_count, spec.skew)
+    subjects = rng.choice(entity_count, size=spec.triples, p=probabilities)
+    objects = rng.choice(entity_count, size=spec.triples, p=probabilities)
+    collisions = subjects == objects
+    objects[collisions] = (objects[collisions] + 1) % entity_count
+    predicates = rng.integers(0, len(PREDICATES), size=spec.triples)
+    entity_topics = rng.integers(0, spec.topics, size=entity_count)
+    entity_subtopics = rng.integers(0, spec.subtopics_per_topic, size=entity_count)
+    chunk_bounds = np.linspace(0, spec.triples, chunk_count + 1).astype("int64")
+
+    def labels(entity: int) -> dict[str, str]:
+        topic = int(entity_topics[entity])
+        return {
+            "subtopic": f"Subtopic {topic}-{int(entity_subtopics[entity])}",
+            "main_topic": f"Topic {topic}",
+        }
+
+    for chunk_index in range(chunk_count):
+        triples: list[dict[str, Any]] = []
+        for triple_index in range(int(chunk_bounds[chunk_index]), int(chunk_bounds[chunk_index + 1])):
+            subject = int(subjects[triple_index])
+            object_ = int(objects[triple_index])
+            predicate = PREDICATES[int(predicates[triple_index])]
+            triples.append(
+                {
+                    "triple": [f"Entity {subject}", predicate, f"Entity {object_}"],
+                    "sentence": f"Entity {subject} {predicate} Entity {object_} in record {triple_index}.",
+                    "subject": labels(subject),
+                    "object": labels(object_),
+                }
+            )
+        yield {
+            "chunk_id": f"chunk-{chunk_index:05d}",
+            "content": " ".join(item["sentence"] for item in triples),
+            "triples": triples,
+        }
+
+
+def write_synthetic_graph_json(output_path: Path, spec: SyntheticGraphSpec) -> dict[str, Any]:
+    """Stream synthetic blocks to ``output_path`` and return the resolved spec."""
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with output_path.open("w", encoding="utf-8") as handle:
+        handle.write("[\n")
+        for index, block in enumerate(iter_synthetic_blocks(spec)):
+            if index:
+                handle.write(",\n")
+            handle.write(json.dumps(block, ensure_ascii=False))
+        handle.write("\n]\n")
+    return asdict(spec.resolved())
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Generate a synthetic graph JSON file for benchmarks.")
+    parser.add_argument("output_file", help="Path for the generated graph JSON file")
+    parser.add_argument("--triples", type=int, default=1000, help="Number of triples to generate")
+    parser.add_argument("--chunks", type=int, help="Number of chunks (default: triples / 10)")
+    parser.add_argument("--entities", type=int, help="Number of distinct entities (default: triples / 5)")
+    parser.add_argument("--topics", type=int, default=50, help="Number of main topics")
+    parser.add_argument("--subtopics-per-topic", type=int, default=20, help="Subtopics per main topic")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent for entity popularity")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    resolved = write_synthetic_graph_json(
+        Path(args.output_file),
+        SyntheticGraphSpec(
+            triples=args.triples,
+            chunks=args.chunks,
+            entities=args.entities,
+            topics=args.topics,
+            subtopics_per_topic=args.subtopics_per_topic,
+            skew=args.skew,
+            seed=args.seed,
+        ),
+    )
+    print(f"Wrote synthetic graph JSON to {args.output_file}: {resolved}")
@@ -1,15 +1,32 @@
-"""Configuration helpers for the TH-RAG research codebase."""
+"""Configuration helpers for the TH-RAG research codebase.
+
+Importing this module has no side effects: ``.env`` is loaded when the first
+config is created, configs are built on first use and cached per dataset by
+``get_config``, and output directories are created by the code that writes
+into them.
+"""
 
 from __future__ import annotations
 
-import json
 import os
+import threading
 from pathlib import Path
 from typing import Any
 
-from dotenv import load_dotenv
+from utils.locking import atomic_write_json, file_lock, lock_path, read_json
+
+_DOTENV_LOADED = False
+_CONFIG_LOCK = threading.RLock()
+
 
-load_dotenv()
+def _load_dotenv_once() -> None:
+    global _DOTENV_LOADED
+    with _CONFIG_LOCK:
+        if not _DOTENV_LOADED:
+            from dotenv import load_dotenv
+
+            load_dotenv()
+            _DOTENV_LOADED = True
 
 
 class THRAGConfig:
@@ -27,15 +44,29 @@ class THRAGConfig:
         self.generated_results_dir = self.results_dir / "generated"
         self.evaluated_results_dir = self.results_dir / "evaluated"
         self.chunks_dir = self.results_dir / "chunks"
+        self.benchmarks_dir = self.results_dir / "benchmarks"
+        self.manifests_dir = self.results_dir / "manifests"
+        self.profiles_dir = self.results_dir / "profiles"
 
+        _load_dotenv_once()
         self._load_environment()
-        self._ensure_directories()
 
     def _load_environment(self) -> None:
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
+        self.openai_backend = os.getenv("OPENAI_BACKEND", "openai").lower()
 
         self.default_model = os.getenv("DEFAULT_MODEL", "gpt-4o-mini")
         self.embed_model = os.getenv("EMBED_MODEL", "text-embedding-3-small")
+        self.embed_backend = os.getenv("EMBED_BACKEND", "openai").lower()
+        self.hashing_embed_dim = int(os.getenv("HASHING_EMBED_DIM", "768"))
+        self.local_embed_model_path = os.getenv("LOCAL_EMBED_MODEL_PATH")
+        self.embed_dimensions = int(os.getenv("EMBED_DIMENSIONS", "0"))
+        self.embed_dim_reduction = os.getenv("EMBED_DIM_REDUCTION", "api").lower()
+        self.index_storage = os.getenv("INDEX_STORAGE", "flat").lower()
+        self.chunk_store_compression = os.getenv("CHUNK_STORE_COMPRESSION", "none").lower()
+        self.write_kv_store_json = os.getenv("KV_STORE_JSON", "true").lower() == "true"
+        self.pq_m = int(os.getenv("PQ_M", "32"))
+        self.pq_nbits = int(os.getenv("PQ_NBITS", "8"))
         self.chat_model = os.getenv("CHAT_MODEL", "gpt-4o-mini")
         self.eval_model = os.getenv("EVAL_MODEL", "gpt-4o-mini")
 
@@ -43,11 +74,28 @@ class THRAGConfig:
         self.max_tokens_response = int(os.getenv("MAX_TOKENS_RESPONSE", "2000"))
         self.answer_temperature = float(os.getenv("ANSWER_TEMPERATURE", "0.3"))
         self.answer_max_tokens = int(os.getenv("ANSWER_MAX_TOKENS", "1000"))
+        self.stream_answers = os.getenv("STREAM_ANSWERS", "false").lower() == "true"
         self.eval_temperature = float(os.getenv("EVAL_TEMPERATURE", "0.1"))
 
         self.max_tokens = int(os.getenv("MAX_TOKENS", "3000"))
         self.overlap = int(os.getenv("OVERLAP", "300"))
         self.max_workers = int(os.getenv("MAX_WORKERS", "10"))
+        self.chunk_workers = int(os.getenv("CHUNK_WORKERS", "0"))
+        self.chunk_segment_chars = int(os.getenv("CHUNK_SEGMENT_CHARS", "4000000"))
+        self.extraction_pack_tokens = int(os.getenv("EXTRACTION_PACK_TOKENS", "0"))
+        self.extraction_pack_max_chunks = int(os.getenv("EXTRACTION_PACK_MAX_CHUNKS", "8"))
+        self.extraction_mode = os.getenv("EXTRACTION_MODE", "sync").lower()
+        self.batch_max_requests = int(os.getenv("BATCH_MAX_REQUESTS", "50000"))
+        self.batch_completion_window = os.getenv("BATCH_COMPLETION_WINDOW", "24h")
+        self.batch_poll_seconds = float(os.getenv("BATCH_POLL_SECONDS", "60"))
+        self.extraction_lookahead = int(os.getenv("EXTRACTION_LOOKAHEAD", "256"))
+        self.straggler_percentile = float(os.getenv("STRAGGLER_PERCENTILE", "95"))
+        self.straggler_min_samples = int(os.getenv("STRAGGLER_MIN_SAMPLES", "20"))
+        self.document_extensions = [
+            extension.strip().lower()
+            for extension in os.getenv("DOCUMENT_EXTENSIONS", ".txt,.md").split(",")
+            if extension.strip()
+        ]
         self.alt_max_tokens = int(os.getenv("ALT_MAX_TOKENS", "1200"))
         self.alt_overlap = int(os.getenv("ALT_OVERLAP", "100"))
 
@@ -72,20 +120,78 @@ class THRAGConfig:
         self.log_file = os.getenv("LOG_FILE", "thrag.log")
         self.batch_size = int(os.getenv("BATCH_SIZE", "32"))
         self.timeout_seconds = int(os.getenv("TIMEOUT_SECONDS", "30"))
+        self.stage_timeouts = {
+            "extraction": float(os.getenv("EXTRACTION_TIMEOUT_SECONDS", "120")),
+            "topic_choice": float(os.getenv("TOPIC_CHOICE_TIMEOUT_SECONDS") or self.timeout_seconds),
+            "subtopic_choice": float(os.getenv("SUBTOPIC_CHOICE_TIMEOUT_SECONDS") or self.timeout_seconds),
+            "answer_generation": float(os.getenv("ANSWER_TIMEOUT_SECONDS", "120")),
+            "embedding": float(os.getenv("EMBED_TIMEOUT_SECONDS") or self.timeout_seconds),
+            "evaluation": float(os.getenv("EVALUATION_TIMEOUT_SECONDS", "120")),
+        }
+        self.hedge_stages = {
+            stage.strip() for stage in os.getenv("HEDGE_STAGES", "").split(",") if stage.strip()
+        }
+        self.hedge_percentile = float(os.getenv("HEDGE_PERCENTILE", "95"))
+        self.hedge_min_samples = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+        self.hedge_max_rate = float(os.getenv("HEDGE_MAX_RATE", "0.1"))
         self.enable_cache = os.getenv("ENABLE_CACHE", "true").lower() == "true"
         self.cache_ttl = int(os.getenv("CACHE_TTL", "3600"))
-
-    def _ensure_directories(self) -> None:
-        for path in [
-            self.data_dir,
-            self.results_dir,
-            self.temp_dir,
-            self.index_results_dir,
-            self.generated_results_dir,
-            self.evaluated_results_dir,
-            self.chunks_dir,
-        ]:
-            path.mkdir(parents=True, exist_ok=True)
+        self.semantic_cache = os.getenv("SEMANTIC_CACHE", "off").lower()
+        self.semantic_cache_threshold = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+        self.semantic_cache_max_entries = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1024"))
+
+        self.fake_embed_dim = int(os.getenv("FAKE_EMBED_DIM", "1536"))
+        self.fake_latency_ms = float(os.getenv("FAKE_LATENCY_MS", "0"))
+        self.fake_latency_jitter_ms = float(os.getenv("FAKE_LATENCY_JITTER_MS", "0"))
+        self.fake_latency_distribution = os.getenv("FAKE_LATENCY_DISTRIBUTION", "fixed").lower()
+        self.fake_error_rate = float(os.getenv("FAKE_ERROR_RATE", "0"))
+        self.fake_seed = int(os.getenv("FAKE_SEED", "0"))
+        self.fake_token_latency_ms = float(os.getenv("FAKE_TOKEN_LATENCY_MS", "0"))
+        self.fake_batch_dir = os.getenv("FAKE_BATCH_DIR") or str(self.temp_dir / "fake_batches")
+        self.fake_batch_polls = int(os.getenv("FAKE_BATCH_POLLS", "1"))
+
+        self.server_host = os.getenv("SERVER_HOST", "127.0.0.1")
+        self.server_port = int(os.getenv("SERVER_PORT", "8765"))
+        self.server_stats_window = int(os.getenv("SERVER_STATS_WINDOW", "1000"))
+
+        self.artifact_cache_mb = int(os.getenv("ARTIFACT_CACHE_MB", "4096"))
+        self.artifact_cache_max_datasets = int(os.getenv("ARTIFACT_CACHE_MAX_DATASETS", "0"))
+        self.artifact_prefetch_workers = int(os.getenv("ARTIFACT_PREFETCH_WORKERS", "2"))
+
+        self.pipeline_workers = int(os.getenv("PIPELINE_WORKERS", "2"))
+        self.dataset_workers = int(os.getenv("DATASET_WORKERS", "2"))
+        self.openai_requests_per_minute = float(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "0"))
+        self.openai_tokens_per_minute = float(os.getenv("OPENAI_TOKENS_PER_MINUTE", "0"))
+        self.stream_build = os.getenv("STREAM_BUILD", "false").lower() == "true"
+        self.stream_queue_blocks = int(os.getenv("STREAM_QUEUE_BLOCKS", "64"))
+        self.entity_canonicalization = os.getenv("ENTITY_CANONICALIZATION", "false").lower() == "true"
+        self.canonical_string_threshold = float(os.getenv("CANONICAL_STRING_THRESHOLD", "0.92"))
+        self.canonical_embed_threshold = float(os.getenv("CANONICAL_EMBED_THRESHOLD", "0.95"))
+        self.canonical_max_block_size = int(os.getenv("CANONICAL_MAX_BLOCK_SIZE", "50"))
+        self.topic_consolidation = os.getenv("TOPIC_CONSOLIDATION", "false").lower() == "true"
+        self.topic_merge_threshold = float(os.getenv("TOPIC_MERGE_THRESHOLD", "0.9"))
+        self.topic_merge_neighbors = int(os.getenv("TOPIC_MERGE_NEIGHBORS", "5"))
+        self.topic_merge_llm = os.getenv("TOPIC_MERGE_LLM", "false").lower() == "true"
+        self.topic_max_subtopics = int(os.getenv("TOPIC_MAX_SUBTOPICS", "50"))
+        self.profile_modes = [mode.strip() for mode in os.getenv("PROFILE_MODES", "").split(",") if mode.strip()]
+        self.profile_steps = [step.strip() for step in os.getenv("PROFILE_STEPS", "").split(",") if step.strip()]
+        self.profile_sample_interval_ms = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "10"))
+        self.stack_dump_signal = os.getenv("STACK_DUMP_SIGNAL", "true").lower() == "true"
+
+    def has_api_credentials(self) -> bool:
+        """Return whether model calls can be made with the configured backend."""
+
+        return self.openai_backend == "fake" or bool(self.openai_api_key)
+
+    def rewrites_graph_labels(self) -> bool:
+        """Whether json_to_gexf maps extracted labels to canonical ones, which needs every triple first."""
+
+        return self.entity_canonicalization or self.topic_consolidation
+
+    def stage_timeout(self, stage: str) -> float:
+        """Seconds before a model call of ``stage`` is abandoned."""
+
+        return self.stage_timeouts.get(stage, float(self.timeout_seconds))
 
     def _require_dataset_name(self, dataset_name: str | None = None) -> str:
         name = dataset_name or self.dataset_name
@@ -102,6 +208,24 @@ class THRAGConfig:
     def get_contexts_file(self, dataset_name: str | None = None) -> Path:
         return self.get_input_file(dataset_name)
 
+    def get_documents_dir(self, dataset_name: str | None = None) -> Path:
+        return self.get_dataset_dir(dataset_name) / "documents"
+
+    def get_manifest_file(self, dataset_name: str | None = None) -> Path:
+        return self.get_dataset_dir(dataset_name) / "manifest.jsonl"
+
+    def get_corpus_input(self, dataset_name: str | None = None) -> Path:
+        """Return the dataset's corpus: a manifest, a documents directory, or contexts.txt."""
+
+        for path in [
+            self.get_manifest_file(dataset_name),
+            self.get_documents_dir(dataset_name),
+            self.get_contexts_file(dataset_name),
+        ]:
+            if path.exists():
+                return path
+        return self.get_contexts_file(dataset_name)
+
     def get_qa_file(self, dataset_name: str | None = None) -> Path:
         return self.get_dataset_dir(dataset_name) / "qa.json"
 
@@ -116,10 +240,30 @@ class THRAGConfig:
         name = self._require_dataset_name(dataset_name)
         return self.index_results_dir / f"{name}_graph.gexf"
 
+    def get_entity_aliases_file(self, dataset_name: str | None = None) -> Path:
+        name = self._require_dataset_name(dataset_name)
+        return self.index_results_dir / f"{name}_entity_aliases.json"
+
+    def get_topic_aliases_file(self, dataset_name: str | None = None) -> Path:
+        name = self._require_dataset_name(dataset_name)
+        return self.index_results_dir / f"{name}_topic_aliases.json"
+
     def get_kv_store_file(self, dataset_name: str | None = None) -> Path:
         name = self._require_dataset_name(dataset_name)
         return self.index_results_dir / f"{name}_kv_store.json"
 
+    def get_chunk_store_file(self, dataset_name: str | None = None) -> Path:
+        name = self._require_dataset_name(dataset_name)
+        return self.index_results_dir / f"{name}_chunks.sqlite"
+
+    def get_document_state_file(self, dataset_name: str | None = None) -> Path:
+        name = self._require_dataset_name(dataset_name)
+        return self.index_results_dir / f"{name}_documents.json"
+
+    def get_batch_dir(self, dataset_name: str | None = None) -> Path:
+        name = self._require_dataset_name(dataset_name)
+        return self.index_results_dir / f"{name}_batches"
+
     def get_edge_index_file(self, dataset_name: str | None = None) -> Path:
         name = self._require_dataset_name(dataset_name)
         return self.index_results_dir / f"{name}_edge_index.faiss"
@@ -136,27 +280,62 @@ class THRAGConfig:
         name = self._require_dataset_name(dataset_name)
         return self.chunks_dir / f"{name}_chunks_{answer_type}.jsonl"
 
+    def get_trace_file(self, dataset_name: str | None = None, answer_type: str = "short") -> Path:
+        name = self._require_dataset_name(dataset_name)
+        return self.generated_results_dir / f"{name}_traces_{answer_type}.jsonl"
+
+    def get_trace_summary_file(self, dataset_name: str | None = None, answer_type: str = "short") -> Path:
+        name = self._require_dataset_name(dataset_name)
+        return self.generated_results_dir / f"{name}_trace_summary_{answer_type}.json"
+
     def get_evaluation_file(self, dataset_name: str | None = None, eval_method: str = "f1") -> Path:
         name = self._require_dataset_name(dataset_name)
         return self.evaluated_results_dir / f"{name}_eval_{eval_method}.json"
 
+    def get_benchmark_file(self, benchmark_name: str) -> Path:
+        return self.benchmarks_dir / f"{benchmark_name}.json"
+
+    def get_step_manifest_file(self, step_name: str, dataset_name: str | None = None) -> Path:
+        name = self._require_dataset_name(dataset_name)
+        return self.manifests_dir / name / f"{step_name}.json"
+
+    def get_profile_dir(self, dataset_name: str | None = None) -> Path:
+        return self.profiles_dir / self._require_dataset_name(dataset_name)
+
     def get_pipeline_state_file(self) -> Path:
+        """Shared state file of earlier versions, still read for datasets without their own file."""
+
         return self.temp_dir / "pipeline_state.json"
 
+    def get_state_dir(self) -> Path:
+        return self.temp_dir / "state"
+
+    def get_dataset_state_file(self, dataset_name: str | None = None) -> Path:
+        name = self._require_dataset_name(dataset_name)
+        return self.get_state_dir() / f"{name}.json"
+
     def save_pipeline_state(self, state: dict[str, Any]) -> None:
-        with self.get_pipeline_state_file().open("w", encoding="utf-8") as handle:
-            json.dump(state, handle, indent=2, ensure_ascii=False)
+        for dataset, dataset_state in state.items():
+            state_file = self.get_dataset_state_file(dataset)
+            with file_lock(lock_path(state_file)):
+                atomic_write_json(state_file, dataset_state)
 
     def load_pipeline_state(self) -> dict[str, Any] | None:
-        state_file = self.get_pipeline_state_file()
-        if not state_file.exists():
-            return None
-        with state_file.open("r", encoding="utf-8") as handle:
-            return json.load(handle)
+        state = read_json(self.get_pipeline_state_file()) or {}
+        state_dir = self.get_state_dir()
+        if state_dir.exists():
+            for state_file in sorted(state_dir.glob("*.json")):
+                dataset_state = read_json(state_file)
+                if dataset_state is not None:
+                    state[state_file.stem] = dataset_state
+        return state or None
 
     def get_dataset_state(self, dataset_name: str | None = None) -> dict[str, Any]:
-        state = self.load_pipeline_state() or {}
-        return state.get(self._require_dataset_name(dataset_name), {})
+        dataset = self._require_dataset_name(dataset_name)
+        dataset_state = read_json(self.get_dataset_state_file(dataset))
+        if dataset_state is None:
+            dataset_state = (read_json(self.get_pipeline_state_file()) or {}).get(dataset, {})
+        return dataset_state
 
     def mark_step_completed(
         self,
@@ -164,16 +343,25 @@ class THRAGConfig:
         dataset_name: str | None = None,
         **metadata: Any,
     ) -> None:
+        """Record a finished step in the dataset's state file.
+
+        The read-modify-write runs under a file lock, so steps of one dataset
+        finishing at once, in this process or another, keep each other's entries.
+        """
+
         dataset = self._require_dataset_name(dataset_name)
-        state = self.load_pipeline_state() or {}
-        state.setdefault(dataset, {})
-        state[dataset][step_name] = {"completed": True, **metadata}
-        self.save_pipeline_state(state)
+        state_file = self.get_dataset_state_file(dataset)
+        with file_lock(lock_path(state_file)):
+            state = self.get_dataset_state(dataset)
+            state[step_name] = {"completed": True, **metadata}
+            atomic_write_json(state_file, state)
 
     def clear_pipeline_state(self) -> None:
-        state_file = self.get_pipeline_state_file()
-        if state_file.exists():
-            state_file.unlink()
+        state_files = [self.get_pipeline_state_file()]
+        if self.get_state_dir().exists():
+            state_files.extend(self.get_state_dir().glob("*.json"))
+        for state_file in state_files:
+            state_file.unlink(missing_ok=True)
 
     def list_available_datasets(self) -> list[str]:
         if not self.data_dir.exists():
@@ -181,7 +369,8 @@ class THRAGConfig:
         datasets = [
             item.name
             for item in self.data_dir.iterdir()
-            if item.is_dir() and (item / "contexts.txt").exists()
+            if item.is_dir()
+            and any((item / name).exists() for name in ["contexts.txt", "documents", "manifest.jsonl"])
         ]
         return sorted(datasets)
 
@@ -208,12 +397,23 @@ class THRAGConfig:
 
 
 
-_config = THRAGConfig()
+_CONFIGS: dict[str | None, THRAGConfig] = {}
 
 
 def get_config(dataset_name: str | None = None) -> THRAGConfig:
-    """Return a shared config instance or a dataset-specific config."""
+    """Return the shared config, or the dataset-specific one, creating it on first use."""
+
+    config = _CONFIGS.get(dataset_name)
+    if config is None:
+        with _CONFIG_LOCK:
+            config = _CONFIGS.get(dataset_name)
+            if config is None:
+                config = _CONFIGS[dataset_name] = THRAGConfig(dataset_name)
+    return config
+
+
+def clear_config_cache() -> None:
+    """Forget cached configs so the next ``get_config`` reads the environment again."""
 
-    if dataset_name is None:
-        return _config
-    return THRAGConfig(dataset_name)
+    with _CONFIG_LOCK:
+        _CONFIGS.clear()
@@ -114,6 +114,7 @@ def main(
     }
 
     output_path = config.get_evaluation_file(eval_method="f1")
+    output_path.parent.mkdir(parents=True, exist_ok=True)
     with output_path.open("w", encoding="utf-8") as handle:
         json.dump(results, handle, indent=2, ensure_ascii=False)
 
@@ -12,15 +12,19 @@ if str(PROJECT_ROOT) not in sys.path:
 
 from collections import defaultdict
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Any
-
-import networkx as nx
-from openai import OpenAI
+from typing import TYPE_CHECKING, Any
 
 from config import get_config
-from index.edge_embedding import EdgeEmbedderFAISS
+from index.edge_embedding import EdgeIndexSearcher
+from index.embedders import Embedder
 from index.subtopic_choice import choose_subtopics_for_topic
 from index.topic_choice import choose_topics_from_graph
+from utils.openai_client import create_client
+from utils.tracing import submit_in_context
+
+if TYPE_CHECKING:
+    import networkx as nx
+    from openai import OpenAI
 
 
 class Retriever:
@@ -30,27 +34,26 @@ class Retriever:
         self,
         *,
         gexf_path: str,
-        json_path: str,
-        kv_json_path: str,
         index_path: str,
         payload_path: str,
         embedding_model: str,
         openai_api_key: str | None,
         client: OpenAI | None = None,
         thread_workers: int | None = None,
+        embedder: Embedder | None = None,
     ) -> None:
-        if not openai_api_key:
+        if client is None and not openai_api_key:
             raise ValueError("OPENAI_API_KEY must be configured before retrieval can run.")
 
-        self.graph = nx.read_gexf(gexf_path)
-        self.client = client or OpenAI(api_key=openai_api_key)
-        self.embedder = EdgeEmbedderFAISS(
-            gexf_path=gexf_path,
-            json_path=json_path,
-            embedding_model=embedding_model,
-            openai_api_key=openai_api_key,
+        import networkx as nx
+
+        self.graph: nx.Graph = nx.read_gexf(gexf_path)
+        self.client = client or create_client(api_key=openai_api_key)
+        self.embedder = EdgeIndexSearcher(
             index_path=index_path,
             payload_path=payload_path,
+            embedder=embedder,
+            embedding_model=embedding_model,
             client=self.client,
         )
         self.embedder.load_index()
@@ -99,7 +102,7 @@ class Retriever:
 
         worker_count = max(1, min(self.thread_workers, len(topics)))
         with ThreadPoolExecutor(max_workers=worker_count) as executor:
-            futures = [executor.submit(process_topic, topic) for topic in topics]
+            futures = [submit_in_context(executor, process_topic, topic) for topic in topics]
             for future in as_completed(futures):
                 topic_label, subtopics, entity_ids = future.result()
                 chosen_subtopics[topic_label] = subtopics
@@ -127,13 +130,15 @@ class Retriever:
         chunk_ids: list[str] = []
         seen_chunk_ids: set[str] = set()
         for edge in edges:
-            chunk_id = edge.get("chunk_id")
-            if not isinstance(chunk_id, str) or not chunk_id:
-                continue
-            if chunk_id in seen_chunk_ids:
-                continue
-            seen_chunk_ids.add(chunk_id)
-            chunk_ids.append(chunk_id)
+            for chunk_id in edge.get("chunk_ids") or [edge.get("chunk_id")]:
+                if not isinstance(chunk_id, str) or not chunk_id:
+                    continue
+                if chunk_id in seen_chunk_ids:
+                    continue
+                seen_chunk_ids.add(chunk_id)
+                chunk_ids.append(chunk_id)
+                if len(chunk_ids) >= top_k2:
+                    break
             if len(chunk_ids) >= top_k2:
                 break
 
@@ -146,6 +151,7 @@ class Retriever:
                 "score": edge.get("score"),
                 "rank": edge.get("rank"),
                 "chunk_id": edge.get("chunk_id"),
+                "chunk_ids": edge.get("chunk_ids", []),
             }
             for edge in edges
         ]
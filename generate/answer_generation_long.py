@@ -12,7 +12,6 @@ if str(PROJECT_ROOT) not in sys.path:
 
 import argparse
 import json
-import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Any
@@ -21,17 +20,14 @@ from tqdm import tqdm
 
 from config import get_config
 from generate.graph_based_rag_long import GraphRAG
-
-_THREAD_STATE = threading.local()
+from utils.tracing import summarize_traces, write_trace_records, write_trace_summary
 
 
 
 def get_rag(dataset_name: str) -> GraphRAG:
-    rag = getattr(_THREAD_STATE, "rag", None)
-    if rag is None or getattr(rag, "dataset_name", None) != dataset_name:
-        rag = GraphRAG(dataset_name=dataset_name)
-        _THREAD_STATE.rag = rag
-    return rag
+    """Return a per-call view over the shared, cached artifacts of ``dataset_name``."""
+
+    return GraphRAG(dataset_name=dataset_name)
 
 
 
@@ -44,28 +40,44 @@ def load_questions(input_path: Path) -> list[dict[str, Any]]:
 
 
 
-def main(dataset_name: str, force_rebuild: bool = False) -> str:
+def main(dataset_name: str, force_rebuild: bool = False, stream: bool | None = None) -> str:
     config = get_config(dataset_name)
+    stream = config.stream_answers if stream is None else stream
     input_path = config.get_questions_file()
     output_path = config.get_answer_file(answer_type="long")
     chunk_log_path = config.get_chunk_log_file(answer_type="long")
+    trace_path = config.get_trace_file(answer_type="long")
+    trace_summary_path = config.get_trace_summary_file(answer_type="long")
     temp_output_path = output_path.with_name(output_path.stem + "_temp.json")
 
     questions = load_questions(input_path)
     results: list[dict[str, Any] | None] = [None] * len(questions)
+    traces: list[dict[str, Any] | None] = [None] * len(questions)
 
-    def process(index: int, item: dict[str, Any]) -> tuple[int, dict[str, Any], list[dict[str, str]]]:
+    def process(
+        index: int,
+        item: dict[str, Any],
+    ) -> tuple[int, dict[str, Any], list[dict[str, str]], dict[str, Any] | None]:
         query = str(item.get("query", "")).strip()
         rag = get_rag(dataset_name)
+        answer_stream = rag.stream_answer(query=query) if stream else None
         try:
-            answer_text, elapsed, context_tokens = rag.answer(query=query)
+            if answer_stream is not None:
+                details = answer_stream.consume()
+                answer_text = details["answer"]
+                elapsed = details["retrieval_seconds"]
+                context_tokens = details["context_tokens"]
+                chunk_ids, sentence_chunk_ids = details["chunk_ids"], details["sentence_chunk_ids"]
+            else:
+                answer_text, elapsed, context_tokens = rag.answer(query=query)
+                chunk_ids, sentence_chunk_ids = rag.last_chunk_ids, rag.all_sentence_chunk_ids
             chunk_log_entries = [
                 {"query": query, "chunk_id": chunk_id}
-                for chunk_id in rag.last_chunk_ids
+                for chunk_id in chunk_ids
             ]
             chunk_log_entries.extend(
                 {"query": query, "sentence_chunk_id": chunk_id}
-                for chunk_id in rag.all_sentence_chunk_ids
+                for chunk_id in sentence_chunk_ids
             )
             result = {
                 "query": query,
@@ -85,7 +97,9 @@ def main(dataset_name: str, force_rebuild: bool = False) -> str:
                 },
             }
             chunk_log_entries = []
-        return index, result, chunk_log_entries
+        trace_object = answer_stream.trace if answer_stream is not None else rag.last_trace
+        trace = trace_object.to_dict() if trace_object is not None else None
+        return index, result, chunk_log_entries, trace
 
     output_path.parent.mkdir(parents=True, exist_ok=True)
     chunk_log_path.parent.mkdir(parents=True, exist_ok=True)
@@ -97,8 +111,9 @@ def main(dataset_name: str, force_rebuild: bool = False) -> str:
             tqdm(as_completed(futures), total=len(futures), desc="Generating long answers"),
             start=1,
         ):
-            index, result, chunk_log_entries = future.result()
+            index, result, chunk_log_entries, trace = future.result()
             results[index] = result
+            traces[index] = trace
             log_lines.extend(json.dumps(entry, ensure_ascii=False) for entry in chunk_log_entries)
 
             if completed_count % 10 == 0 or completed_count == len(futures):
@@ -113,6 +128,10 @@ def main(dataset_name: str, force_rebuild: bool = False) -> str:
         if log_lines:
             handle.write("\n".join(log_lines) + "\n")
 
+    trace_records = [trace for trace in traces if trace is not None]
+    write_trace_records(trace_path, trace_records)
+    write_trace_summary(trace_summary_path, summarize_traces(trace_records))
+
     valid_answers = sum(
         1 for item in finalized_results if isinstance(item, dict) and not str(item.get("result", "")).startswith("[Error]")
     )
@@ -121,6 +140,7 @@ def main(dataset_name: str, force_rebuild: bool = False) -> str:
         input_file=str(input_path),
         output_file=str(output_path),
         chunk_log_file=str(chunk_log_path),
+        trace_file=str(trace_path),
         total_questions=len(finalized_results),
         valid_answers=valid_answers,
         force_rebuild=force_rebuild,
@@ -133,6 +153,15 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Generate long answers for a TH-RAG dataset.")
     parser.add_argument("--dataset", required=True, help="Dataset name under data/<dataset>/")
     parser.add_argument("--force", action="store_true", help="Overwrite existing output files.")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        default=None,
+        help="Stream answers and record time-to-first-token (default: STREAM_ANSWERS).",
+    )
     args = parser.parse_args()
-    main(dataset_name=args.dataset, force_rebuild=args.force)
+    from utils.profiling import enable_stack_dumps
+
+    enable_stack_dumps(get_config(args.dataset))
+    main(dataset_name=args.dataset, force_rebuild=args.force, stream=args.stream)
 
@@ -11,6 +11,7 @@ if str(PROJECT_ROOT) not in sys.path:
 
 
 from config import get_config
+from generate.artifacts import DatasetArtifacts
 from generate.graph_rag import GraphRAG as BaseGraphRAG
 from prompt.answer import ANSWER_PROMPT
 
@@ -22,7 +23,7 @@ LONG_SYSTEM_PROMPT = (
 
 
 class GraphRAG(BaseGraphRAG):
-    def __init__(self, dataset_name: str) -> None:
+    def __init__(self, dataset_name: str, artifacts: DatasetArtifacts | None = None) -> None:
         config = get_config(dataset_name)
         super().__init__(
             dataset_name=dataset_name,
@@ -32,5 +33,6 @@ class GraphRAG(BaseGraphRAG):
             default_top_k2=config.top_k2_long,
             temperature=config.answer_temperature,
             max_output_tokens=config.answer_max_tokens,
+            artifacts=artifacts,
         )
 
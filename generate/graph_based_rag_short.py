@@ -11,6 +11,7 @@ if str(PROJECT_ROOT) not in sys.path:
 
 
 from config import get_config
+from generate.artifacts import DatasetArtifacts
 from generate.graph_rag import GraphRAG as BaseGraphRAG
 from prompt.answer_short import ANSWER_PROMPT
 
@@ -22,7 +23,7 @@ SHORT_SYSTEM_PROMPT = (
 
 
 class GraphRAG(BaseGraphRAG):
-    def __init__(self, dataset_name: str) -> None:
+    def __init__(self, dataset_name: str, artifacts: DatasetArtifacts | None = None) -> None:
         config = get_config(dataset_name)
         super().__init__(
             dataset_name=dataset_name,
@@ -32,5 +33,6 @@ class GraphRAG(BaseGraphRAG):
             default_top_k2=config.top_k2,
             temperature=0.0,
             max_output_tokens=max(64, min(256, config.answer_max_tokens)),
+            artifacts=artifacts,
         )
 
@@ -10,21 +10,25 @@ if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
 
-import json
 import time
 from pathlib import Path
-from typing import Any
+from typing import Any, ContextManager, Iterator
 
 import tiktoken
-from openai import OpenAI
 
-from config import get_config
-from generate.Retriever import Retriever
+from generate.artifacts import DatasetArtifacts, get_artifact_manager
+from generate.semantic_cache import SemanticCache, namespace_key
+from utils.hedging import model_call
+from utils.tracing import Trace, activate_trace, record_cache, record_metric, record_usage, span, trace_query
+
+NO_EVIDENCE_ANSWER = "I do not have enough retrieved evidence to answer this question."
 
 
 class GraphRAG:
     """Graph-backed answer generator shared by the short and long answer modes."""
 
+    semantic_cache: SemanticCache | None = None
+
     def __init__(
         self,
         *,
@@ -35,8 +39,8 @@ class GraphRAG:
         default_top_k2: int,
         temperature: float,
         max_output_tokens: int,
+        artifacts: DatasetArtifacts | None = None,
     ) -> None:
-        self.config = get_config(dataset_name)
         self.dataset_name = dataset_name
         self.answer_prompt = answer_prompt
         self.system_prompt = system_prompt
@@ -45,36 +49,24 @@ class GraphRAG:
         self.temperature = temperature
         self.max_output_tokens = max_output_tokens
 
-        if not self.config.openai_api_key:
-            raise ValueError("OPENAI_API_KEY must be configured before answer generation can run.")
-
-        self.client = OpenAI(api_key=self.config.openai_api_key)
-        self.chunk_map = self._load_chunk_map(self.config.get_kv_store_file())
-        self.retriever = Retriever(
-            gexf_path=str(self.config.get_graph_gexf_file()),
-            json_path=str(self.config.get_graph_json_file()),
-            kv_json_path=str(self.config.get_kv_store_file()),
-            index_path=str(self.config.get_edge_index_file()),
-            payload_path=str(self.config.get_edge_payload_file()),
-            embedding_model=self.config.embed_model,
-            openai_api_key=self.config.openai_api_key,
-            client=self.client,
-            thread_workers=self.config.max_workers,
-        )
+        artifacts = artifacts or get_artifact_manager().get(dataset_name)
+        self.artifacts = artifacts
+        self.config = artifacts.config
+        self.client = artifacts.client
+        self.chunk_store = artifacts.chunk_store
+        self.retriever = artifacts.retriever
+        self.semantic_cache = artifacts.semantic_cache
         self.last_chunk_ids: list[str] = []
         self.all_sentence_chunk_ids: list[str] = []
-
-    @staticmethod
-    def _load_chunk_map(path: Path) -> dict[str, str]:
-        with path.open("r", encoding="utf-8") as handle:
-            payload = json.load(handle)
-        return {chunk_id: block["content"] for chunk_id, block in payload.items() if "content" in block}
+        self.last_trace: Trace | None = None
 
     def compose_context(self, chunk_ids: list[str], edges_meta: list[dict[str, Any]]) -> str:
         sections: list[str] = []
 
+        with span("chunk_fetch", chunks=len(chunk_ids)):
+            chunk_texts = self.chunk_store.get_many(chunk_ids)
         for index, chunk_id in enumerate(chunk_ids, start=1):
-            chunk_text = self.chunk_map.get(chunk_id, "")
+            chunk_text = chunk_texts.get(chunk_id, "")
             if chunk_text:
                 sections.append(f"[Chunk {index}]\n{chunk_text}")
 
@@ -94,6 +86,9 @@ class GraphRAG:
             encoding = tiktoken.get_encoding("cl100k_base")
         return len(encoding.encode(text, disallowed_special=()))
 
+    def _trace(self, query: str, top_k1: int, top_k2: int) -> ContextManager[Trace]:
+        return trace_query(dataset=self.dataset_name, query=query, top_k1=top_k1, top_k2=top_k2)
+
     def answer(
         self,
         query: str,
@@ -103,37 +98,269 @@ class GraphRAG:
         top_k1 = top_k1 or self.default_top_k1
         top_k2 = top_k2 or self.default_top_k2
 
+        with self._trace(query, top_k1, top_k2) as trace:
+            self.last_trace = trace
+            details = self._answer_traced(query, top_k1, top_k2)
+        self.last_chunk_ids = details["chunk_ids"]
+        self.all_sentence_chunk_ids = details["sentence_chunk_ids"]
+        return details["answer"], details["retrieval_seconds"], details["context_tokens"]
+
+    def answer_details(
+        self,
+        query: str,
+        top_k1: int | None = None,
+        top_k2: int | None = None,
+    ) -> dict[str, Any]:
+        """Answer ``query`` without touching the shared ``last_*`` attributes.
+
+        Safe to call from many threads on one instance, which is how the query
+        server shares warm artifacts between requests.
+        """
+
+        top_k1 = top_k1 or self.default_top_k1
+        top_k2 = top_k2 or self.default_top_k2
+
+        with self._trace(query, top_k1, top_k2) as trace:
+            details = self._answer_traced(query, top_k1, top_k2)
+        details["trace"] = trace
+        return details
+
+    def retrieve(
+        self,
+        query: str,
+        top_k1: int | None = None,
+        top_k2: int | None = None,
+    ) -> tuple[dict[str, Any], Trace]:
+        top_k1 = top_k1 or self.default_top_k1
+        top_k2 = top_k2 or self.default_top_k2
+
+        with self._trace(query, top_k1, top_k2) as trace:
+            retrieval = self._retrieve(query, top_k1, top_k2)
+        return retrieval, trace
+
+    def _answer_namespace(self, top_k1: int, top_k2: int) -> str | None:
+        """Semantic cache namespace of answers, or None unless ``SEMANTIC_CACHE=answer``."""
+
+        if self.semantic_cache is None or self.config.semantic_cache != "answer":
+            return None
+        return namespace_key(
+            "answer",
+            top_k1=top_k1,
+            top_k2=top_k2,
+            model=self.config.chat_model,
+            answer_prompt=self.answer_prompt,
+            system_prompt=self.system_prompt,
+            temperature=self.temperature,
+            max_output_tokens=self.max_output_tokens,
+        )
+
+    def _cache_lookup(self, kind: str, namespace: str | None, query: str) -> Any | None:
+        if self.semantic_cache is None or namespace is None:
+            return None
+        with span("semantic_cache", kind=kind):
+            found = self.semantic_cache.lookup(namespace, query)
+        record_cache(f"semantic_{kind}", found is not None)
+        if found is None:
+            return None
+        value, similarity = found
+        record_metric(f"semantic_{kind}_similarity", similarity)
+        return value
+
+    def _cache_store(self, namespace: str | None, query: str, value: Any) -> None:
+        if self.semantic_cache is not None and namespace is not None:
+            self.semantic_cache.store(namespace, query, value)
+
+    def _retrieve(self, query: str, top_k1: int, top_k2: int) -> dict[str, Any]:
+        """Retrieve evidence for ``query``, from the semantic cache when a similar query was seen."""
+
+        namespace = namespace_key("retrieval", top_k1=top_k1, top_k2=top_k2) if self.semantic_cache else None
+        retrieval = self._cache_lookup("retrieval", namespace, query)
+        if retrieval is None:
+            with span("retrieval"):
+                retrieval = self.retriever.retrieve(query, top_k1=top_k1, top_k2=top_k2)
+            self._cache_store(namespace, query, retrieval)
+        return retrieval
+
+    def _prepare_answer(self, query: str, top_k1: int, top_k2: int) -> tuple[dict[str, Any], str | None]:
+        """Retrieve evidence and build the answer prompt; ``None`` means no evidence."""
+
         started_at = time.time()
-        retrieval = self.retriever.retrieve(query, top_k1=top_k1, top_k2=top_k2)
+        retrieval = self._retrieve(query, top_k1, top_k2)
         elapsed = time.time() - started_at
 
         chunk_ids = retrieval.get("chunks", [])
         edges_meta = retrieval.get("edges", [])
-        self.last_chunk_ids = chunk_ids
 
         sentence_chunk_ids: list[str] = []
         seen_chunk_ids: set[str] = set()
         for edge in edges_meta:
-            chunk_id = edge.get("chunk_id")
-            if isinstance(chunk_id, str) and chunk_id and chunk_id not in seen_chunk_ids:
-                seen_chunk_ids.add(chunk_id)
-                sentence_chunk_ids.append(chunk_id)
-        self.all_sentence_chunk_ids = sentence_chunk_ids
+            for chunk_id in edge.get("chunk_ids") or [edge.get("chunk_id")]:
+                if isinstance(chunk_id, str) and chunk_id and chunk_id not in seen_chunk_ids:
+                    seen_chunk_ids.add(chunk_id)
+                    sentence_chunk_ids.append(chunk_id)
 
+        details: dict[str, Any] = {
+            "answer": NO_EVIDENCE_ANSWER,
+            "retrieval_seconds": elapsed,
+            "context_tokens": 0,
+            "chunk_ids": chunk_ids,
+            "sentence_chunk_ids": sentence_chunk_ids,
+        }
         if not chunk_ids:
-            return "I do not have enough retrieved evidence to answer this question.", elapsed, 0
+            return details, None
 
-        context = self.compose_context(chunk_ids, edges_meta)
+        with span("compose_context", chunks=len(chunk_ids)):
+            context = self.compose_context(chunk_ids, edges_meta)
+            details["context_tokens"] = self._count_tokens(context)
         prompt = self.answer_prompt.replace("{{question}}", query).replace("{{context}}", context)
-        response = self.client.chat.completions.create(
-            model=self.config.chat_model,
-            messages=[
-                {"role": "system", "content": self.system_prompt},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=self.temperature,
-            max_tokens=self.max_output_tokens,
-        )
-        answer_text = (response.choices[0].message.content or "").strip()
-        return answer_text, elapsed, self._count_tokens(context)
+        return details, prompt
+
+    def _messages(self, prompt: str) -> list[dict[str, str]]:
+        return [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": prompt},
+        ]
+
+    def _answer_traced(self, query: str, top_k1: int, top_k2: int) -> dict[str, Any]:
+        started_at = time.time()
+        namespace = self._answer_namespace(top_k1, top_k2)
+        cached = self._cache_lookup("answer", namespace, query)
+        if cached is not None:
+            cached["retrieval_seconds"] = time.time() - started_at
+            return cached
+
+        details, prompt = self._prepare_answer(query, top_k1, top_k2)
+        if prompt is None:
+            self._cache_store(namespace, query, details)
+            return details
+
+        with span("answer_generation"):
+            response = model_call(
+                "answer_generation",
+                lambda: self.client.chat.completions.create(
+                    model=self.config.chat_model,
+                    messages=self._messages(prompt),
+                    temperature=self.temperature,
+                    max_tokens=self.max_output_tokens,
+                    timeout=self.config.stage_timeout("answer_generation"),
+                ),
+                self.config,
+            )
+            record_usage(response)
+        details["answer"] = (response.choices[0].message.content or "").strip()
+        self._cache_store(namespace, query, details)
+        return details
+
+    def stream_answer(
+        self,
+        query: str,
+        top_k1: int | None = None,
+        top_k2: int | None = None,
+    ) -> AnswerStream:
+        """Return an iterator over answer text as the model produces it.
+
+        The trace records ``ttft_seconds`` (query start to first answer text),
+        ``generation_ttft_seconds`` (request sent to first answer text), and
+        ``tokens_per_second`` over the streamed part of the response. Once the
+        stream is exhausted ``AnswerStream.details`` holds the same fields as
+        ``answer_details``.
+        """
+
+        top_k1 = top_k1 or self.default_top_k1
+        top_k2 = top_k2 or self.default_top_k2
+        trace = Trace(dataset=self.dataset_name, query=query, top_k1=top_k1, top_k2=top_k2, stream=True)
+        stream = AnswerStream(trace)
+        stream.pieces = self._stream_pieces(query, top_k1, top_k2, stream)
+        return stream
+
+    def _stream_pieces(self, query: str, top_k1: int, top_k2: int, stream: AnswerStream) -> Iterator[str]:
+        trace = stream.trace
+        started = time.perf_counter()
+        try:
+            namespace = self._answer_namespace(top_k1, top_k2)
+            with activate_trace(trace):
+                cached = self._cache_lookup("answer", namespace, query)
+                if cached is None:
+                    details, prompt = self._prepare_answer(query, top_k1, top_k2)
+                else:
+                    cached["retrieval_seconds"] = time.perf_counter() - started
+                    details, prompt = cached, None
+            if cached is None and prompt is None:
+                self._cache_store(namespace, query, details)
+            details["trace"] = trace
+            stream.details = details
+            if prompt is None:
+                trace.set_metric("ttft_seconds", time.perf_counter() - started)
+                yield details["answer"]
+                return
+
+            request_started = time.perf_counter()
+            response = self.client.chat.completions.create(
+                model=self.config.chat_model,
+                messages=self._messages(prompt),
+                temperature=self.temperature,
+                max_tokens=self.max_output_tokens,
+                stream=True,
+                stream_options={"include_usage": True},
+                timeout=self.config.stage_timeout("answer_generation"),
+            )
+
+            pieces: list[str] = []
+            first_token_at: float | None = None
+            completion_tokens: int | None = None
+            for chunk in response:
+                usage = getattr(chunk, "usage", None)
+                if usage is not None:
+                    completion_tokens = int(getattr(usage, "completion_tokens", 0) or 0)
+                    trace.add_usage(
+                        "answer_generation",
+                        int(getattr(usage, "prompt_tokens", 0) or 0),
+                        completion_tokens,
+                    )
+                if not chunk.choices:
+                    continue
+                piece = chunk.choices[0].delta.content
+                if not piece:
+                    continue
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    trace.set_metric("ttft_seconds", first_token_at - started)
+                    trace.set_metric("generation_ttft_seconds", first_token_at - request_started)
+                pieces.append(piece)
+                yield piece
+
+            finished_at = time.perf_counter()
+            trace.add_span("answer_generation", finished_at - request_started, stream=True)
+            if first_token_at is not None and finished_at > first_token_at:
+                streamed_tokens = completion_tokens if completion_tokens is not None else len(pieces)
+                trace.set_metric("tokens_per_second", streamed_tokens / (finished_at - first_token_at))
+            details["answer"] = "".join(pieces).strip()
+            self._cache_store(namespace, query, {key: value for key, value in details.items() if key != "trace"})
+        except BaseException as exc:
+            trace.error = str(exc)
+            raise
+        finally:
+            trace.finish()
+
+
+class AnswerStream:
+    """Iterable of answer text pieces from ``GraphRAG.stream_answer``.
+
+    ``details`` is populated once retrieval finishes; ``details["answer"]`` holds
+    the full text after the stream has been consumed.
+    """
+
+    def __init__(self, trace: Trace) -> None:
+        self.trace = trace
+        self.details: dict[str, Any] = {}
+        self.pieces: Iterator[str] = iter(())
+
+    def __iter__(self) -> Iterator[str]:
+        return self.pieces
+
+    def consume(self) -> dict[str, Any]:
+        """Drain the stream and return the final details."""
 
+        for _piece in self.pieces:
+            pass
+        return self.details
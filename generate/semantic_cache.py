@@ -0,0 +1,251 @@
+"""Semantic cache of answered queries for near-duplicate questions.
+
+Queries are embedded with the dataset's query embedder and kept in small FAISS
+inner-product indexes, one per namespace: retrievals are keyed by
+``top_k1``/``top_k2`` and answers additionally by the prompt, model, and
+sampling settings, so short and long answers sharing one dataset never serve
+each other. A lookup hits when the closest cached query is at least
+``threshold`` similar (cosine) and younger than ``ttl_seconds``. Queries that
+only differ in case, whitespace, or trailing punctuation hit without an
+embedding call.
+
+Entries are evicted least recently used once ``max_entries`` is exceeded. The
+cache is tied to a fingerprint of the edge index files and empties itself when
+the index is rebuilt, even before the server reloads the dataset.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+
+import copy
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+from index.embedders import Embedder, normalize_rows
+from index.edge_embedding import index_meta_path
+
+if TYPE_CHECKING:
+    import faiss
+
+SEMANTIC_CACHE_MODES = ("off", "retrieval", "answer")
+
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.。？！]+$")
+
+
+def normalize_query(query: str) -> str:
+    """Case-folded query with collapsed whitespace and no trailing punctuation."""
+
+    return _TRAILING_PUNCTUATION.sub("", " ".join(query.casefold().split()))
+
+
+def namespace_key(kind: str, **settings: Any) -> str:
+    """Stable namespace name for ``kind`` entries produced under ``settings``."""
+
+    digest = hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return f"{kind}:{digest[:16]}"
+
+
+def index_fingerprint(index_path: Path) -> tuple[Any, ...]:
+    """Size and modification time of the edge index and its metadata, or () if not built."""
+
+    parts: list[Any] = []
+    for path in (Path(index_path), index_meta_path(index_path)):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            parts.append(None)
+            continue
+        parts.append((stat.st_size, stat.st_mtime_ns))
+    return tuple(parts)
+
+
+@dataclass
+class _CacheEntry:
+    namespace: str
+    query: str
+    normalized: str
+    value: Any
+    created_at: float
+    hits: int = 0
+
+
+class SemanticCache:
+    """Thread-safe, LRU-evicted FAISS cache of query results.
+
+    ``hits`` counts every hit, of which ``exact_hits`` skipped the embedding.
+    ``ttl_seconds`` of 0 disables expiry. ``index_path`` ties the cache to an
+    edge index; without it the cache is only cleared explicitly.
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        threshold: float = 0.95,
+        max_entries: int = 1024,
+        ttl_seconds: float = 0,
+        index_path: Path | str | None = None,
+    ) -> None:
+        self.embedder = embedder
+        self.threshold = threshold
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.index_path = Path(index_path) if index_path is not None else None
+
+        self._entries: OrderedDict[int, _CacheEntry] = OrderedDict()
+        self._exact: dict[tuple[str, str], int] = {}
+        self._indexes: dict[str, faiss.Index] = {}
+        self._vectors: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._next_id = 0
+        self._fingerprint = self._current_fingerprint()
+        self._lock = threading.Lock()
+        self._counters = {
+            "lookups": 0,
+            "hits": 0,
+            "exact_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+        }
+
+    def _current_fingerprint(self) -> tuple[Any, ...]:
+        return index_fingerprint(self.index_path) if self.index_path is not None else ()
+
+    def _embed(self, normalized: str) -> np.ndarray:
+        with self._lock:
+            vector = self._vectors.get(normalized)
+            if vector is not None:
+                self._vectors.move_to_end(normalized)
+                return vector
+        vector = normalize_rows(self.embedder.embed(normalized).reshape(1, -1))
+        with self._lock:
+            self._vectors[normalized] = vector
+            while len(self._vectors) > self.max_entries:
+                self._vectors.popitem(last=False)
+        return vector
+
+    def lookup(self, namespace: str, query: str) -> tuple[Any, float] | None:
+        """Return a copy of the cached value for ``query`` and its similarity, or None."""
+
+        normalized = normalize_query(query)
+        self._check_fingerprint()
+        with self._lock:
+            self._counters["lookups"] += 1
+            entry_id = self._exact.get((namespace, normalized))
+            if entry_id is not None and self._alive_locked(entry_id):
+                self._counters["exact_hits"] += 1
+                return self._hit_locked(entry_id), 1.0
+            if namespace not in self._indexes:
+                self._counters["misses"] += 1
+                return None
+
+        vector = self._embed(normalized)
+        with self._lock:
+            index = self._indexes.get(namespace)
+            if index is not None and index.ntotal:
+                scores, ids = index.search(vector, 1)
+                entry_id, score = int(ids[0][0]), float(scores[0][0])
+                if entry_id >= 0 and score >= self.threshold and self._alive_locked(entry_id):
+                    return self._hit_locked(entry_id), score
+            self._counters["misses"] += 1
+            return None
+
+    def store(self, namespace: str, query: str, value: Any) -> None:
+        """Cache ``value`` as the result of ``query`` in ``namespace``."""
+
+        import faiss
+
+        normalized = normalize_query(query)
+        vector = self._embed(normalized)
+        with self._lock:
+            previous = self._exact.get((namespace, normalized))
+            if previous is not None:
+                self._remove_locked(previous)
+            index = self._indexes.get(namespace)
+            if index is None:
+                index = self._indexes[namespace] = faiss.IndexIDMap2(faiss.IndexFlatIP(vector.shape[1]))
+            entry_id = self._next_id
+            self._next_id += 1
+            index.add_with_ids(vector, np.array([entry_id], dtype="int64"))
+            self._entries[entry_id] = _CacheEntry(namespace, query, normalized, copy.deepcopy(value), time.time())
+            self._exact[(namespace, normalized)] = entry_id
+            self._counters["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._remove_locked(next(iter(self._entries)))
+                self._counters["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._exact.clear()
+            self._indexes.clear()
+            self._vectors.clear()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["lookups"]
+            namespaces: dict[str, int] = {}
+            for entry in self._entries.values():
+                namespaces[entry.namespace] = namespaces.get(entry.namespace, 0) + 1
+            return {
+                **self._counters,
+                "hit_rate": self._counters["hits"] / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "ttl_seconds": self.ttl_seconds,
+                "namespaces": namespaces,
+            }
+
+    def _check_fingerprint(self) -> None:
+        fingerprint = self._current_fingerprint()
+        with self._lock:
+            if fingerprint == self._fingerprint:
+                return
+            self._fingerprint = fingerprint
+            self._entries.clear()
+            self._exact.clear()
+            self._indexes.clear()
+            self._counters["invalidations"] += 1
+
+    def _alive_locked(self, entry_id: int) -> bool:
+        entry = self._entries.get(entry_id)
+        if entry is None:
+            return False
+        if self.ttl_seconds and time.time() - entry.created_at > self.ttl_seconds:
+            self._remove_locked(entry_id)
+            self._counters["expirations"] += 1
+            return False
+        return True
+
+    def _hit_locked(self, entry_id: int) -> Any:
+        entry = self._entries[entry_id]
+        self._entries.move_to_end(entry_id)
+        entry.hits += 1
+        self._counters["hits"] += 1
+        return copy.deepcopy(entry.value)
+
+    def _remove_locked(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        if self._exact.get((entry.namespace, entry.normalized)) == entry_id:
+            del self._exact[(entry.namespace, entry.normalized)]
+        index = self._indexes[entry.namespace]
+        index.remove_ids(np.array([entry_id], dtype="int64"))
+        if not index.ntotal:
+            del self._indexes[entry.namespace]
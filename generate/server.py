@@ -0,0 +1,370 @@
+"""Long-running TH-RAG query server with warm, hot-reloadable artifacts.
+
+The graph, FAISS index, payloads, and chunk map of each dataset are loaded once
+into the shared ``ArtifactManager`` and reused by every request. A rebuilt index is
+picked up with ``POST /reload``: the new artifacts are loaded next to the old ones
+and swapped in atomically, so in-flight requests finish on the artifacts they
+started with.
+
+Endpoints (JSON in, JSON out):
+
+* ``POST /retrieve`` and ``POST /answer`` with ``{"query", "dataset"?, "top_k1"?, "top_k2"?}``;
+  ``/answer`` with ``"stream": true`` returns NDJSON ``{"delta": ...}`` lines and a final
+  ``{"done": true, ...}`` line
+* ``POST /reload`` with ``{"dataset"?}``
+* ``GET /health`` and ``GET /stats``
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+
+import argparse
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Iterator
+
+from config import get_config
+from generate.artifacts import ArtifactManager, DatasetArtifacts, get_artifact_manager
+from generate.graph_rag import GraphRAG
+from utils.tracing import summarize_traces
+
+ANSWER_TYPES = ("short", "long")
+
+
+def default_rag_factory(answer_type: str) -> Callable[[str, DatasetArtifacts], GraphRAG]:
+    if answer_type == "short":
+        from generate.graph_based_rag_short import GraphRAG as AnswerGraphRAG
+    elif answer_type == "long":
+        from generate.graph_based_rag_long import GraphRAG as AnswerGraphRAG
+    else:
+        raise ValueError(f"Unknown answer type '{answer_type}'. Expected one of: {', '.join(ANSWER_TYPES)}.")
+
+    def factory(dataset_name: str, artifacts: DatasetArtifacts) -> GraphRAG:
+        return AnswerGraphRAG(dataset_name, artifacts=artifacts)
+
+    return factory
+
+
+class QueryService:
+    """Serve queries from shared, LRU-cached dataset artifacts with rolling latency stats.
+
+    A ``GraphRAG`` view is created per request from the artifacts held by an
+    ``ArtifactManager``, so datasets can be evicted, prefetched, and reloaded
+    without pinning old artifacts.
+    """
+
+    def __init__(
+        self,
+        datasets: list[str],
+        answer_type: str = "short",
+        rag_factory: Callable[[str, Any], Any] | None = None,
+        artifacts: ArtifactManager | None = None,
+        stats_window: int = 1000,
+    ) -> None:
+        if not datasets:
+            raise ValueError("At least one dataset must be served.")
+        self.datasets = list(dict.fromkeys(datasets))
+        self.answer_type = answer_type
+        self.rag_factory = rag_factory or default_rag_factory(answer_type)
+        self.artifacts = artifacts or get_artifact_manager()
+        self.started_at = time.time()
+
+        self._records: deque[dict[str, Any]] = deque(maxlen=max(1, stats_window))
+        self._records_lock = threading.Lock()
+        self._requests = {"retrieve": 0, "answer": 0, "reload": 0, "errors": 0}
+
+    def resolve_dataset(self, dataset: str | None) -> str:
+        if dataset is None:
+            if len(self.datasets) != 1:
+                raise ValueError(f"'dataset' is required; this server hosts: {', '.join(self.datasets)}")
+            return self.datasets[0]
+        if dataset not in self.datasets:
+            raise ValueError(f"Dataset '{dataset}' is not served here. Available: {', '.join(self.datasets)}")
+        return dataset
+
+    def get(self, dataset: str | None = None) -> Any:
+        """Return a ``GraphRAG`` for ``dataset``, loading its artifacts if they are not cached."""
+
+        dataset = self.resolve_dataset(dataset)
+        return self.rag_factory(dataset, self.artifacts.get(dataset))
+
+    def preload(self, wait: bool = True) -> None:
+        """Load every served dataset, in the background unless ``wait`` is set."""
+
+        futures = [self.artifacts.prefetch(dataset) for dataset in self.datasets]
+        if wait:
+            for future in futures:
+                future.result()
+
+    def reload(self, dataset: str | None = None) -> dict[str, Any]:
+        """Load fresh artifacts for ``dataset`` and swap them in.
+
+        If loading fails the previous artifacts keep serving and the error is raised.
+        """
+
+        dataset = self.resolve_dataset(dataset)
+        result = self.artifacts.reload(dataset)
+        self._count("reload")
+        return result
+
+    def retrieve(
+        self,
+        query: str,
+        dataset: str | None = None,
+        top_k1: int | None = None,
+        top_k2: int | None = None,
+    ) -> dict[str, Any]:
+        dataset = self.resolve_dataset(dataset)
+        rag = self.get(dataset)
+        retrieval, trace = rag.retrieve(query, top_k1=top_k1, top_k2=top_k2)
+        self._record("retrieve", trace.to_dict())
+        return {"dataset": dataset, **retrieval, "latency_seconds": trace.total_seconds}
+
+    def answer(
+        self,
+        query: str,
+        dataset: str | None = None,
+        top_k1: int | None = None,
+        top_k2: int | None = None,
+    ) -> dict[str, Any]:
+        dataset = self.resolve_dataset(dataset)
+        rag = self.get(dataset)
+        details = rag.answer_details(query, top_k1=top_k1, top_k2=top_k2)
+        trace = details.pop("trace")
+        self._record("answer", trace.to_dict())
+        return {"dataset": dataset, "query": query, **details, "latency_seconds": trace.total_seconds}
+
+    def stream_answer(
+        self,
+        query: str,
+        dataset: str | None = None,
+        top_k1: int | None = None,
+        top_k2: int | None = None,
+    ) -> Iterator[dict[str, Any]]:
+        """Yield ``{"delta": text}`` events followed by one ``{"done": True, ...}`` event."""
+
+        dataset = self.resolve_dataset(dataset)
+        answer_stream = self.get(dataset).stream_answer(query, top_k1=top_k1, top_k2=top_k2)
+        return self._stream_events(dataset, query, answer_stream)
+
+    def _stream_events(self, dataset: str, query: str, answer_stream: Any) -> Iterator[dict[str, Any]]:
+        try:
+            for piece in answer_stream:
+                yield {"delta": piece}
+        finally:
+            self._record("answer", answer_stream.trace.to_dict())
+
+        details = {key: value for key, value in answer_stream.details.items() if key != "trace"}
+        yield {
+            "done": True,
+            "dataset": dataset,
+            "query": query,
+            **details,
+            "latency_seconds": answer_stream.trace.total_seconds,
+            "metrics": dict(answer_stream.trace.metrics),
+        }
+
+    def _count(self, name: str) -> None:
+        with self._records_lock:
+            self._requests[name] += 1
+
+    def _record(self, endpoint: str, trace: dict[str, Any]) -> None:
+        with self._records_lock:
+            self._requests[endpoint] += 1
+            self._records.append({**trace, "endpoint": endpoint})
+
+    def record_error(self) -> None:
+        self._count("errors")
+
+    def health(self) -> dict[str, Any]:
+        artifacts = self.artifacts.stats()
+        return {
+            "status": "ok",
+            "answer_type": self.answer_type,
+            "uptime_seconds": time.time() - self.started_at,
+            "datasets": self.datasets,
+            "loaded": {name: info for name, info in artifacts["datasets"].items() if name in self.datasets},
+            "loading": [name for name in artifacts["loading"] if name in self.datasets],
+        }
+
+    def stats(self) -> dict[str, Any]:
+        with self._records_lock:
+            records = list(self._records)
+            requests = dict(self._requests)
+        return {
+            "requests": requests,
+            "window": len(records),
+            "endpoints": {
+                endpoint: summarize_traces([record for record in records if record["endpoint"] == endpoint])
+                for endpoint in ("retrieve", "answer")
+            },
+            "datasets": {
+                dataset: summarize_traces([record for record in records if record.get("dataset") == dataset])
+                for dataset in self.datasets
+            },
+            "artifacts": {
+                key: value for key, value in self.artifacts.stats().items() if key not in ("datasets", "loading")
+            },
+        }
+
+
+def _top_k(payload: dict[str, Any], key: str) -> int | None:
+    """Read an optional positive integer ``key`` from a request body."""
+
+    value = payload.get(key)
+    if value is None:
+        return None
+    message = f"'{key}' must be a positive integer."
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(message)
+    try:
+        top_k = int(value)
+    except ValueError:
+        raise ValueError(message) from None
+    if top_k < 1:
+        raise ValueError(message)
+    return top_k
+
+
+def make_handler(service: QueryService) -> type[BaseHTTPRequestHandler]:
+    class QueryRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args: Any) -> None:
+            return
+
+        def _send_json(self, status: int, payload: dict[str, Any]) -> None:
+            body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_stream(self, events: Iterator[dict[str, Any]]) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            try:
+                for event in events:
+                    line = json.dumps(event, ensure_ascii=False, default=str) + "\n"
+                    self.wfile.write(line.encode("utf-8"))
+                    self.wfile.flush()
+            except Exception as exc:
+                service.record_error()
+                self.wfile.write((json.dumps({"error": str(exc)}) + "\n").encode("utf-8"))
+
+        def _read_json(self) -> dict[str, Any]:
+            length = int(self.headers.get("Content-Length") or 0)
+            if not length:
+                return {}
+            payload = json.loads(self.rfile.read(length).decode("utf-8"))
+            if not isinstance(payload, dict):
+                raise ValueError("Request body must be a JSON object.")
+            return payload
+
+        def do_GET(self) -> None:
+            if self.path == "/health":
+                self._send_json(200, service.health())
+            elif self.path == "/stats":
+                self._send_json(200, service.stats())
+            else:
+                self._send_json(404, {"error": f"Unknown endpoint: {self.path}"})
+
+        def do_POST(self) -> None:
+            try:
+                payload = self._read_json()
+                if self.path == "/reload":
+                    result = service.reload(payload.get("dataset"))
+                elif self.path in ("/retrieve", "/answer"):
+                    query = str(payload.get("query", "")).strip()
+                    if not query:
+                        raise ValueError("'query' is required.")
+                    top_k1, top_k2 = _top_k(payload, "top_k1"), _top_k(payload, "top_k2")
+                    if self.path == "/answer" and payload.get("stream"):
+                        events = service.stream_answer(
+                            query,
+                            dataset=payload.get("dataset"),
+                            top_k1=top_k1,
+                            top_k2=top_k2,
+                        )
+                        self._send_stream(events)
+                        return
+                    handler = service.retrieve if self.path == "/retrieve" else service.answer
+                    result = handler(
+                        query,
+                        dataset=payload.get("dataset"),
+                        top_k1=top_k1,
+                        top_k2=top_k2,
+                    )
+                else:
+                    self._send_json(404, {"error": f"Unknown endpoint: {self.path}"})
+                    return
+            except (ValueError, json.JSONDecodeError) as exc:
+                service.record_error()
+                self._send_json(400, {"error": str(exc)})
+                return
+            except Exception as exc:
+                service.record_error()
+                self._send_json(500, {"error": str(exc)})
+                return
+            self._send_json(200, result)
+
+    return QueryRequestHandler
+
+
+def create_server(service: QueryService, host: str, port: int) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    return server
+
+
+def main(
+    datasets: list[str],
+    answer_type: str = "short",
+    host: str | None = None,
+    port: int | None = None,
+    preload: str = "wait",
+) -> None:
+    config = get_config()
+    service = QueryService(datasets, answer_type=answer_type, stats_window=config.server_stats_window)
+    if preload != "lazy":
+        service.preload(wait=preload == "wait")
+
+    server = create_server(service, host or config.server_host, config.server_port if port is None else port)
+    bound_host, bound_port = server.server_address[:2]
+    print(f"Serving {', '.join(service.datasets)} ({answer_type} answers) on http://{bound_host}:{bound_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve TH-RAG retrieval and answers over HTTP.")
+    parser.add_argument("--dataset", nargs="+", required=True, help="Dataset name(s) under data/<dataset>/")
+    parser.add_argument("--answer-type", choices=ANSWER_TYPES, default="short", help="Answer prompt to use")
+    parser.add_argument("--host", help="Bind address (default: SERVER_HOST)")
+    parser.add_argument("--port", type=int, help="Port (default: SERVER_PORT)")
+    parser.add_argument(
+        "--preload",
+        choices=("wait", "background", "lazy"),
+        default="wait",
+        help="Load datasets before serving, in the background while serving, or on first request",
+    )
+    args = parser.parse_args()
+    main(args.dataset, answer_type=args.answer_type, host=args.host, port=args.port, preload=args.preload)
@@ -0,0 +1,358 @@
+"""Batch-endpoint triple extraction for TH-RAG graph construction.
+
+With ``EXTRACTION_MODE=batch`` the chunks that need extraction are written as
+chat-completion requests to JSONL files of up to ``BATCH_MAX_REQUESTS`` lines,
+each file is uploaded and submitted as a batch as soon as it is full, and the
+batches are polled until they finish. Results are parsed into the same blocks as
+synchronous extraction, keyed by ``chunk_id`` through the request ``custom_id``.
+
+Every submitted batch is recorded in ``results/index/<dataset>_batches/batches.json``
+together with a hash of each chunk's text. An interrupted run resumes by polling
+the batches it already submitted instead of submitting their chunks again.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from contextlib import ExitStack
+from typing import Any, Callable, Iterable, Iterator, TextIO
+
+from tqdm import tqdm
+
+from config import THRAGConfig, get_config
+from index.chunk_store import ChunkStoreWriter, KVStoreJsonWriter, SQLiteChunkStore
+from index.graph_construction import (
+    error_block,
+    extraction_messages,
+    parse_triples_response,
+    reusable_block,
+    save_blocks,
+)
+from utils.openai_client import create_client
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+# Batches that may still deliver results for their chunks.
+_LIVE_STATUSES = ("validating", "in_progress", "finalizing", "completed")
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def extraction_request(chunk_id: str, chunk: str, model_name: str, max_tokens: int) -> dict[str, Any]:
+    """One batch input line: the same request ``call_model`` sends synchronously."""
+
+    return {
+        "custom_id": chunk_id,
+        "method": "POST",
+        "url": BATCH_ENDPOINT,
+        "body": {
+            "model": model_name,
+            "messages": extraction_messages(chunk),
+            "temperature": 0.0,
+            "max_tokens": max_tokens,
+            "response_format": {"type": "text"},
+        },
+    }
+
+
+def parse_batch_output_line(line: str) -> tuple[str, list[dict[str, Any]] | None, str | None]:
+    """Return ``(chunk_id, triples, error)`` for one line of a batch output or error file."""
+
+    record = json.loads(line)
+    chunk_id = str(record.get("custom_id", ""))
+    if record.get("error"):
+        error = record["error"]
+        return chunk_id, None, str(error.get("message", error) if isinstance(error, dict) else error)
+
+    response = record.get("response") or {}
+    if response.get("status_code", 200) != 200:
+        return chunk_id, None, f"HTTP {response.get('status_code')}: {json.dumps(response.get('body'))[:500]}"
+    try:
+        content = response["body"]["choices"][0]["message"]["content"] or "[]"
+        return chunk_id, parse_triples_response(content), None
+    except (KeyError, IndexError, TypeError, ValueError) as exc:
+        return chunk_id, None, f"Unparseable batch result: {exc}"
+
+
+def _file_text(content: Any) -> str:
+    text = getattr(content, "text", None)
+    if isinstance(text, str):
+        return text
+    data = content.read()
+    return data.decode("utf-8") if isinstance(data, bytes) else str(data)
+
+
+class BatchExtractor:
+    """Write, submit, poll, and collect extraction batches with a resumable manifest."""
+
+    def __init__(
+        self,
+        client: Any,
+        work_dir: Path,
+        model_name: str,
+        max_tokens: int,
+        max_requests: int = 50000,
+        completion_window: str = "24h",
+        poll_seconds: float = 60.0,
+    ) -> None:
+        self.client = client
+        self.work_dir = Path(work_dir)
+        self.model_name = model_name
+        self.max_tokens = max_tokens
+        self.max_requests = max(1, max_requests)
+        self.completion_window = completion_window
+        self.poll_seconds = poll_seconds
+
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.work_dir / "batches.json"
+        self.batches: list[dict[str, Any]] = self._load_manifest()
+        self._submitted: dict[str, tuple[int, str]] = {
+            chunk_id: (position, digest)
+            for position, batch in enumerate(self.batches)
+            if batch.get("status") in _LIVE_STATUSES
+            for chunk_id, digest in batch["chunks"].items()
+        }
+        self.wanted: set[str] = set()
+        self.resumed = 0
+        self.submitted = 0
+        self._handle: TextIO | None = None
+        self._current: dict[str, Any] | None = None
+
+    def _load_manifest(self) -> list[dict[str, Any]]:
+        if not self.manifest_path.exists():
+            return []
+        with self.manifest_path.open("r", encoding="utf-8") as handle:
+            return json.load(handle).get("batches", [])
+
+    def _save_manifest(self) -> None:
+        temp_path = self.manifest_path.with_name(self.manifest_path.name + ".tmp")
+        with temp_path.open("w", encoding="utf-8") as handle:
+            json.dump({"batches": self.batches}, handle, indent=2)
+        os.replace(temp_path, self.manifest_path)
+
+    def add(self, chunk_id: str, chunk: str) -> None:
+        """Queue a chunk, unless a live batch already holds the same text."""
+
+        self.wanted.add(chunk_id)
+        digest = chunk_hash(chunk)
+        submitted = self._submitted.get(chunk_id)
+        if submitted is not None and submitted[1] == digest:
+            self.resumed += 1
+            return
+
+        if self._current is None:
+            name = f"batch-{len(self.batches):05d}"
+            self._current = {"name": name, "input_file": f"{name}.jsonl", "chunks": {}, "status": "pending"}
+            self._handle = (self.work_dir / self._current["input_file"]).open("w", encoding="utf-8")
+        request = extraction_request(chunk_id, chunk, self.model_name, self.max_tokens)
+        self._handle.write(json.dumps(request, ensure_ascii=False) + "\n")
+        self._current["chunks"][chunk_id] = digest
+        if len(self._current["chunks"]) >= self.max_requests:
+            self.flush()
+
+    def flush(self) -> None:
+        """Upload and submit the batch file being written, if any."""
+
+        if self._current is None or self._handle is None:
+            return
+        self._handle.close()
+        batch, self._current, self._handle = self._current, None, None
+
+        with (self.work_dir / batch["input_file"]).open("rb") as handle:
+            uploaded = self.client.files.create(file=handle, purpose="batch")
+        submitted = self.client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=self.completion_window,
+            metadata={"source": "thrag-graph-construction", "name": batch["name"]},
+        )
+        batch.update(file_id=uploaded.id, batch_id=submitted.id, status=submitted.status)
+        self.batches.append(batch)
+        position = len(self.batches) - 1
+        for chunk_id, digest in batch["chunks"].items():
+            self._submitted[chunk_id] = (position, digest)
+        self.submitted += len(batch["chunks"])
+        self._save_manifest()
+
+    def _needed_positions(self) -> list[int]:
+        return sorted({self._submitted[chunk_id][0] for chunk_id in self.wanted if chunk_id in self._submitted})
+
+    def _needed_batches(self) -> list[dict[str, Any]]:
+        return [self.batches[position] for position in self._needed_positions()]
+
+    def wait(self) -> None:
+        """Poll the batches holding wanted chunks until all of them have finished."""
+
+        needed = self._needed_batches()
+        with tqdm(total=len(needed), desc="Waiting for batches", unit="batch") as progress:
+            progress.update(sum(batch["status"] in BATCH_TERMINAL_STATUSES for batch in needed))
+            while True:
+                pending = [batch for batch in needed if batch["status"] not in BATCH_TERMINAL_STATUSES]
+                for batch in pending:
+                    remote = self.client.batches.retrieve(batch["batch_id"])
+                    batch["status"] = remote.status
+                    batch["output_file_id"] = getattr(remote, "output_file_id", None)
+                    batch["error_file_id"] = getattr(remote, "error_file_id", None)
+                    if remote.status in BATCH_TERMINAL_STATUSES:
+                        progress.update(1)
+                self._save_manifest()
+                if all(batch["status"] in BATCH_TERMINAL_STATUSES for batch in needed):
+                    return
+                time.sleep(self.poll_seconds)
+
+    def _result_lines(self, batch: dict[str, Any]) -> Iterator[str]:
+        for key, suffix in [("output_file_id", "output"), ("error_file_id", "errors")]:
+            if not batch.get(key):
+                continue
+            local_path = self.work_dir / f"{batch['name']}.{suffix}.jsonl"
+            if not local_path.exists():
+                temp_path = local_path.with_name(local_path.name + ".tmp")
+                temp_path.write_text(_file_text(self.client.files.content(batch[key])), encoding="utf-8")
+                os.replace(temp_path, local_path)
+            with local_path.open("r", encoding="utf-8") as handle:
+                yield from (line for line in handle if line.strip())
+
+    def results(self) -> Iterator[tuple[str, list[dict[str, Any]] | None, str | None]]:
+        """Yield ``(chunk_id, triples, error)`` for every wanted chunk.
+
+        Chunks without a result line, for example from failed or expired batches,
+        are reported with an error naming the batch status.
+        """
+
+        seen: set[str] = set()
+
+        def owned(chunk_id: str, position: int) -> bool:
+            # A chunk resubmitted after its text changed is answered by its newest batch only.
+            return chunk_id in self.wanted and chunk_id not in seen and self._submitted[chunk_id][0] == position
+
+        for position in self._needed_positions():
+            batch = self.batches[position]
+            for line in self._result_lines(batch):
+                chunk_id, triples, error = parse_batch_output_line(line)
+                if owned(chunk_id, position):
+                    seen.add(chunk_id)
+                    yield chunk_id, triples, error
+            for chunk_id in batch["chunks"]:
+                if owned(chunk_id, position):
+                    seen.add(chunk_id)
+                    yield chunk_id, None, f"No result from batch {batch['batch_id']} ({batch['status']})."
+
+
+def extract_chunk_batches(
+    config: THRAGConfig,
+    chunks: Iterable[tuple[str, str, str | None]],
+    existing_blocks: dict[str, dict[str, Any]],
+    output_path: Path,
+    on_block: Callable[[dict[str, Any]], None] | None = None,
+) -> tuple[list[dict[str, Any]], dict[str, int]]:
+    """Batch-endpoint counterpart of ``graph_construction.extract_chunk_stream``."""
+
+    client = create_client(config)
+    extractor = BatchExtractor(
+        client,
+        config.get_batch_dir(),
+        config.default_model,
+        config.max_tokens_response,
+        max_requests=config.batch_max_requests,
+        completion_window=config.batch_completion_window,
+        poll_seconds=config.batch_poll_seconds,
+    )
+
+    order: list[str] = []
+    doc_ids: dict[str, str] = {}
+    completed: dict[str, dict[str, Any]] = {}
+
+    def with_doc_id(block: dict[str, Any]) -> dict[str, Any]:
+        doc_id = doc_ids.get(block["chunk_id"])
+        return block if doc_id is None else {**block, "doc_id": doc_id}
+
+    with ExitStack() as stack:
+        store = stack.enter_context(ChunkStoreWriter(config.get_chunk_store_file(), config.chunk_store_compression))
+        kv_writer = (
+            stack.enter_context(KVStoreJsonWriter(config.get_kv_store_file())) if config.write_kv_store_json else None
+        )
+        for chunk_id, chunk, doc_id in chunks:
+            store.add(chunk_id, chunk, doc_id)
+            if kv_writer is not None:
+                kv_writer.add(chunk_id, chunk, doc_id)
+            order.append(chunk_id)
+            if doc_id is not None:
+                doc_ids[chunk_id] = doc_id
+
+            existing_block = reusable_block(existing_blocks, chunk_id, chunk)
+            if existing_block is not None:
+                completed[chunk_id] = existing_block
+                if on_block is not None:
+                    on_block(with_doc_id(existing_block))
+            else:
+                extractor.add(chunk_id, chunk)
+        extractor.flush()
+
+    failed = 0
+    if extractor.wanted:
+        extractor.wait()
+        chunk_store = SQLiteChunkStore(config.get_chunk_store_file())
+        pending: list[tuple[str, list[dict[str, Any]] | None, str | None]] = []
+
+        def ingest() -> None:
+            texts = chunk_store.get_many(chunk_id for chunk_id, _triples, _error in pending)
+            for chunk_id, triples, error in pending:
+                if error is None:
+                    completed[chunk_id] = {"chunk_id": chunk_id, "content": texts[chunk_id], "triples": triples}
+                else:
+                    completed[chunk_id] = error_block(chunk_id, texts[chunk_id], RuntimeError(error))
+                if on_block is not None:
+                    on_block(with_doc_id(completed[chunk_id]))
+            pending.clear()
+
+        for result in extractor.results():
+            pending.append(result)
+            failed += result[2] is not None
+            if len(pending) >= 1000:
+                ingest()
+        ingest()
+
+    final_blocks = [with_doc_id(completed[chunk_id]) for chunk_id in order if chunk_id in completed]
+    save_blocks(output_path, final_blocks)
+    report = {
+        "mode": "batch",
+        "chunks": len(extractor.wanted),
+        "batches": len(extractor._needed_batches()),
+        "submitted": extractor.submitted,
+        "resumed": extractor.resumed,
+        "failed": failed,
+    }
+    return final_blocks, report
+
+
+def show_status(dataset_name: str) -> None:
+    config = get_config(dataset_name)
+    manifest_path = config.get_batch_dir() / "batches.json"
+    if not manifest_path.exists():
+        print(f"No extraction batches recorded for {dataset_name}.")
+        return
+    with manifest_path.open("r", encoding="utf-8") as handle:
+        batches = json.load(handle).get("batches", [])
+    for batch in batches:
+        print(f"{batch['name']}  {batch.get('batch_id', '-')}  {batch['status']}  {len(batch['chunks'])} chunks")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show the extraction batches recorded for a dataset.")
+    parser.add_argument("--dataset", required=True, help="Dataset name under data/<dataset>/")
+    args = parser.parse_args()
+    show_status(args.dataset)
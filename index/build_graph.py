@@ -13,9 +13,6 @@ if str(PROJECT_ROOT) not in sys.path:
 import argparse
 
 from config import get_config
-from index.edge_embedding import build_index_for_dataset
-from index.graph_construction import main as run_graph_construction
-from index.json_to_gexf import convert_json_to_gexf
 
 
 def main(
@@ -24,9 +21,27 @@ def main(
     skip_gexf: bool = False,
     skip_index: bool = False,
     force_rebuild: bool = False,
+    stream: bool = False,
 ) -> None:
+    from index.edge_embedding import build_index_for_dataset
+    from index.graph_construction import main as run_graph_construction
+    from index.json_to_gexf import convert_json_to_gexf, dataset_label_aliases
+    from index.streaming_build import run_streaming_build
+
     config = get_config(dataset_name)
 
+    if stream and config.rewrites_graph_labels():
+        print(
+            "Streaming graph build disabled: ENTITY_CANONICALIZATION and TOPIC_CONSOLIDATION "
+            "rewrite labels from every triple before the graph is built."
+        )
+        stream = False
+
+    if stream and not (skip_extraction or skip_gexf or skip_index):
+        run_streaming_build(config, force_rebuild=force_rebuild)
+        print(f"Graph-building pipeline completed for dataset: {dataset_name}")
+        return
+
     if not skip_extraction:
         run_graph_construction(dataset_name=dataset_name, force_rebuild=force_rebuild)
 
@@ -36,7 +51,8 @@ def main(
             raise FileNotFoundError(
                 f"Graph JSON file not found. Run extraction first: {graph_json_path}"
             )
-        convert_json_to_gexf(str(graph_json_path), str(config.get_graph_gexf_file()))
+        aliases = dataset_label_aliases(config)
+        convert_json_to_gexf(str(graph_json_path), str(config.get_graph_gexf_file()), aliases)
         config.mark_step_completed("json_to_gexf", output_file=str(config.get_graph_gexf_file()))
 
     if not skip_index:
@@ -52,6 +68,11 @@ if __name__ == "__main__":
     parser.add_argument("--skip-gexf", action="store_true", help="Skip GEXF conversion.")
     parser.add_argument("--skip-index", action="store_true", help="Skip FAISS index creation.")
     parser.add_argument("--force", action="store_true", help="Rebuild outputs even if they exist.")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Overlap extraction, GEXF building, and edge embedding (ignored with any --skip-* flag).",
+    )
     args = parser.parse_args()
     main(
         dataset_name=args.dataset,
@@ -59,5 +80,6 @@ if __name__ == "__main__":
         skip_gexf=args.skip_gexf,
         skip_index=args.skip_index,
         force_rebuild=args.force,
+        stream=args.stream,
     )
 
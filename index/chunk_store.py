@@ -0,0 +1,299 @@
+"""Random-access chunk store for TH-RAG.
+
+Chunk text is written by graph construction into a single SQLite file keyed by
+chunk ID, optionally zlib-compressed per chunk. Answer generation fetches only the
+chunks it puts into a prompt, so memory use does not grow with the corpus. Datasets
+built before the store existed fall back to the JSON KV store.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from typing import Iterable, Mapping
+
+from config import THRAGConfig, get_config
+
+CHUNK_STORE_COMPRESSIONS = ("none", "zlib")
+
+_SCHEMA = """
+CREATE TABLE chunks (chunk_id TEXT PRIMARY KEY, content BLOB NOT NULL, doc_id TEXT) WITHOUT ROWID;
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+_LOOKUP_BATCH = 500
+
+
+class ChunkStoreWriter:
+    """Incrementally write a new SQLite chunk store.
+
+    Rows go to a temporary file that replaces ``path`` only when the writer is
+    closed without an error, so readers never see a partial store.
+    """
+
+    def __init__(self, path: str | Path, compression: str = "none", batch_size: int = 1000) -> None:
+        if compression not in CHUNK_STORE_COMPRESSIONS:
+            raise ValueError(
+                f"Unknown CHUNK_STORE_COMPRESSION '{compression}'. "
+                f"Expected one of: {', '.join(CHUNK_STORE_COMPRESSIONS)}."
+            )
+        self.path = Path(path)
+        self.compression = compression
+        self.batch_size = batch_size
+        self.count = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._temp_path = self.path.with_name(self.path.name + ".tmp")
+        if self._temp_path.exists():
+            self._temp_path.unlink()
+        self._connection = sqlite3.connect(self._temp_path)
+        self._connection.executescript(_SCHEMA)
+        self._batch: list[tuple[str, bytes, str | None]] = []
+
+    def add(self, chunk_id: str, text: str, doc_id: str | None = None) -> None:
+        data = text.encode("utf-8")
+        self._batch.append((chunk_id, zlib.compress(data) if self.compression == "zlib" else data, doc_id))
+        if len(self._batch) >= self.batch_size:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._batch:
+            self._connection.executemany("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?)", self._batch)
+            self.count += len(self._batch)
+            self._batch.clear()
+
+    def close(self) -> None:
+        self._flush()
+        self._connection.executemany(
+            "INSERT INTO meta VALUES (?, ?)",
+            [("compression", self.compression), ("chunks", str(self.count))],
+        )
+        self._connection.commit()
+        self._connection.close()
+        os.replace(self._temp_path, self.path)
+
+    def abort(self) -> None:
+        self._connection.close()
+        self._temp_path.unlink(missing_ok=True)
+
+    def __enter__(self) -> "ChunkStoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_chunk_store(
+    path: str | Path,
+    chunks: Iterable[tuple[str, str]],
+    compression: str = "none",
+    batch_size: int = 1000,
+) -> int:
+    """Write ``(chunk_id, text)`` pairs to a new chunk store and return the count."""
+
+    with ChunkStoreWriter(path, compression, batch_size) as writer:
+        for chunk_id, text in chunks:
+            writer.add(chunk_id, text)
+    return writer.count
+
+
+class KVStoreJsonWriter:
+    """Stream chunks into the legacy ``{chunk_id: {"content": ...}}`` JSON KV store.
+
+    Like ``ChunkStoreWriter``, chunks go to a temporary file that replaces the
+    store only on ``close``, so an interrupted run keeps the previous store.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._temp_path = self.path.with_name(self.path.name + ".tmp")
+        self._handle = self._temp_path.open("w", encoding="utf-8")
+        self._handle.write("{")
+        self._first = True
+
+    def add(self, chunk_id: str, text: str, doc_id: str | None = None) -> None:
+        separator = "\n" if self._first else ",\n"
+        self._first = False
+        block = {"content": text} if doc_id is None else {"content": text, "doc_id": doc_id}
+        entry = json.dumps(block, ensure_ascii=False)
+        self._handle.write(f"{separator}  {json.dumps(chunk_id)}: {entry}")
+
+    def close(self) -> None:
+        self._handle.write("\n}\n" if not self._first else "}\n")
+        self._handle.close()
+        os.replace(self._temp_path, self.path)
+
+    def abort(self) -> None:
+        self._handle.close()
+        self._temp_path.unlink(missing_ok=True)
+
+    def __enter__(self) -> "KVStoreJsonWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class SQLiteChunkStore:
+    """Read-only, thread-safe view of a chunk store written by ``write_chunk_store``."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        if not self.path.exists():
+            raise FileNotFoundError(f"Chunk store not found: {self.path}")
+        self._local = threading.local()
+        meta = dict(self._connection().execute("SELECT key, value FROM meta").fetchall())
+        self.compression = meta.get("compression", "none")
+        self._length = int(meta.get("chunks", 0))
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+            self._local.connection = connection
+        return connection
+
+    def _decode(self, data: bytes) -> str:
+        if self.compression == "zlib":
+            data = zlib.decompress(data)
+        return data.decode("utf-8")
+
+    def get(self, chunk_id: str, default: str | None = None) -> str | None:
+        row = self._connection().execute("SELECT content FROM chunks WHERE chunk_id = ?", (chunk_id,)).fetchone()
+        return self._decode(row[0]) if row else default
+
+    def get_many(self, chunk_ids: Iterable[str]) -> dict[str, str]:
+        """Return the text of every found chunk in ``chunk_ids``."""
+
+        wanted = list(dict.fromkeys(chunk_ids))
+        found: dict[str, str] = {}
+        connection = self._connection()
+        for start in range(0, len(wanted), _LOOKUP_BATCH):
+            batch = wanted[start : start + _LOOKUP_BATCH]
+            placeholders = ",".join("?" for _ in batch)
+            rows = connection.execute(
+                f"SELECT chunk_id, content FROM chunks WHERE chunk_id IN ({placeholders})",
+                batch,
+            ).fetchall()
+            found.update((chunk_id, self._decode(content)) for chunk_id, content in rows)
+        return found
+
+    def get_doc_ids(self, chunk_ids: Iterable[str]) -> dict[str, str]:
+        """Return the source document ID of every found chunk that has one."""
+
+        wanted = list(dict.fromkeys(chunk_ids))
+        found: dict[str, str] = {}
+        connection = self._connection()
+        for start in range(0, len(wanted), _LOOKUP_BATCH):
+            batch = wanted[start : start + _LOOKUP_BATCH]
+            placeholders = ",".join("?" for _ in batch)
+            try:
+                rows = connection.execute(
+                    f"SELECT chunk_id, doc_id FROM chunks WHERE doc_id IS NOT NULL AND chunk_id IN ({placeholders})",
+                    batch,
+                ).fetchall()
+            except sqlite3.OperationalError:
+                # Stores written before document IDs were recorded have no doc_id column.
+                return {}
+            found.update(rows)
+        return found
+
+    def __contains__(self, chunk_id: object) -> bool:
+        return bool(
+            self._connection().execute("SELECT 1 FROM chunks WHERE chunk_id = ?", (chunk_id,)).fetchone()
+        )
+
+    def __len__(self) -> int:
+        return self._length
+
+
+class InMemoryChunkStore:
+    """Chunk store over an in-memory mapping, used for legacy JSON KV stores."""
+
+    def __init__(self, chunks: Mapping[str, str], doc_ids: Mapping[str, str] | None = None) -> None:
+        self.chunks = dict(chunks)
+        self.doc_ids = dict(doc_ids or {})
+
+    @classmethod
+    def from_kv_store(cls, path: str | Path) -> "InMemoryChunkStore":
+        with Path(path).open("r", encoding="utf-8") as handle:
+            payload = json.load(handle)
+        return cls(
+            {chunk_id: block["content"] for chunk_id, block in payload.items() if "content" in block},
+            {chunk_id: block["doc_id"] for chunk_id, block in payload.items() if block.get("doc_id")},
+        )
+
+    def get(self, chunk_id: str, default: str | None = None) -> str | None:
+        return self.chunks.get(chunk_id, default)
+
+    def get_many(self, chunk_ids: Iterable[str]) -> dict[str, str]:
+        return {chunk_id: self.chunks[chunk_id] for chunk_id in chunk_ids if chunk_id in self.chunks}
+
+    def get_doc_ids(self, chunk_ids: Iterable[str]) -> dict[str, str]:
+        return {chunk_id: self.doc_ids[chunk_id] for chunk_id in chunk_ids if chunk_id in self.doc_ids}
+
+    def __contains__(self, chunk_id: object) -> bool:
+        return chunk_id in self.chunks
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+
+ChunkStore = SQLiteChunkStore | InMemoryChunkStore
+
+
+def open_chunk_store(config: THRAGConfig) -> ChunkStore:
+    """Open the dataset's SQLite chunk store, or its JSON KV store if that is all there is."""
+
+    store_path = config.get_chunk_store_file()
+    if store_path.exists():
+        return SQLiteChunkStore(store_path)
+
+    kv_store_path = config.get_kv_store_file()
+    if kv_store_path.exists():
+        return InMemoryChunkStore.from_kv_store(kv_store_path)
+    raise FileNotFoundError(f"Neither a chunk store ({store_path}) nor a KV store ({kv_store_path}) exists.")
+
+
+def migrate_kv_store(dataset_name: str, compression: str | None = None) -> str:
+    """Build the SQLite chunk store of a dataset from its existing JSON KV store."""
+
+    config = get_config(dataset_name)
+    kv_store_path = config.get_kv_store_file()
+    if not kv_store_path.exists():
+        raise FileNotFoundError(f"KV store not found: {kv_store_path}")
+
+    store = InMemoryChunkStore.from_kv_store(kv_store_path)
+    store_path = config.get_chunk_store_file()
+    with ChunkStoreWriter(store_path, compression or config.chunk_store_compression) as writer:
+        for chunk_id, text in store.chunks.items():
+            writer.add(chunk_id, text, store.doc_ids.get(chunk_id))
+    count = writer.count
+    print(f"Wrote {count} chunks to {store_path}")
+    return str(store_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a SQLite chunk store from a dataset's JSON KV store.")
+    parser.add_argument("--dataset", required=True, help="Dataset name under data/<dataset>/")
+    parser.add_argument("--compression", choices=CHUNK_STORE_COMPRESSIONS, help="Default: CHUNK_STORE_COMPRESSION")
+    args = parser.parse_args()
+    migrate_kv_store(args.dataset, compression=args.compression)
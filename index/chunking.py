@@ -0,0 +1,239 @@
+"""Streaming, parallel token-window chunking for large ``contexts.txt`` files.
+
+The file is read in segments that end on line or document boundaries chosen so
+that the encoding's pre-tokenizer splits the same way it would on the whole text.
+Segments are tokenised in a process pool and consumed in order, and overlapping
+windows are emitted as soon as enough tokens are available. The windows are
+identical to those of ``graph_construction.chunk_text`` on the full text.
+
+Multi-document corpora are chunked per document instead, one document per pool
+task, so that no window spans two documents.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+
+import hashlib
+import os
+import re
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Iterable, Iterator, Sequence
+
+import tiktoken
+
+# After a run of newlines that ends right before non-whitespace, preferring runs
+# that contain a blank line (a document break).
+_DOCUMENT_BREAK = re.compile(r"\n\s*\n(?=\S)")
+_LINE_BREAK = re.compile(r"\n(?=\S)")
+# Encodings without a newline-run rule (r50k/p50k) only split safely at a single
+# newline between two non-whitespace characters.
+_SINGLE_LINE_BREAK = re.compile(r"(?<=\S)\n(?=\S)")
+_BOUNDARY_SEARCH_CHARS = 1 << 20
+
+_WORKER_ENCODING: tiktoken.Encoding | None = None
+
+
+def segment_boundaries(encoding: tiktoken.Encoding) -> tuple[re.Pattern[str], ...]:
+    """Return boundary patterns, most preferred first, that are safe for ``encoding``."""
+
+    pattern = getattr(encoding, "_pat_str", "")
+    if r"\s*[\r\n]" in pattern:
+        return (_DOCUMENT_BREAK, _LINE_BREAK)
+    return (_SINGLE_LINE_BREAK,)
+
+
+def _last_boundary(buffer: str, patterns: tuple[re.Pattern[str], ...]) -> int:
+    start = max(0, len(buffer) - _BOUNDARY_SEARCH_CHARS)
+    for pattern in patterns:
+        position = -1
+        for match in pattern.finditer(buffer, start):
+            position = match.end()
+        if position > 0:
+            return position
+    return -1
+
+
+def iter_text_segments(
+    path: str | Path,
+    encoding: tiktoken.Encoding,
+    segment_chars: int = 4_000_000,
+) -> Iterator[str]:
+    """Yield consecutive pieces of ``path`` that tokenise independently.
+
+    The file is decoded with universal newlines, as ``Path.read_text`` does. A
+    segment grows past ``segment_chars`` only when no safe boundary is found.
+    """
+
+    patterns = segment_boundaries(encoding)
+    buffer = ""
+    with Path(path).open("r", encoding="utf-8") as handle:
+        while True:
+            block = handle.read(segment_chars)
+            if not block:
+                break
+            buffer += block
+            if len(buffer) < segment_chars:
+                continue
+            boundary = _last_boundary(buffer, patterns)
+            if boundary > 0:
+                yield buffer[:boundary]
+                buffer = buffer[boundary:]
+    if buffer:
+        yield buffer
+
+
+def _init_worker(encoding_name: str) -> None:
+    global _WORKER_ENCODING
+    _WORKER_ENCODING = tiktoken.get_encoding(encoding_name)
+
+
+def _encode_segment(segment: str) -> list[int]:
+    if _WORKER_ENCODING is None:
+        raise RuntimeError("Tokenizer worker was started without an encoding.")
+    return _WORKER_ENCODING.encode(segment)
+
+
+def iter_segment_tokens(
+    segments: Iterable[str],
+    encoding: tiktoken.Encoding,
+    workers: int = 1,
+) -> Iterator[list[int]]:
+    """Tokenise ``segments`` in order, in a process pool when ``workers`` > 1."""
+
+    if workers <= 1:
+        for segment in segments:
+            yield encoding.encode(segment)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(encoding.name,)) as executor:
+        pending: deque[Future] = deque()
+        for segment in segments:
+            pending.append(executor.submit(_encode_segment, segment))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def iter_token_windows(
+    token_batches: Iterable[list[int]],
+    encoding: tiktoken.Encoding,
+    max_tokens: int,
+    overlap: int,
+) -> Iterator[str]:
+    """Decode overlapping ``max_tokens`` windows from a stream of token batches."""
+
+    if max_tokens <= 0 or not 0 <= overlap < max_tokens:
+        raise ValueError("Chunking requires MAX_TOKENS > 0 and 0 <= OVERLAP < MAX_TOKENS.")
+
+    buffer: list[int] = []
+    offset = 0
+    start = 0
+    last_end = 0
+    for batch in token_batches:
+        buffer.extend(batch)
+        while offset + len(buffer) >= start + max_tokens:
+            end = start + max_tokens
+            yield encoding.decode(buffer[start - offset : end - offset])
+            last_end = end
+            start = end - overlap
+            del buffer[: start - offset]
+            offset = start
+
+    total = offset + len(buffer)
+    if total > last_end:
+        yield encoding.decode(buffer[start - offset :])
+
+
+def iter_file_chunks(
+    path: str | Path,
+    max_tokens: int,
+    overlap: int,
+    model_name: str | None = None,
+    *,
+    encoding: tiktoken.Encoding | None = None,
+    workers: int | None = None,
+    segment_chars: int = 4_000_000,
+) -> Iterator[str]:
+    """Stream the overlapping token windows of a text file.
+
+    Files no larger than one segment are tokenised in-process; larger ones use
+    ``workers`` tokenizer processes (default: one per CPU).
+    """
+
+    encoding = encoding or tiktoken.encoding_for_model(model_name or "gpt-4o-mini")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if Path(path).stat().st_size <= segment_chars:
+        workers = 1
+    segments = iter_text_segments(path, encoding, segment_chars)
+    return iter_token_windows(iter_segment_tokens(segments, encoding, workers), encoding, max_tokens, overlap)
+
+
+
+def read_document(path: str | Path) -> tuple[str, str]:
+    """Return the SHA-256 of a file's bytes and its text with universal newlines."""
+
+    data = Path(path).read_bytes()
+    text = data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+    return hashlib.sha256(data).hexdigest(), text
+
+
+def chunk_document(
+    path: str | Path,
+    encoding: tiktoken.Encoding,
+    max_tokens: int,
+    overlap: int,
+) -> tuple[str, list[str]]:
+    """Return the SHA-256 and the overlapping token windows of one document."""
+
+    digest, text = read_document(path)
+    return digest, list(iter_token_windows([encoding.encode(text)], encoding, max_tokens, overlap))
+
+
+def _chunk_document_worker(path: str, max_tokens: int, overlap: int) -> tuple[str, list[str]]:
+    if _WORKER_ENCODING is None:
+        raise RuntimeError("Tokenizer worker was started without an encoding.")
+    return chunk_document(path, _WORKER_ENCODING, max_tokens, overlap)
+
+
+def iter_document_chunks(
+    paths: Sequence[str | Path],
+    max_tokens: int,
+    overlap: int,
+    model_name: str | None = None,
+    *,
+    encoding: tiktoken.Encoding | None = None,
+    workers: int | None = None,
+) -> Iterator[tuple[str, list[str]]]:
+    """Yield ``(sha256, chunks)`` for each document in ``paths``, in order.
+
+    Documents are chunked on ``workers`` processes (default: one per CPU) with a
+    bounded number of documents in flight.
+    """
+
+    encoding = encoding or tiktoken.encoding_for_model(model_name or "gpt-4o-mini")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(paths))
+    if workers <= 1:
+        for path in paths:
+            yield chunk_document(path, encoding, max_tokens, overlap)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(encoding.name,)) as executor:
+        pending: deque[Future] = deque()
+        for path in paths:
+            pending.append(executor.submit(_chunk_document_worker, str(path), max_tokens, overlap))
+            if len(pending) >= workers * 4:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,207 @@
+"""Multi-document corpora for TH-RAG graph construction.
+
+Besides a single ``contexts.txt``, a dataset can provide its corpus as a
+``documents/`` directory or as a ``manifest.jsonl`` listing document files. Each
+document is chunked on its own, its chunks are tagged with its document ID, and
+a per-dataset state file records the size, modification time, and SHA-256 of
+every ingested document so that unchanged documents are neither re-read,
+re-chunked, nor re-extracted on the next run.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Iterator
+
+import tiktoken
+
+from index.chunking import iter_document_chunks
+from utils.manifests import file_sha256
+
+
+@dataclass(frozen=True)
+class Document:
+    doc_id: str
+    path: Path
+
+
+@dataclass
+class IngestPlan:
+    """Which documents of a corpus must be chunked again and which can be reused."""
+
+    documents: list[Document]
+    unchanged: set[str] = field(default_factory=set)
+    removed: list[str] = field(default_factory=list)
+    records: dict[str, dict[str, Any]] = field(default_factory=dict)
+
+    @property
+    def changed(self) -> list[Document]:
+        return [document for document in self.documents if document.doc_id not in self.unchanged]
+
+
+def is_document_corpus(path: Path) -> bool:
+    return path.is_dir() or path.suffix == ".jsonl"
+
+
+def document_chunk_id(doc_id: str, index: int) -> str:
+    """Stable chunk ID of the ``index``-th chunk of a document."""
+
+    digest = hashlib.sha1(doc_id.encode("utf-8")).hexdigest()[:12]
+    return f"doc-{digest}-{index:05d}"
+
+
+def discover_documents(source: Path, extensions: Iterable[str] = (".txt", ".md")) -> list[Document]:
+    """List the documents of a ``documents/`` directory or a ``manifest.jsonl``.
+
+    Directory documents are the files with one of ``extensions`` (hidden files and
+    directories are skipped), identified by their path relative to the directory.
+    Manifest lines are a JSON string path or an object with ``path`` and an
+    optional ``doc_id``; relative paths are resolved against the manifest's folder.
+    """
+
+    if source.is_dir():
+        suffixes = {extension.lower() for extension in extensions}
+        documents = [
+            Document(path.relative_to(source).as_posix(), path)
+            for path in source.rglob("*")
+            if path.is_file()
+            and path.suffix.lower() in suffixes
+            and not any(part.startswith(".") for part in path.relative_to(source).parts)
+        ]
+        return sorted(documents, key=lambda document: document.doc_id)
+
+    documents: list[Document] = []
+    seen: set[str] = set()
+    with source.open("r", encoding="utf-8") as handle:
+        for line_number, line in enumerate(handle, start=1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if isinstance(entry, str):
+                entry = {"path": entry}
+            if not isinstance(entry, dict) or not entry.get("path"):
+                raise ValueError(f"{source}:{line_number}: expected a path string or an object with a 'path' field.")
+
+            path = Path(entry["path"])
+            if not path.is_absolute():
+                path = source.parent / path
+            if not path.is_file():
+                raise FileNotFoundError(f"{source}:{line_number}: document not found: {path}")
+            doc_id = str(entry.get("doc_id") or entry["path"])
+            if doc_id in seen:
+                raise ValueError(f"{source}:{line_number}: duplicate document ID '{doc_id}'.")
+            seen.add(doc_id)
+            documents.append(Document(doc_id, path))
+    return documents
+
+
+def load_document_state(path: Path) -> dict[str, Any]:
+    if not path.exists():
+        return {}
+    with path.open("r", encoding="utf-8") as handle:
+        try:
+            return json.load(handle)
+        except json.JSONDecodeError:
+            return {}
+
+
+def save_document_state(path: Path, state: dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(path.name + ".tmp")
+    with temp_path.open("w", encoding="utf-8") as handle:
+        json.dump(state, handle, indent=2, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+def plan_ingest(
+    documents: list[Document],
+    previous_state: dict[str, Any],
+    chunking: dict[str, Any],
+    existing_blocks: dict[str, dict[str, Any]],
+) -> IngestPlan:
+    """Decide which documents are unchanged since the previous run.
+
+    A document is unchanged when the chunking settings are the same, every one of
+    its previous chunks still has an extracted block, and either its size and
+    modification time match or, failing that, its SHA-256 does.
+    """
+
+    plan = IngestPlan(documents)
+    previous = previous_state.get("documents", {}) if previous_state.get("chunking") == chunking else {}
+    current_ids = {document.doc_id for document in documents}
+    plan.removed = sorted(set(previous_state.get("documents", {})) - current_ids)
+
+    for document in documents:
+        record = previous.get(document.doc_id)
+        if not record:
+            continue
+        if any(
+            "content" not in existing_blocks.get(document_chunk_id(document.doc_id, index), {})
+            for index in range(int(record.get("chunks", 0)))
+        ):
+            continue
+
+        stat = document.path.stat()
+        if (stat.st_size, stat.st_mtime_ns) != (record.get("size"), record.get("mtime_ns")):
+            if stat.st_size != record.get("size") or file_sha256(document.path) != record.get("sha256"):
+                continue
+        plan.unchanged.add(document.doc_id)
+        plan.records[document.doc_id] = {**record, "path": str(document.path), "mtime_ns": stat.st_mtime_ns}
+    return plan
+
+
+def iter_corpus_chunks(
+    plan: IngestPlan,
+    existing_blocks: dict[str, dict[str, Any]],
+    max_tokens: int,
+    overlap: int,
+    model_name: str | None = None,
+    *,
+    encoding: tiktoken.Encoding | None = None,
+    workers: int | None = None,
+) -> Iterator[tuple[str, str, str]]:
+    """Yield ``(chunk_id, text, doc_id)`` for every document of ``plan``, in order.
+
+    Unchanged documents are replayed from their extracted blocks; changed ones are
+    chunked in a process pool while earlier chunks are already being extracted.
+    ``plan.records`` is updated with each changed document's new state.
+    """
+
+    changed = plan.changed
+    fresh = iter_document_chunks(
+        [document.path for document in changed],
+        max_tokens,
+        overlap,
+        model_name,
+        encoding=encoding,
+        workers=workers,
+    )
+    for document in plan.documents:
+        if document.doc_id in plan.unchanged:
+            for index in range(int(plan.records[document.doc_id]["chunks"])):
+                chunk_id = document_chunk_id(document.doc_id, index)
+                yield chunk_id, existing_blocks[chunk_id]["content"], document.doc_id
+            continue
+
+        digest, chunks = next(fresh)
+        stat = document.path.stat()
+        plan.records[document.doc_id] = {
+            "path": str(document.path),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": digest,
+            "chunks": len(chunks),
+        }
+        for index, chunk in enumerate(chunks):
+            yield document_chunk_id(document.doc_id, index), chunk, document.doc_id
@@ -1,4 +1,10 @@
-"""FAISS edge embedding utilities for TH-RAG."""
+"""FAISS edge embedding utilities for TH-RAG.
+
+faiss and networkx are imported where they are first needed, so command-line
+tools that only import this module for its helpers start quickly. numpy stays
+a module-level import: ``index.embedders`` already loads it at import time, so
+deferring it here would not save anything.
+"""
 
 from __future__ import annotations
 
@@ -13,151 +19,173 @@ if str(PROJECT_ROOT) not in sys.path:
 import argparse
 import json
 import os
-from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
-import faiss
-import networkx as nx
 import numpy as np
-from openai import OpenAI
-from tqdm import tqdm
 
 from config import THRAGConfig, get_config
+from index.embedders import Embedder, OpenAIEmbedder, create_embedder
+from utils.openai_client import create_client
+from utils.tracing import span
+
+if TYPE_CHECKING:
+    import faiss
+    import networkx as nx
+    from openai import OpenAI
 
 if "SSL_CERT_FILE" in os.environ:
     os.environ.pop("SSL_CERT_FILE")
 
+INDEX_STORAGES = ("flat", "fp16", "sq8", "pq")
 
 
-def build_sent2chunk(graph_json_path: str) -> dict[str, str]:
-    """Map extracted evidence sentences to their originating chunk IDs."""
 
-    with Path(graph_json_path).open("r", encoding="utf-8") as handle:
-        payload = json.load(handle)
+def index_meta_path(index_path: str | Path) -> Path:
+    """Return the metadata file stored next to a FAISS index."""
 
-    mapping: dict[str, str] = {}
-    if not isinstance(payload, list):
-        return mapping
+    return Path(index_path).with_suffix(".meta.json")
 
-    for block in payload:
-        if not isinstance(block, dict):
-            continue
-        chunk_id = str(block.get("chunk_id", ""))
-        for item in block.get("triples", []):
-            if not isinstance(item, dict):
-                continue
-            sentence_value = item.get("sentence")
-            if isinstance(sentence_value, str) and sentence_value.strip():
-                mapping[sentence_value.strip()] = chunk_id
-            elif isinstance(sentence_value, list):
-                for sentence in sentence_value:
-                    if isinstance(sentence, str) and sentence.strip():
-                        mapping[sentence.strip()] = chunk_id
-    return mapping
 
 
-class EdgeEmbedderFAISS:
-    """Build and query a FAISS index over predicate-edge evidence sentences."""
+def create_faiss_index(
+    vectors: np.ndarray,
+    storage: str = "flat",
+    pq_m: int = 32,
+    pq_nbits: int = 8,
+) -> faiss.Index:
+    """Build an inner-product index over ``vectors`` with the requested storage.
 
-    def __init__(
-        self,
-        gexf_path: str,
-        json_path: str,
-        embedding_model: str,
-        openai_api_key: str | None,
-        index_path: str,
-        payload_path: str,
-        client: OpenAI | None = None,
-    ) -> None:
-        if not openai_api_key:
-            raise ValueError("OPENAI_API_KEY must be configured before building embeddings.")
+    ``flat`` keeps float32 vectors, ``fp16`` and ``sq8`` use FAISS scalar
+    quantizers, and ``pq`` stores ``pq_m`` product-quantizer codes per vector.
+    """
 
-        self.graph = nx.read_gexf(gexf_path)
-        self.embedding_model = embedding_model
-        self.client = client or OpenAI(api_key=openai_api_key)
-        self.index_path = str(index_path)
-        self.payload_path = str(payload_path)
-        self.sent2chunk = build_sent2chunk(json_path)
+    import faiss
 
-        self.index: faiss.IndexFlatIP | None = None
-        self.payloads: list[dict[str, Any]] = []
-        self.edge_records = self._collect_edge_records()
+    dim = vectors.shape[1]
+    if storage == "flat":
+        index = faiss.IndexFlatIP(dim)
+    elif storage == "fp16":
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT)
+    elif storage == "sq8":
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+    elif storage == "pq":
+        if dim % pq_m:
+            raise ValueError(f"PQ_M={pq_m} must divide the embedding dimension {dim}.")
+        if len(vectors) < 2**pq_nbits:
+            print(
+                f"Only {len(vectors)} vectors are available but PQ with {pq_nbits} bits needs at least "
+                f"{2**pq_nbits} to train. Falling back to sq8 storage."
+            )
+            return create_faiss_index(vectors, "sq8")
+        index = faiss.IndexPQ(dim, pq_m, pq_nbits, faiss.METRIC_INNER_PRODUCT)
+    else:
+        raise ValueError(f"Unknown INDEX_STORAGE '{storage}'. Expected one of: {', '.join(INDEX_STORAGES)}.")
 
-    def _collect_edge_records(self) -> list[dict[str, Any]]:
-        records: list[dict[str, Any]] = []
-        seen_sentences: set[str] = set()
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    return index
 
-        for source_id, target_id, data in self.graph.edges(data=True):
-            if data.get("relation_type") != "predicate_relation":
-                continue
 
-            sentence_block = str(data.get("sentence", "")).strip()
-            if not sentence_block:
-                continue
 
-            source_label = str(self.graph.nodes[source_id].get("label", source_id))
-            target_label = str(self.graph.nodes[target_id].get("label", target_id))
-            edge_label = str(data.get("label", "")).strip()
+def built_index_storage(index: faiss.Index) -> str:
+    """Storage kind of a built index, which is sq8 when PQ had too few vectors to train."""
 
-            for sentence in [part.strip() for part in sentence_block.split(" / ") if part.strip()]:
-                if sentence in seen_sentences:
-                    continue
-                seen_sentences.add(sentence)
-                records.append(
-                    {
-                        "source_id": source_id,
-                        "target_id": target_id,
-                        "source": source_label,
-                        "target": target_label,
-                        "label": edge_label,
-                        "sentence": sentence,
-                        "chunk_id": self.sent2chunk.get(sentence),
-                    }
-                )
-
-        return records
+    import faiss
 
-    def _embed(self, text: str) -> np.ndarray:
-        response = self.client.embeddings.create(input=[text], model=self.embedding_model)
-        embedding = np.array(response.data[0].embedding, dtype="float32")
-        norm = np.linalg.norm(embedding)
-        return embedding if norm == 0 else embedding / norm
+    if isinstance(index, faiss.IndexPQ):
+        return "pq"
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        return "fp16" if index.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else "sq8"
+    return "flat"
 
-    def build_index(self, max_workers: int = 4) -> None:
-        if not self.edge_records:
-            raise ValueError("No predicate-edge sentences were found in the graph.")
 
-        first_vector = self._embed(self.edge_records[0]["sentence"])
-        self.index = faiss.IndexFlatIP(len(first_vector))
 
-        vectors: list[np.ndarray] = [first_vector]
-        payloads: list[dict[str, Any]] = [self.edge_records[0]]
+def edge_sentence_provenance(data: dict[str, Any]) -> dict[str, list[str]]:
+    """Return the evidence sentences of a predicate edge mapped to their chunk IDs.
 
-        remaining = self.edge_records[1:]
+    Graphs written by ``json_to_gexf`` store exact per-sentence provenance. Older
+    graphs only carry the edge-level ``chunk_ids``, which are attributed to every
+    sentence on the edge.
+    """
 
-        def embed_record(record: dict[str, Any]) -> tuple[np.ndarray, dict[str, Any]]:
-            return self._embed(record["sentence"]), record
+    provenance = data.get("sentence_chunk_ids")
+    if provenance:
+        return {sentence: list(chunk_ids) for sentence, chunk_ids in json.loads(provenance).items()}
 
-        if remaining:
-            worker_count = max(1, max_workers)
-            with ThreadPoolExecutor(max_workers=worker_count) as executor:
-                for vector, payload in tqdm(
-                    executor.map(embed_record, remaining),
-                    total=len(remaining),
-                    desc="Embedding predicate edges",
-                ):
-                    vectors.append(vector)
-                    payloads.append(payload)
+    chunk_ids = sorted(filter(None, str(data.get("chunk_ids", "")).split(" / ")))
+    sentence_block = str(data.get("sentence", "")).strip()
+    return {part.strip(): chunk_ids for part in sentence_block.split(" / ") if part.strip()}
 
-        self.index.add(np.vstack(vectors))
-        self.payloads = payloads
-        faiss.write_index(self.index, self.index_path)
-        np.save(self.payload_path, np.array(self.payloads, dtype=object))
+
+def resolve_embedder(
+    embedder: Embedder | None,
+    embedding_model: str,
+    openai_api_key: str | None,
+    client: OpenAI | None,
+) -> Embedder:
+    """Return ``embedder`` or an OpenAI embedder for ``embedding_model``."""
+
+    if embedder is not None:
+        return embedder
+    if client is None and not openai_api_key:
+        raise ValueError("OPENAI_API_KEY must be configured before building embeddings.")
+    return OpenAIEmbedder(
+        client or create_client(api_key=openai_api_key),
+        embedding_model,
+        batch_size=get_config().batch_size,
+    )
+
+
+class EdgeIndexSearcher:
+    """Query a built FAISS edge index without touching the source graph.
+
+    Only the index, its payload store, and its metadata are opened, so startup cost
+    scales with the index rather than the raw graph.
+    """
+
+    def __init__(
+        self,
+        index_path: str,
+        payload_path: str,
+        embedder: Embedder | None = None,
+        embedding_model: str = "",
+        openai_api_key: str | None = None,
+        client: OpenAI | None = None,
+    ) -> None:
+        self.embedder = resolve_embedder(embedder, embedding_model, openai_api_key, client)
+        self.embedding_model = embedding_model
+        self.index_path = str(index_path)
+        self.payload_path = str(payload_path)
+
+        self.index: faiss.Index | None = None
+        self.payloads: list[dict[str, Any]] = []
+
+    def _embed(self, text: str) -> np.ndarray:
+        return self.embedder.embed(text)
+
+    def _check_embedder_identity(self) -> None:
+        meta_path = index_meta_path(self.index_path)
+        if not meta_path.exists():
+            return
+
+        with meta_path.open("r", encoding="utf-8") as handle:
+            stored = json.load(handle).get("embedder")
+        current = self.embedder.identity()
+        if stored != current:
+            raise ValueError(
+                f"The edge index at {self.index_path} was built with embedder {stored}, "
+                f"but queries would be embedded with {current}. Rebuild the index or restore "
+                "the original EMBED_BACKEND/EMBED_MODEL settings."
+            )
 
     def load_index(self) -> None:
+        import faiss
+
         self.index = faiss.read_index(self.index_path)
         self.payloads = np.load(self.payload_path, allow_pickle=True).tolist()
+        self._check_embedder_identity()
 
     def search(
         self,
@@ -178,8 +206,10 @@ class EdgeEmbedderFAISS:
         if search_k == 0:
             return []
 
-        query_vector = self._embed(query).reshape(1, -1)
-        distances, indices = self.index.search(query_vector, search_k)
+        with span("embed_query"):
+            query_vector = self._embed(query).reshape(1, -1)
+        with span("faiss_search", search_k=search_k, filtered=bool(filter_entities)):
+            distances, indices = self.index.search(query_vector, search_k)
 
         results: list[dict[str, Any]] = []
         for distance, payload_index in zip(distances[0], indices[0], strict=False):
@@ -200,6 +230,7 @@ class EdgeEmbedderFAISS:
                     "label": payload["label"],
                     "sentence": payload["sentence"],
                     "chunk_id": payload.get("chunk_id"),
+                    "chunk_ids": payload.get("chunk_ids") or ([payload["chunk_id"]] if payload.get("chunk_id") else []),
                     "score": float(distance),
                     "rank": len(results) + 1,
                 }
@@ -210,32 +241,148 @@ class EdgeEmbedderFAISS:
         return results
 
 
+class EdgeEmbedderFAISS(EdgeIndexSearcher):
+    """Build a FAISS index over predicate-edge evidence sentences of a GEXF graph."""
+
+    def __init__(
+        self,
+        gexf_path: str,
+        embedding_model: str,
+        openai_api_key: str | None,
+        index_path: str,
+        payload_path: str,
+        client: OpenAI | None = None,
+        embedder: Embedder | None = None,
+        index_storage: str = "flat",
+        pq_m: int = 32,
+        pq_nbits: int = 8,
+    ) -> None:
+        super().__init__(
+            index_path,
+            payload_path,
+            embedder=embedder,
+            embedding_model=embedding_model,
+            openai_api_key=openai_api_key,
+            client=client,
+        )
+        import networkx as nx
+
+        self.graph: nx.Graph = nx.read_gexf(gexf_path)
+        self.index_storage = index_storage
+        self.pq_m = pq_m
+        self.pq_nbits = pq_nbits
+        self._edge_records: list[dict[str, Any]] | None = None
+
+    @property
+    def edge_records(self) -> list[dict[str, Any]]:
+        """Edge sentences to embed, collected from the graph on first use."""
+
+        if self._edge_records is None:
+            self._edge_records = self._collect_edge_records()
+        return self._edge_records
+
+    def _collect_edge_records(self) -> list[dict[str, Any]]:
+        records: dict[str, dict[str, Any]] = {}
+
+        for source_id, target_id, data in self.graph.edges(data=True):
+            if data.get("relation_type") != "predicate_relation":
+                continue
+
+            provenance = edge_sentence_provenance(data)
+            if not provenance:
+                continue
+
+            source_label = str(self.graph.nodes[source_id].get("label", source_id))
+            target_label = str(self.graph.nodes[target_id].get("label", target_id))
+            edge_label = str(data.get("label", "")).strip()
+
+            for sentence, chunk_ids in provenance.items():
+                record = records.get(sentence)
+                if record is not None:
+                    record["chunk_ids"] = sorted(set(record["chunk_ids"]).union(chunk_ids))
+                    record["chunk_id"] = record["chunk_ids"][0] if record["chunk_ids"] else None
+                    continue
+                records[sentence] = {
+                    "source_id": source_id,
+                    "target_id": target_id,
+                    "source": source_label,
+                    "target": target_label,
+                    "label": edge_label,
+                    "sentence": sentence,
+                    "chunk_id": chunk_ids[0] if chunk_ids else None,
+                    "chunk_ids": list(chunk_ids),
+                }
+
+        return list(records.values())
+
+    def build_index(self, max_workers: int = 4) -> None:
+        import faiss
+
+        if not self.edge_records:
+            raise ValueError("No predicate-edge sentences were found in the graph.")
+
+        vectors = self.embedder.embed_many(
+            [record["sentence"] for record in self.edge_records],
+            max_workers=max_workers,
+            desc="Embedding predicate edges",
+        )
+        self.index = create_faiss_index(vectors, self.index_storage, self.pq_m, self.pq_nbits)
+        self.payloads = list(self.edge_records)
+        Path(self.index_path).parent.mkdir(parents=True, exist_ok=True)
+        faiss.write_index(self.index, self.index_path)
+        np.save(self.payload_path, np.array(self.payloads, dtype=object))
+        self._write_metadata()
+
+    def _write_metadata(self) -> None:
+        if self.index is None:
+            return
+        metadata = {
+            "embedder": self.embedder.identity(),
+            "dim": int(self.index.d),
+            "vectors": int(self.index.ntotal),
+            "index_type": type(self.index).__name__,
+            "storage": built_index_storage(self.index),
+            "index_bytes": os.path.getsize(self.index_path),
+        }
+        with index_meta_path(self.index_path).open("w", encoding="utf-8") as handle:
+            json.dump(metadata, handle, indent=2, ensure_ascii=False)
+
+
+def build_edge_index(config: THRAGConfig, embedder: Embedder | None = None) -> str:
+    """Embed the predicate-edge sentences of a dataset's GEXF graph into a new FAISS index."""
 
-def build_index_for_dataset(dataset_name: str, rebuild: bool = False) -> str:
-    config = get_config(dataset_name)
     graph_path = config.get_graph_gexf_file()
-    graph_json_path = config.get_graph_json_file()
     if not graph_path.exists():
         raise FileNotFoundError(f"GEXF graph not found: {graph_path}")
-    if not graph_json_path.exists():
-        raise FileNotFoundError(f"Graph JSON not found: {graph_json_path}")
 
-    embedder = EdgeEmbedderFAISS(
+    edge_embedder = EdgeEmbedderFAISS(
         gexf_path=str(graph_path),
-        json_path=str(graph_json_path),
         embedding_model=config.embed_model,
         openai_api_key=config.openai_api_key,
         index_path=str(config.get_edge_index_file()),
         payload_path=str(config.get_edge_payload_file()),
+        embedder=embedder or create_embedder(config),
+        index_storage=config.index_storage,
+        pq_m=config.pq_m,
+        pq_nbits=config.pq_nbits,
+    )
+    edge_embedder.build_index(max_workers=config.max_workers)
+    config.mark_step_completed(
+        "edge_embedding",
+        index_file=str(config.get_edge_index_file()),
+        payload_file=str(config.get_edge_payload_file()),
     )
+    return str(config.get_edge_index_file())
+
+
+def build_index_for_dataset(dataset_name: str, rebuild: bool = False) -> str:
+    config = get_config(dataset_name)
+    graph_path = config.get_graph_gexf_file()
+    if not graph_path.exists():
+        raise FileNotFoundError(f"GEXF graph not found: {graph_path}")
 
     if rebuild or not config.get_edge_index_file().exists() or not config.get_edge_payload_file().exists():
-        embedder.build_index(max_workers=config.max_workers)
-        config.mark_step_completed(
-            "edge_embedding",
-            index_file=str(config.get_edge_index_file()),
-            payload_file=str(config.get_edge_payload_file()),
-        )
+        build_edge_index(config)
     return str(config.get_edge_index_file())
 
 
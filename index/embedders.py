@@ -0,0 +1,282 @@
+"""Pluggable text embedders for the TH-RAG edge index.
+
+Every embedder returns L2-normalised float32 rows and exposes an ``identity``
+dictionary that is stored next to the FAISS index, so an index is never queried
+with vectors from a different model.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+
+import re
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Sequence
+
+import numpy as np
+from tqdm import tqdm
+
+from config import THRAGConfig, get_config
+from utils.hedging import get_hedger
+from utils.tracing import record_usage
+
+EMBED_BACKENDS = ("openai", "hashing", "sentence-transformers")
+DIM_REDUCTIONS = ("api", "truncate")
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.ascontiguousarray(matrix, dtype="float32")
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class Embedder:
+    """Base class for batched, normalised text embedders."""
+
+    backend = "base"
+
+    def __init__(self, batch_size: int = 32) -> None:
+        self.batch_size = max(1, batch_size)
+
+    def identity(self) -> dict[str, Any]:
+        raise NotImplementedError
+
+    def embed_batch(self, texts: Sequence[str]) -> np.ndarray:
+        raise NotImplementedError
+
+    def embed(self, text: str) -> np.ndarray:
+        return self.embed_batch([text])[0]
+
+    def embed_many(
+        self,
+        texts: Sequence[str],
+        max_workers: int = 1,
+        desc: str | None = None,
+    ) -> np.ndarray:
+        """Embed ``texts`` in batches across a thread pool, preserving order."""
+
+        batches = [texts[start : start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+        if not batches:
+            return np.zeros((0, 0), dtype="float32")
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            results = list(
+                tqdm(
+                    executor.map(self.embed_batch, batches),
+                    total=len(batches),
+                    desc=desc,
+                    disable=desc is None,
+                )
+            )
+        return np.vstack(results)
+
+
+class OpenAIEmbedder(Embedder):
+    """Embed text with the OpenAI embeddings endpoint (or the fake backend)."""
+
+    backend = "openai"
+
+    def __init__(
+        self,
+        client: Any,
+        model: str,
+        batch_size: int = 32,
+        dimensions: int | None = None,
+        timeout: float | None = None,
+        hedge: bool = False,
+    ) -> None:
+        super().__init__(batch_size)
+        self.client = client
+        self.model = model
+        self.dimensions = dimensions
+        self.timeout = timeout
+        self.hedge = hedge
+
+    def identity(self) -> dict[str, Any]:
+        identity = {"backend": self.backend, "model": self.model, "client": type(self.client).__name__}
+        if self.dimensions:
+            identity["dimensions"] = self.dimensions
+        return identity
+
+    def embed_batch(self, texts: Sequence[str]) -> np.ndarray:
+        options: dict[str, Any] = {"dimensions": self.dimensions} if self.dimensions else {}
+        if self.timeout:
+            options["timeout"] = self.timeout
+
+        def request() -> Any:
+            return self.client.embeddings.create(input=list(texts), model=self.model, **options)
+
+        response = get_hedger().call("embedding", request) if self.hedge else request()
+        record_usage(response)
+        ordered = sorted(response.data, key=lambda item: item.index)
+        return normalize_rows(np.array([item.embedding for item in ordered], dtype="float32"))
+
+
+class HashingEmbedder(Embedder):
+    """Zero-dependency baseline that projects hashed word and character n-grams.
+
+    Features are hashed with CRC32 into ``dim`` signed buckets, so vectors are
+    stable across processes and platforms and need no model files.
+    """
+
+    backend = "hashing"
+
+    def __init__(
+        self,
+        dim: int = 768,
+        char_ngrams: tuple[int, int] = (3, 5),
+        batch_size: int = 256,
+    ) -> None:
+        super().__init__(batch_size)
+        self.dim = dim
+        self.char_ngrams = char_ngrams
+
+    def identity(self) -> dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "dim": self.dim,
+            "char_ngrams": list(self.char_ngrams),
+            "hash": "crc32",
+        }
+
+    def _features(self, text: str) -> list[str]:
+        normalized = " ".join(text.lower().split())
+        words = _WORD_PATTERN.findall(normalized)
+        features = [f"w:{word}" for word in words]
+        features.extend(f"b:{left} {right}" for left, right in zip(words, words[1:], strict=False))
+        padded = f" {normalized} "
+        low, high = self.char_ngrams
+        for size in range(low, high + 1):
+            features.extend(f"c:{padded[start:start + size]}" for start in range(len(padded) - size + 1))
+        return features
+
+    def embed_batch(self, texts: Sequence[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype="float32")
+        for row, text in enumerate(texts):
+            hashes = np.fromiter(
+                (zlib.crc32(feature.encode("utf-8")) for feature in self._features(text)),
+                dtype="uint32",
+            )
+            if hashes.size == 0:
+                continue
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype("float32")
+            np.add.at(matrix[row], (hashes % self.dim).astype("int64"), signs)
+        return normalize_rows(matrix)
+
+
+class SentenceTransformerEmbedder(Embedder):
+    """Local CPU embedder backed by a sentence-transformers model directory."""
+
+    backend = "sentence-transformers"
+
+    def __init__(self, model_path: str, batch_size: int = 32, device: str = "cpu") -> None:
+        super().__init__(batch_size)
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as exc:
+            raise ImportError(
+                "EMBED_BACKEND=sentence-transformers requires the sentence-transformers package."
+            ) from exc
+
+        self.model_path = str(model_path)
+        self.model = SentenceTransformer(self.model_path, device=device)
+        self.dim = int(self.model.get_sentence_embedding_dimension())
+
+    def identity(self) -> dict[str, Any]:
+        return {"backend": self.backend, "model_path": self.model_path, "dim": self.dim}
+
+    def embed_batch(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = self.model.encode(list(texts), batch_size=self.batch_size, convert_to_numpy=True)
+        return normalize_rows(vectors)
+
+
+class TruncatedEmbedder(Embedder):
+    """Keep the leading ``dim`` components of another embedder and renormalise.
+
+    This mirrors the shortened embeddings of Matryoshka-trained models such as
+    ``text-embedding-3-*`` for backends that cannot shorten server-side.
+    """
+
+    def __init__(self, inner: Embedder, dim: int) -> None:
+        super().__init__(inner.batch_size)
+        self.inner = inner
+        self.dim = dim
+        self.backend = inner.backend
+
+    def identity(self) -> dict[str, Any]:
+        return {**self.inner.identity(), "truncate_to": self.dim}
+
+    def embed_batch(self, texts: Sequence[str]) -> np.ndarray:
+        return normalize_rows(self.inner.embed_batch(texts)[:, : self.dim])
+
+
+class CachedEmbedder(Embedder):
+    """Serve texts from precomputed vectors and embed only the others with ``inner``.
+
+    Used by the streaming build, which embeds evidence sentences while extraction
+    is still running and finalises the index from those vectors. The identity is
+    the inner embedder's, since the vectors come from it.
+    """
+
+    def __init__(self, inner: Embedder, vectors: dict[str, np.ndarray] | None = None) -> None:
+        super().__init__(inner.batch_size)
+        self.inner = inner
+        self.vectors = vectors if vectors is not None else {}
+        self.backend = inner.backend
+        self.misses = 0
+
+    def identity(self) -> dict[str, Any]:
+        return self.inner.identity()
+
+    def embed_batch(self, texts: Sequence[str]) -> np.ndarray:
+        missing = list(dict.fromkeys(text for text in texts if text not in self.vectors))
+        if missing:
+            self.misses += len(missing)
+            self.vectors.update(zip(missing, self.inner.embed_batch(missing)))
+        return np.vstack([self.vectors[text] for text in texts])
+
+
+def create_embedder(config: THRAGConfig | None = None, client: Any | None = None) -> Embedder:
+    """Build the embedder selected by ``EMBED_BACKEND``."""
+
+    config = config or get_config()
+    backend = config.embed_backend
+    dimensions = config.embed_dimensions or None
+    if config.embed_dim_reduction not in DIM_REDUCTIONS:
+        raise ValueError(
+            f"Unknown EMBED_DIM_REDUCTION '{config.embed_dim_reduction}'. "
+            f"Expected one of: {', '.join(DIM_REDUCTIONS)}."
+        )
+
+    embedder: Embedder
+    if backend == "openai":
+        if client is None:
+            from utils.openai_client import create_client
+
+            client = create_client(config)
+        options = {"timeout": config.stage_timeout("embedding"), "hedge": "embedding" in config.hedge_stages}
+        if dimensions and config.embed_dim_reduction == "api":
+            return OpenAIEmbedder(
+                client, config.embed_model, batch_size=config.batch_size, dimensions=dimensions, **options
+            )
+        embedder = OpenAIEmbedder(client, config.embed_model, batch_size=config.batch_size, **options)
+    elif backend == "hashing":
+        embedder = HashingEmbedder(dim=config.hashing_embed_dim)
+    elif backend == "sentence-transformers":
+        if not config.local_embed_model_path:
+            raise ValueError("LOCAL_EMBED_MODEL_PATH must be set when EMBED_BACKEND=sentence-transformers.")
+        embedder = SentenceTransformerEmbedder(config.local_embed_model_path, batch_size=config.batch_size)
+    else:
+        raise ValueError(f"Unknown EMBED_BACKEND '{backend}'. Expected one of: {', '.join(EMBED_BACKENDS)}.")
+
+    return TruncatedEmbedder(embedder, dimensions) if dimensions else embedder
@@ -0,0 +1,362 @@
+"""Merge entity labels that name the same thing before the graph is built.
+
+``clean_id`` only lowercases and replaces characters, so "U.S.", "United
+States", and "USA" become three entity nodes with three sets of edges. This
+stage clusters the entity labels of an extracted graph JSON file and maps every
+label to one canonical label, which ``GraphAccumulator`` then uses for the node
+ID and label.
+
+Labels are compared only within blocks so the work stays close to linear:
+
+- labels with the same key (case-folded, without apostrophes, periods that end
+  an abbreviation, other punctuation, or a leading article) are merged
+  outright. ``+``, ``#``, ``&``, ``/``, and a period that starts a word stay in
+  the key, so "C++", "C#", and "C" (or ".NET" and "NET") keep their own keys;
+- a short single-word label and the only multi-word label whose initials it
+  spells ("USA" and "United States of America") are merged outright;
+- labels that share a word are merged when their keys are at least
+  ``string_threshold`` similar (``difflib`` ratio) or their embeddings are at
+  least ``embed_threshold`` similar (cosine). Only the labels of such pairs are
+  embedded, in batches with the dataset's embedder.
+
+Labels whose numbers or kept symbols differ ("Windows 10" and "Windows 11",
+"C++ compiler" and "C# compiler") are never merged, and
+words shared by more than ``max_block_size`` labels do not form a block. Merged
+pairs are joined with union-find, and each cluster takes its most frequent
+label as canonical, preferring labels without a leading article and then
+longer labels on ties.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+
+import argparse
+import json
+import re
+import time
+import unicodedata
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+from itertools import combinations
+from typing import Any, Iterable
+
+from config import THRAGConfig, get_config
+from index.embedders import Embedder, create_embedder
+from index.json_to_gexf import clean_id, hierarchy_labels, load_entries
+
+_ARTICLES = {"the", "a", "an"}
+_STOPWORDS = _ARTICLES | {"of", "and", "for", "in", "on", "at", "to", "de"}
+_DROPPED_CHARACTERS = re.compile(r"(?<=\S)\.|['’`]")
+_SEPARATORS = re.compile(r"[^\w+#&/.]+")
+_DISTINCT = re.compile(r"\d+|[+#&/.]+")
+
+
+def label_key(label: str) -> str:
+    """Comparison key of an entity label; labels with equal keys are merged."""
+
+    text = _DROPPED_CHARACTERS.sub("", unicodedata.normalize("NFKC", label).casefold())
+    words = _SEPARATORS.sub(" ", text).split()
+    if len(words) > 1 and words[0] in _ARTICLES:
+        words = words[1:]
+    return " ".join(words)
+
+
+def initials(key: str) -> str:
+    """Initials of the significant words of a multi-word key, or "" for a single word."""
+
+    words = [word for word in key.split() if word not in _STOPWORDS]
+    return "".join(word[0] for word in words) if len(words) > 1 else ""
+
+
+class UnionFind:
+    def __init__(self, items: Iterable[str]) -> None:
+        self.parent = {item: item for item in items}
+
+    def find(self, item: str) -> str:
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, left: str, right: str) -> bool:
+        left_root, right_root = self.find(left), self.find(right)
+        if left_root == right_root:
+            return False
+        self.parent[right_root] = left_root
+        return True
+
+
+def canonical_label(members: Iterable[str], counts: Counter[str]) -> str:
+    """Most frequent label of a cluster, preferring labels without a leading article, then longer labels."""
+
+    return max(
+        members,
+        key=lambda label: (counts[label], label.split()[0].casefold() not in _ARTICLES, len(label), label),
+    )
+
+
+def entity_label_counts(entries: Iterable[dict[str, Any]]) -> Counter[str]:
+    """How often each entity label appears as a subject or object."""
+
+    counts: Counter[str] = Counter()
+    for entry in entries:
+        subject_label, _predicate, object_label = [str(value).strip() for value in entry["triple"]]
+        counts.update(label for label in (subject_label, object_label) if label)
+    return counts
+
+
+def candidate_pairs(keys: list[str], max_block_size: int) -> set[tuple[str, str]]:
+    """Pairs of distinct keys that share a significant word, from blocks of at most ``max_block_size`` keys."""
+
+    blocks: dict[str, list[str]] = defaultdict(list)
+    for key in keys:
+        for word in set(key.split()):
+            if word not in _STOPWORDS and len(word) > 1:
+                blocks[word].append(key)
+
+    pairs: set[tuple[str, str]] = set()
+    for members in blocks.values():
+        if len(members) < 2 or len(members) > max_block_size:
+            continue
+        pairs.update(tuple(sorted(pair)) for pair in combinations(members, 2))
+    return pairs
+
+
+def acronym_pairs(keys: list[str]) -> list[tuple[str, str]]:
+    """Single-word keys paired with the only multi-word key whose initials they spell."""
+
+    expansions: dict[str, set[str]] = defaultdict(set)
+    for key in keys:
+        acronym = initials(key)
+        if acronym:
+            expansions[acronym].add(key)
+    return [
+        (key, next(iter(expansions[key])))
+        for key in keys
+        if " " not in key and 2 <= len(key) <= 6 and len(expansions.get(key, ())) == 1
+    ]
+
+
+def cluster_entity_labels(
+    counts: Counter[str],
+    embedder: Embedder | None = None,
+    *,
+    string_threshold: float = 0.92,
+    embed_threshold: float = 0.95,
+    max_block_size: int = 50,
+    max_workers: int = 1,
+) -> dict[str, Any]:
+    """Cluster entity labels and return the alias map with the evidence for each merge.
+
+    ``aliases`` maps every label that changes to its canonical label. Without an
+    embedder only key, acronym, and string similarity merges are made.
+    """
+
+    labels_by_key: dict[str, list[str]] = defaultdict(list)
+    for label in counts:
+        key = label_key(label)
+        if key:
+            labels_by_key[key].append(label)
+    keys = sorted(labels_by_key)
+    merges = Counter({"same_key": sum(len(labels) - 1 for labels in labels_by_key.values())})
+
+    union = UnionFind(keys)
+    for short, expansion in acronym_pairs(keys):
+        merges["acronym"] += union.union(expansion, short)
+
+    pairs = [
+        (left, right)
+        for left, right in sorted(candidate_pairs(keys, max_block_size))
+        if _DISTINCT.findall(left) == _DISTINCT.findall(right)
+    ]
+    scored: list[tuple[str, str]] = []
+    for left, right in pairs:
+        if SequenceMatcher(None, left, right).ratio() >= string_threshold:
+            merges["string"] += union.union(left, right)
+        else:
+            scored.append((left, right))
+
+    embedded = 0
+    if embedder is not None and scored:
+        texts = sorted({key for pair in scored for key in pair})
+        vectors = embedder.embed_many(
+            [max(labels_by_key[key], key=counts.__getitem__) for key in texts],
+            max_workers=max_workers,
+            desc="Embedding entity labels",
+        )
+        rows = {key: row for row, key in enumerate(texts)}
+        embedded = len(texts)
+        for left, right in scored:
+            if float(vectors[rows[left]] @ vectors[rows[right]]) >= embed_threshold:
+                merges["embedding"] += union.union(left, right)
+
+    clusters: dict[str, list[str]] = defaultdict(list)
+    for key in keys:
+        clusters[union.find(key)].extend(labels_by_key[key])
+
+    aliases: dict[str, str] = {}
+    merged_clusters: list[dict[str, Any]] = []
+    for members in clusters.values():
+        canonical = canonical_label(members, counts)
+        aliases.update({label: canonical for label in members if label != canonical})
+        if len(members) > 1:
+            labels = sorted(members, key=counts.__getitem__, reverse=True)
+            merged_clusters.append({"canonical": canonical, "labels": labels})
+    merged_clusters.sort(key=lambda cluster: (-len(cluster["labels"]), cluster["canonical"]))
+
+    return {
+        "aliases": aliases,
+        "clusters": merged_clusters,
+        "merges": dict(merges),
+        "candidate_pairs": len(pairs),
+        "embedded_labels": embedded,
+    }
+
+
+def graph_counts(entries: list[dict[str, Any]], aliases: dict[str, dict[str, str]] | None = None) -> dict[str, Any]:
+    """Node, edge, and index-size counts of the graph ``GraphAccumulator`` would build.
+
+    Computed from the entries directly so no graph has to be built for the report.
+    ``aliases`` has the same per-node-type form as ``GraphAccumulator`` takes.
+    """
+
+    aliases = aliases or {}
+    entity_aliases, subtopic_aliases, topic_aliases = (
+        aliases.get(kind, {}) for kind in ("entity", "subtopic", "topic")
+    )
+    entities: set[str] = set()
+    subtopics: set[str] = set()
+    topics: set[str] = set()
+    hierarchy: set[tuple[str, str]] = set()
+    predicate_edges: set[tuple[str, str]] = set()
+    edge_sentences: set[tuple[str, str, str]] = set()
+    sentences: set[str] = set()
+    subtopic_entities: dict[str, set[str]] = defaultdict(set)
+    topic_subtopics: dict[str, set[str]] = defaultdict(set)
+
+    for entry in entries:
+        subject_label, _predicate, object_label = [str(value).strip() for value in entry["triple"]]
+        endpoints = []
+        for label, side in ((subject_label, "subject"), (object_label, "object")):
+            subtopic_label, topic_label = hierarchy_labels(entry[side])
+            entity = f"entity_{clean_id(entity_aliases.get(label, label))}"
+            subtopic = f"subtopic_{clean_id(subtopic_aliases.get(subtopic_label, subtopic_label))}"
+            topic = f"topic_{clean_id(topic_aliases.get(topic_label, topic_label))}"
+            entities.add(entity)
+            subtopics.add(subtopic)
+            topics.add(topic)
+            hierarchy.update({tuple(sorted((entity, subtopic))), tuple(sorted((subtopic, topic)))})
+            subtopic_entities[subtopic].add(entity)
+            topic_subtopics[topic].add(subtopic)
+            endpoints.append(entity)
+        edge = tuple(sorted(endpoints))
+        predicate_edges.add(edge)
+        sentence_value = entry.get("sentence", "")
+        sentence = (
+            " ".join(str(item).strip() for item in sentence_value if str(item).strip())
+            if isinstance(sentence_value, list)
+            else str(sentence_value).strip()
+        )
+        if sentence:
+            edge_sentences.add((*edge, sentence))
+            sentences.add(sentence)
+
+    return {
+        "nodes": len(entities) + len(subtopics) + len(topics),
+        "entity_nodes": len(entities),
+        "subtopic_nodes": len(subtopics),
+        "topic_nodes": len(topics),
+        "edges": len(predicate_edges | hierarchy),
+        "predicate_edges": len(predicate_edges),
+        "edge_sentences": len(edge_sentences),
+        "index_vectors": len(sentences),
+        "mean_entities_per_subtopic": (
+            sum(len(members) for members in subtopic_entities.values()) / len(subtopic_entities)
+            if subtopic_entities
+            else 0.0
+        ),
+        "max_subtopics_per_topic": max((len(members) for members in topic_subtopics.values()), default=0),
+    }
+
+
+def reduction(before: dict[str, Any], after: dict[str, Any]) -> dict[str, Any]:
+    return {
+        key: {
+            "before": before[key],
+            "after": after[key],
+            "reduction": 1 - after[key] / before[key] if before[key] else 0.0,
+        }
+        for key in before
+    }
+
+
+def canonicalize_entries(
+    entries: list[dict[str, Any]],
+    embedder: Embedder | None = None,
+    **options: Any,
+) -> dict[str, Any]:
+    """Cluster the entity labels of ``entries`` and report the graph reduction it gives."""
+
+    started = time.perf_counter()
+    counts = entity_label_counts(entries)
+    result = cluster_entity_labels(counts, embedder, **options)
+    before, after = graph_counts(entries), graph_counts(entries, {"entity": result["aliases"]})
+    result["report"] = {
+        "labels": len(counts),
+        "labels_merged": len(result["aliases"]),
+        "clusters_merged": len(result["clusters"]),
+        "merges": result.pop("merges"),
+        "candidate_pairs": result.pop("candidate_pairs"),
+        "embedded_labels": result.pop("embedded_labels"),
+        "seconds": time.perf_counter() - started,
+        "graph": reduction(before, after),
+    }
+    return result
+
+
+def canonicalize_dataset(config: THRAGConfig, embedder: Embedder | None = None) -> dict[str, str]:
+    """Write the entity alias file of a dataset's graph JSON and return its aliases."""
+
+    graph_json_path = config.get_graph_json_file()
+    if not graph_json_path.exists():
+        raise FileNotFoundError(f"Graph JSON file not found. Run graph_construction first: {graph_json_path}")
+
+    result = canonicalize_entries(
+        load_entries(graph_json_path),
+        embedder or create_embedder(config),
+        string_threshold=config.canonical_string_threshold,
+        embed_threshold=config.canonical_embed_threshold,
+        max_block_size=config.canonical_max_block_size,
+        max_workers=config.max_workers,
+    )
+    output_path = config.get_entity_aliases_file()
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with output_path.open("w", encoding="utf-8") as handle:
+        json.dump(result, handle, indent=2, ensure_ascii=False)
+
+    report = result["report"]
+    graph = report["graph"]
+    print(
+        f"[{config.dataset_name}] Canonicalized {report['labels_merged']} of {report['labels']} entity labels "
+        f"into {report['clusters_merged']} clusters: nodes {graph['nodes']['before']} -> {graph['nodes']['after']}, "
+        f"edges {graph['edges']['before']} -> {graph['edges']['after']}, "
+        f"index vectors {graph['index_vectors']['before']} -> {graph['index_vectors']['after']}. "
+        f"Aliases written to {output_path}"
+    )
+    return result["aliases"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cluster the entity labels of a dataset's extracted graph.")
+    parser.add_argument("--dataset", required=True, help="Dataset name under data/<dataset>/")
+    args = parser.parse_args()
+    canonicalize_dataset(get_config(args.dataset))
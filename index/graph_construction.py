@@ -1,7 +1,9 @@
 """Graph construction for TH-RAG.
 
-This step chunks a dataset's contexts.txt file, stores the chunk text in a KV store,
-and extracts topic-aware triples for each chunk with an OpenAI model.
+This step chunks a dataset's corpus (contexts.txt, or a directory or manifest of
+documents) with the streaming token-window chunker, stores the chunk text in a
+chunk store (and, unless disabled, the legacy JSON KV store), and extracts
+topic-aware triples for each chunk with an OpenAI model.
 """
 
 from __future__ import annotations
@@ -16,16 +18,34 @@ if str(PROJECT_ROOT) not in sys.path:
 
 import argparse
 import json
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+from contextlib import ExitStack
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator
 
 import tiktoken
-from openai import OpenAI
 from tqdm import tqdm
 
 from config import THRAGConfig, get_config
-from prompt.extract_graph import EXTRACTION_PROMPT
+from index.chunk_store import ChunkStoreWriter, KVStoreJsonWriter
+from index.chunking import iter_file_chunks
+from index.documents import (
+    discover_documents,
+    is_document_corpus,
+    iter_corpus_chunks,
+    load_document_state,
+    plan_ingest,
+    save_document_state,
+)
+from index.scheduler import JobScheduler, estimate_tokens
+from prompt.extract_graph import EXTRACTION_PROMPT, PACKED_EXTRACTION_PROMPT
+from utils.openai_client import create_client
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+EXTRACTION_MODES = ("sync", "batch")
+EXTRACTION_SYSTEM_PROMPT = "You extract factual triples from text and return valid JSON."
 
 
 def chunk_text(text: str, max_tokens: int, overlap: int, model_name: str) -> list[str]:
@@ -46,22 +66,17 @@ def chunk_text(text: str, max_tokens: int, overlap: int, model_name: str) -> lis
     return chunks
 
 
-def parse_triples_response(response_text: str) -> list[dict[str, Any]]:
-    """Parse a model response into a list of triple dictionaries."""
-
+def _strip_code_fence(response_text: str) -> str:
     cleaned = response_text.strip()
     if cleaned.startswith("```"):
         cleaned = cleaned.strip("`")
         if cleaned.startswith("json"):
             cleaned = cleaned[4:].strip()
+    return cleaned
 
-    payload = json.loads(cleaned)
-    if isinstance(payload, dict):
-        triples = payload.get("triples", [])
-    elif isinstance(payload, list):
-        triples = payload
-    else:
-        raise ValueError("The extraction response must be a JSON list or an object with a 'triples' field.")
+
+def validate_triples(triples: Iterable[Any]) -> list[dict[str, Any]]:
+    """Keep only items with a three-part triple and subject/object topic objects."""
 
     validated: list[dict[str, Any]] = []
     for item in triples:
@@ -78,13 +93,40 @@ def parse_triples_response(response_text: str) -> list[dict[str, Any]]:
     return validated
 
 
+def parse_triples_response(response_text: str) -> list[dict[str, Any]]:
+    """Parse a model response into a list of triple dictionaries."""
+
+    payload = json.loads(_strip_code_fence(response_text))
+    if isinstance(payload, dict):
+        triples = payload.get("triples", [])
+    elif isinstance(payload, list):
+        triples = payload
+    else:
+        raise ValueError("The extraction response must be a JSON list or an object with a 'triples' field.")
+    return validate_triples(triples)
 
-def build_kv_store(chunks: list[str]) -> dict[str, dict[str, str]]:
-    """Create the chunk lookup structure used during answer generation."""
 
+def parse_packed_triples_response(response_text: str, chunk_ids: list[str]) -> dict[str, list[dict[str, Any]]]:
+    """Parse a packed extraction response into triples per chunk ID.
+
+    Chunk IDs missing from the response are left out of the result.
+    """
+
+    payload = json.loads(_strip_code_fence(response_text))
+    if isinstance(payload, dict) and isinstance(payload.get("chunks"), dict):
+        payload = payload["chunks"]
+    elif isinstance(payload, list):
+        payload = {
+            str(item.get("chunk_id")): item.get("triples")
+            for item in payload
+            if isinstance(item, dict) and "chunk_id" in item
+        }
+    if not isinstance(payload, dict):
+        raise ValueError("The packed extraction response must be a JSON object keyed by chunk id.")
     return {
-        f"chunk-{index:05d}": {"content": chunk}
-        for index, chunk in enumerate(chunks)
+        chunk_id: validate_triples(payload[chunk_id])
+        for chunk_id in chunk_ids
+        if isinstance(payload.get(chunk_id), list)
     }
 
 
@@ -108,17 +150,22 @@ def load_existing_blocks(output_path: Path) -> dict[str, dict[str, Any]]:
 
 
 
+def extraction_messages(chunk_text_value: str) -> list[dict[str, str]]:
+    return [
+        {"role": "system", "content": EXTRACTION_SYSTEM_PROMPT},
+        {"role": "user", "content": EXTRACTION_PROMPT.replace("{{document}}", chunk_text_value.strip())},
+    ]
+
+
+
 def call_model(client: OpenAI, model_name: str, chunk_text_value: str, chunk_id: str) -> dict[str, Any]:
-    prompt = EXTRACTION_PROMPT.replace("{{document}}", chunk_text_value.strip())
     response = client.chat.completions.create(
         model=model_name,
-        messages=[
-            {"role": "system", "content": "You extract factual triples from text and return valid JSON."},
-            {"role": "user", "content": prompt},
-        ],
+        messages=extraction_messages(chunk_text_value),
         temperature=0.0,
         max_tokens=get_config().max_tokens_response,
         response_format={"type": "text"},
+        timeout=get_config().stage_timeout("extraction"),
     )
     content = response.choices[0].message.content or "[]"
     triples = parse_triples_response(content)
@@ -130,6 +177,146 @@ def call_model(client: OpenAI, model_name: str, chunk_text_value: str, chunk_id:
 
 
 
+def reusable_block(existing_blocks: dict[str, dict[str, Any]], chunk_id: str, chunk: str) -> dict[str, Any] | None:
+    """Return the previously extracted block of a chunk if its text is unchanged."""
+
+    block = existing_blocks.get(chunk_id)
+    if block and isinstance(block.get("triples"), list) and block.get("content", chunk) == chunk:
+        return block
+    return None
+
+
+
+def format_packed_documents(chunks: list[tuple[str, str]]) -> str:
+    return "\n".join(f'<chunk id="{chunk_id}">\n{text.strip()}\n</chunk>' for chunk_id, text in chunks)
+
+
+
+def error_block(chunk_id: str, chunk: str, exc: Exception) -> dict[str, Any]:
+    return {
+        "chunk_id": chunk_id,
+        "content": chunk,
+        "triples": [],
+        "error": str(exc),
+    }
+
+
+
+class ExtractionPacker:
+    """Group chunks into packed extraction requests and account for the savings.
+
+    Chunks are packed in arrival order until the next one would push the pack past
+    ``token_budget`` chunk tokens or ``max_chunks`` chunks; a budget of 0 disables
+    packing. A pack of one chunk uses the regular single-chunk prompt. If a packed
+    response cannot be parsed, or omits a chunk, the affected chunks are extracted
+    one by one instead.
+
+    ``prompt_tokens_saved`` estimates the instruction tokens not repeated: for each
+    packed request, the single-chunk prompt overhead of every chunk minus the
+    packed prompt overhead and its per-chunk tags.
+    """
+
+    def __init__(self, token_budget: int, max_chunks: int, count_tokens: Callable[[str], int] | None = None) -> None:
+        self.token_budget = max(0, token_budget)
+        self.max_chunks = max(1, max_chunks) if self.token_budget else 1
+        self.count_tokens = count_tokens or (lambda text: 0)
+        self._pending: list[tuple[Any, str, str]] = []
+        self._pending_tokens = 0
+        self._lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "chunks": 0,
+            "packed_requests": 0,
+            "fallback_requests": 0,
+            "prompt_tokens_saved": 0,
+        }
+
+        if self.token_budget:
+            system_tokens = self.count_tokens(EXTRACTION_SYSTEM_PROMPT)
+            self._single_overhead = system_tokens + self.count_tokens(EXTRACTION_PROMPT.replace("{{document}}", ""))
+            self._packed_overhead = system_tokens + self.count_tokens(PACKED_EXTRACTION_PROMPT.replace("{{documents}}", ""))
+            self._tag_overhead = self.count_tokens(format_packed_documents([("chunk-00000", "")])) + 1
+
+    def add(self, key: Any, chunk_id: str, chunk: str) -> list[list[tuple[Any, str, str]]]:
+        """Queue a chunk and return the packs that are complete once it is added."""
+
+        tokens = self.count_tokens(chunk) if self.token_budget else 0
+        full = []
+        if self._pending and self._pending_tokens + tokens > self.token_budget:
+            full.append(self.drain())
+        self._pending.append((key, chunk_id, chunk))
+        self._pending_tokens += tokens
+        if len(self._pending) >= self.max_chunks or self._pending_tokens >= self.token_budget:
+            full.append(self.drain())
+        return full
+
+    def drain(self) -> list[tuple[Any, str, str]]:
+        pack, self._pending, self._pending_tokens = self._pending, [], 0
+        return pack
+
+    def _record(self, **counts: int) -> None:
+        with self._lock:
+            for name, value in counts.items():
+                self.stats[name] += value
+
+    def extract(self, client: OpenAI, model_name: str, pack: list[tuple[Any, str, str]]) -> list[dict[str, Any]]:
+        """Extract the triples of every chunk in ``pack``, in order."""
+
+        if len(pack) == 1:
+            _key, chunk_id, chunk = pack[0]
+            self._record(requests=1, chunks=1)
+            return [call_model(client, model_name, chunk, chunk_id)]
+
+        chunks = [(chunk_id, chunk) for _key, chunk_id, chunk in pack]
+        prompt = PACKED_EXTRACTION_PROMPT.replace("{{documents}}", format_packed_documents(chunks))
+        response = client.chat.completions.create(
+            model=model_name,
+            messages=[
+                {"role": "system", "content": EXTRACTION_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt},
+            ],
+            temperature=0.0,
+            max_tokens=get_config().max_tokens_response * len(chunks),
+            response_format={"type": "text"},
+            timeout=get_config().stage_timeout("extraction") * len(chunks),
+        )
+        try:
+            parsed = parse_packed_triples_response(
+                response.choices[0].message.content or "{}",
+                [chunk_id for chunk_id, _chunk in chunks],
+            )
+        except ValueError:
+            parsed = {}
+
+        blocks: list[dict[str, Any]] = []
+        fallbacks = 0
+        for chunk_id, chunk in chunks:
+            if chunk_id in parsed:
+                blocks.append({"chunk_id": chunk_id, "content": chunk, "triples": parsed[chunk_id]})
+                continue
+            fallbacks += 1
+            try:
+                blocks.append(call_model(client, model_name, chunk, chunk_id))
+            except Exception as exc:
+                blocks.append(error_block(chunk_id, chunk, exc))
+
+        packed = len(chunks) - fallbacks
+        saved = packed * self._single_overhead - (self._packed_overhead + len(chunks) * self._tag_overhead)
+        self._record(
+            requests=1 + fallbacks,
+            chunks=len(chunks),
+            packed_requests=1,
+            fallback_requests=fallbacks,
+            prompt_tokens_saved=saved,
+        )
+        return blocks
+
+    def report(self) -> dict[str, int]:
+        with self._lock:
+            return {**self.stats, "requests_saved": self.stats["chunks"] - self.stats["requests"]}
+
+
+
 def save_blocks(output_path: Path, blocks: list[dict[str, Any]]) -> None:
     output_path.parent.mkdir(parents=True, exist_ok=True)
     with output_path.open("w", encoding="utf-8") as handle:
@@ -137,91 +324,211 @@ def save_blocks(output_path: Path, blocks: list[dict[str, Any]]) -> None:
 
 
 
-def save_kv_store(output_path: Path, kv_store: dict[str, dict[str, str]]) -> None:
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    with output_path.open("w", encoding="utf-8") as handle:
-        json.dump(kv_store, handle, indent=2, ensure_ascii=False)
+def extract_chunk_stream(
+    config: THRAGConfig,
+    chunks: Iterable[tuple[str, str, str | None]],
+    existing_blocks: dict[str, dict[str, Any]],
+    output_path: Path,
+    on_block: Callable[[dict[str, Any]], None] | None = None,
+) -> tuple[list[dict[str, Any]], dict[str, int]]:
+    """Store ``(chunk_id, text, doc_id)`` chunks and extract triples while they arrive.
+
+    Each chunk is written to the chunk store as soon as it is produced and, packed
+    with its neighbours when ``EXTRACTION_PACK_TOKENS`` is set, queued for
+    extraction. A ``JobScheduler`` keeps ``MAX_WORKERS`` requests in flight, starts
+    the largest queued requests first, and reissues stragglers at the end of the run.
+    Existing blocks are reused when their text matches the chunk. Every finished
+    block, reused or extracted, is passed to ``on_block`` in completion order.
+    Returns the blocks and the extraction request report.
+    """
+
+    completed: dict[int, dict[str, Any]] = {}
+    doc_ids: dict[int, str | None] = {}
+    client: OpenAI | None = None
+    extracted = 0
+    progress = tqdm(desc="Extracting triples", unit="chunk")
+
+    count_tokens = None
+    if config.extraction_pack_tokens > 0:
+        encoding = tiktoken.encoding_for_model(config.default_model)
+
+        def count_tokens(text: str) -> int:
+            return len(encoding.encode(text, disallowed_special=()))
+
+    packer = ExtractionPacker(config.extraction_pack_tokens, config.extraction_pack_max_chunks, count_tokens)
+
+    def extract(pack: list[tuple[Any, str, str]]) -> list[dict[str, Any]]:
+        return packer.extract(client, config.default_model, pack)
+
+    scheduler = JobScheduler(
+        extract,
+        max_in_flight=config.max_workers,
+        lookahead=config.extraction_lookahead,
+        straggler_percentile=config.straggler_percentile,
+        straggler_min_samples=config.straggler_min_samples,
+    )
+
+    def with_doc_id(block: dict[str, Any], doc_id: str | None) -> dict[str, Any]:
+        return block if doc_id is None else {**block, "doc_id": doc_id}
+
+    def jobs(store: ChunkStoreWriter, kv_writer: KVStoreJsonWriter | None) -> Iterator[tuple[int, list[tuple[Any, str, str]]]]:
+        nonlocal client
+        for index, (chunk_id, chunk, doc_id) in enumerate(chunks):
+            store.add(chunk_id, chunk, doc_id)
+            if kv_writer is not None:
+                kv_writer.add(chunk_id, chunk, doc_id)
+
+            existing_block = reusable_block(existing_blocks, chunk_id, chunk)
+            if existing_block is not None:
+                completed[index] = with_doc_id(existing_block, doc_id)
+                if on_block is not None:
+                    on_block(completed[index])
+                continue
+
+            if client is None:
+                client = create_client(config)
+            doc_ids[index] = doc_id
+            for pack in packer.add(index, chunk_id, chunk):
+                yield sum(estimate_tokens(text) for _index, _chunk_id, text in pack), pack
+
+        last_pack = packer.drain()
+        if last_pack:
+            yield sum(estimate_tokens(text) for _index, _chunk_id, text in last_pack), last_pack
+
+    with ExitStack() as stack:
+        store = stack.enter_context(ChunkStoreWriter(config.get_chunk_store_file(), config.chunk_store_compression))
+        kv_writer = (
+            stack.enter_context(KVStoreJsonWriter(config.get_kv_store_file())) if config.write_kv_store_json else None
+        )
+        stack.callback(progress.close)
+
+        for pack, blocks, error in scheduler.run(jobs(store, kv_writer)):
+            if error is not None:
+                blocks = [error_block(chunk_id, chunk, error) for _index, chunk_id, chunk in pack]
+            for (index, _chunk_id, _chunk), block in zip(pack, blocks):
+                completed[index] = with_doc_id(block, doc_ids.pop(index))
+                if on_block is not None:
+                    on_block(completed[index])
+            extracted += len(pack)
+            progress.update(len(pack))
+            if extracted // 10 != (extracted - len(pack)) // 10:
+                save_blocks(output_path, [completed[key] for key in sorted(completed)])
+
+    final_blocks = [completed[key] for key in sorted(completed)]
+    save_blocks(output_path, final_blocks)
+    report = packer.report()
+    report.update(reissued=scheduler.stats["reissued"], reissue_wins=scheduler.stats["reissue_wins"])
+    return final_blocks, report
 
 
 
-def run_graph_construction(config: THRAGConfig, force_rebuild: bool = False) -> str:
-    if not config.openai_api_key:
+def run_graph_construction(
+    config: THRAGConfig,
+    force_rebuild: bool = False,
+    input_path: Path | None = None,
+    on_block: Callable[[dict[str, Any]], None] | None = None,
+) -> str:
+    """Chunk the dataset corpus and extract triples while chunking continues.
+
+    ``input_path`` defaults to the dataset's ``manifest.jsonl``, ``documents/``
+    directory, or ``contexts.txt``, in that order of preference. ``on_block``
+    receives every extracted block as soon as it is final.
+    """
+
+    if not config.has_api_credentials():
         raise ValueError("OPENAI_API_KEY must be configured before running graph construction.")
 
-    input_path = config.get_contexts_file()
+    input_path = Path(input_path) if input_path else config.get_corpus_input()
     output_path = config.get_graph_json_file()
     kv_store_path = config.get_kv_store_file()
+    chunk_store_path = config.get_chunk_store_file()
 
     if not input_path.exists():
         raise FileNotFoundError(f"Input file not found: {input_path}")
 
-    full_text = input_path.read_text(encoding="utf-8")
-    chunks = chunk_text(full_text, config.max_tokens, config.overlap, config.default_model)
-    kv_store = build_kv_store(chunks)
-    save_kv_store(kv_store_path, kv_store)
-
-    chunk_ids = list(kv_store.keys())
     existing_blocks = {} if force_rebuild else load_existing_blocks(output_path)
-
-    ordered_blocks: list[dict[str, Any] | None] = [None] * len(chunks)
-    pending_indices: list[int] = []
-
-    for index, chunk_id in enumerate(chunk_ids):
-        existing_block = existing_blocks.get(chunk_id)
-        if existing_block and isinstance(existing_block.get("triples"), list):
-            ordered_blocks[index] = existing_block
-        else:
-            pending_indices.append(index)
-
-    if pending_indices:
-        client = OpenAI(api_key=config.openai_api_key)
-        with ThreadPoolExecutor(max_workers=config.max_workers) as executor:
-            futures = {
-                executor.submit(call_model, client, config.default_model, chunks[index], chunk_ids[index]): index
-                for index in pending_indices
-            }
-            for completed_count, future in enumerate(
-                tqdm(as_completed(futures), total=len(futures), desc="Extracting triples"),
-                start=1,
-            ):
-                index = futures[future]
-                try:
-                    ordered_blocks[index] = future.result()
-                except Exception as exc:
-                    ordered_blocks[index] = {
-                        "chunk_id": chunk_ids[index],
-                        "content": chunks[index],
-                        "triples": [],
-                        "error": str(exc),
-                    }
-
-                if completed_count % 10 == 0 or completed_count == len(futures):
-                    save_blocks(output_path, [block for block in ordered_blocks if block is not None])
+    workers = config.chunk_workers or None
+    if config.extraction_mode == "batch":
+        from index.batch_extraction import extract_chunk_batches as extract
+    elif config.extraction_mode == "sync":
+        extract = extract_chunk_stream
     else:
-        save_blocks(output_path, [block for block in ordered_blocks if block is not None])
-
-    final_blocks = [block for block in ordered_blocks if block is not None]
-    save_blocks(output_path, final_blocks)
+        raise ValueError(
+            f"Unknown EXTRACTION_MODE '{config.extraction_mode}'. Expected one of: {', '.join(EXTRACTION_MODES)}."
+        )
+    document_stats: dict[str, int] = {}
+
+    if is_document_corpus(input_path):
+        documents = discover_documents(input_path, config.document_extensions)
+        if not documents:
+            raise ValueError(f"No documents found in {input_path}")
+        chunking = {"max_tokens": config.max_tokens, "overlap": config.overlap, "model": config.default_model}
+        state_path = config.get_document_state_file()
+        previous_state = {} if force_rebuild else load_document_state(state_path)
+        plan = plan_ingest(documents, previous_state, chunking, existing_blocks)
+        print(
+            f"Documents: {len(documents)} total, {len(plan.unchanged)} unchanged, "
+            f"{len(documents) - len(plan.unchanged)} to chunk, {len(plan.removed)} removed"
+        )
+        chunks: Iterable[tuple[str, str, str | None]] = iter_corpus_chunks(
+            plan, existing_blocks, config.max_tokens, config.overlap, config.default_model, workers=workers
+        )
+        final_blocks, extraction = extract(config, chunks, existing_blocks, output_path, on_block)
+        save_document_state(state_path, {"chunking": chunking, "documents": plan.records})
+        document_stats = {
+            "documents": len(documents),
+            "documents_unchanged": len(plan.unchanged),
+            "documents_removed": len(plan.removed),
+        }
+    else:
+        windows = iter_file_chunks(
+            input_path,
+            config.max_tokens,
+            config.overlap,
+            config.default_model,
+            workers=workers,
+            segment_chars=config.chunk_segment_chars,
+        )
+        chunks = ((f"chunk-{index:05d}", chunk, None) for index, chunk in enumerate(windows))
+        final_blocks, extraction = extract(config, chunks, existing_blocks, output_path, on_block)
+
+    if extraction["chunks"] and config.extraction_mode == "batch":
+        print(
+            f"Extraction: {extraction['chunks']} chunks through {extraction['batches']} batches "
+            f"({extraction['submitted']} requests submitted, {extraction['resumed']} resumed, "
+            f"{extraction['failed']} failed)"
+        )
+    elif extraction["chunks"]:
+        print(
+            f"Extraction: {extraction['chunks']} chunks in {extraction['requests']} requests "
+            f"({extraction['packed_requests']} packed, {extraction['fallback_requests']} fallback, "
+            f"{extraction['reissued']} straggler reissues); "
+            f"saved {extraction['requests_saved']} requests and ~{extraction['prompt_tokens_saved']} prompt tokens"
+        )
     config.mark_step_completed(
         "graph_construction",
         input_file=str(input_path),
         output_file=str(output_path),
-        kv_store_file=str(kv_store_path),
-        chunks=len(chunks),
+        chunk_store_file=str(chunk_store_path),
+        kv_store_file=str(kv_store_path) if config.write_kv_store_json else None,
+        chunks=len(final_blocks),
+        extraction=extraction,
+        **document_stats,
     )
     return str(output_path)
 
 
 
-def main(dataset_name: str, force_rebuild: bool = False) -> str:
+def main(dataset_name: str, force_rebuild: bool = False, input_path: str | None = None) -> str:
     """CLI-compatible entry point for graph construction."""
 
     config = get_config(dataset_name)
+    source = Path(input_path) if input_path else config.get_corpus_input()
     print(f"Building graph inputs for dataset: {dataset_name}")
-    print(f"Input: {config.get_contexts_file()}")
+    print(f"Input: {source}")
     print(f"Graph JSON: {config.get_graph_json_file()}")
-    print(f"KV store: {config.get_kv_store_file()}")
-    return run_graph_construction(config, force_rebuild=force_rebuild)
+    print(f"Chunk store: {config.get_chunk_store_file()}")
+    return run_graph_construction(config, force_rebuild=force_rebuild, input_path=source)
 
 
 if __name__ == "__main__":
@@ -232,6 +539,13 @@ if __name__ == "__main__":
         action="store_true",
         help="Recompute chunk extraction even if output artifacts already exist.",
     )
+    parser.add_argument(
+        "--input",
+        help="contexts file, documents directory, or manifest.jsonl (default: the dataset's own corpus)",
+    )
     args = parser.parse_args()
-    main(dataset_name=args.dataset, force_rebuild=args.force)
+    from utils.profiling import enable_stack_dumps
+
+    enable_stack_dumps(get_config(args.dataset))
+    main(dataset_name=args.dataset, force_rebuild=args.force, input_path=args.input)
 
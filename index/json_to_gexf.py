@@ -14,10 +14,13 @@ import argparse
 import json
 import re
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
 import networkx as nx
 
+if TYPE_CHECKING:
+    from config import THRAGConfig
+
 
 def clean_id(text: str) -> str:
     """Create a deterministic node identifier fragment."""
@@ -40,6 +43,19 @@ def is_valid_triple(item: dict[str, Any]) -> bool:
 
 
 
+def block_entries(block: dict[str, Any]) -> list[dict[str, Any]]:
+    """Valid triples of one extracted block, tagged with its chunk and document IDs."""
+
+    chunk_id = str(block.get("chunk_id", ""))
+    doc_id = str(block.get("doc_id") or "")
+    return [
+        {"chunk_id": chunk_id, "doc_id": doc_id, **item}
+        for item in block.get("triples", [])
+        if is_valid_triple(item)
+    ]
+
+
+
 def load_entries(input_file: Path) -> list[dict[str, Any]]:
     with input_file.open("r", encoding="utf-8") as handle:
         payload = json.load(handle)
@@ -54,41 +70,88 @@ def load_entries(input_file: Path) -> list[dict[str, Any]]:
 
     entries: list[dict[str, Any]] = []
     for block in blocks:
-        chunk_id = str(block.get("chunk_id", ""))
-        for item in block.get("triples", []):
-            if not is_valid_triple(item):
-                continue
-            entries.append({"chunk_id": chunk_id, **item})
+        entries.extend(block_entries(block))
     return entries
 
 
 
+def hierarchy_labels(side: dict[str, Any]) -> tuple[str, str]:
+    """Subtopic and main-topic labels of one side of a triple, with the graph's defaults."""
+
+    subtopic = str(side.get("subtopic", "")).strip() or "Unknown Subtopic"
+    topic = str(side.get("main_topic", "")).strip() or "Unknown Topic"
+    return subtopic, topic
+
+
+
+def dataset_label_aliases(config: THRAGConfig) -> dict[str, dict[str, str]] | None:
+    """Write the alias files of the enabled label passes and return their aliases by node type.
+
+    Returns ``None`` when neither ``ENTITY_CANONICALIZATION`` nor
+    ``TOPIC_CONSOLIDATION`` is set.
+    """
+
+    if not config.rewrites_graph_labels():
+        return None
+    from index.embedders import create_embedder
+
+    embedder = create_embedder(config)
+    aliases: dict[str, dict[str, str]] = {}
+    if config.entity_canonicalization:
+        from index.entity_canonicalization import canonicalize_dataset
+
+        aliases["entity"] = canonicalize_dataset(config, embedder)
+    if config.topic_consolidation:
+        from index.topic_consolidation import consolidate_dataset
+
+        aliases.update(consolidate_dataset(config, embedder, entity_aliases=aliases.get("entity")))
+    return aliases
+
+
+
 def add_labeled_node(graph: nx.Graph, node_id: str, label: str, node_type: str) -> None:
     graph.add_node(node_id, label=label.strip(), type=node_type)
 
 
 
-def convert_json_to_gexf(input_file: str, output_file: str | None = None) -> str:
-    input_path = Path(input_file)
-    output_path = Path(output_file) if output_file else input_path.with_suffix(".gexf")
+class GraphAccumulator:
+    """Build the hierarchical knowledge graph one triple at a time.
 
-    entries = load_entries(input_path)
-    if not entries:
-        raise ValueError(f"No valid triples found in {input_path}")
+    ``add`` returns the evidence sentence of a triple when the sentence has not
+    been seen before, so callers can act on new sentences (for example embed
+    them) while the graph is still growing. ``aliases`` maps a node type
+    (``entity``, ``subtopic``, or ``topic``) to a map from extracted labels to
+    the canonical labels chosen by ``index.entity_canonicalization`` and
+    ``index.topic_consolidation``.
+    """
 
-    graph = nx.Graph()
-    for entry in entries:
+    def __init__(self, aliases: dict[str, dict[str, str]] | None = None) -> None:
+        self.graph = nx.Graph()
+        self.aliases = aliases or {}
+        self.entries = 0
+        self._sentence_chunks: dict[tuple[str, str], dict[str, set[str]]] = {}
+        self._sentences: set[str] = set()
+
+    def add_block(self, block: dict[str, Any]) -> list[str]:
+        """Add every valid triple of an extracted block and return its new sentences."""
+
+        new_sentences = [self.add(entry) for entry in block_entries(block)]
+        return [sentence for sentence in new_sentences if sentence]
+
+    def add(self, entry: dict[str, Any]) -> str | None:
+        graph = self.graph
+        self.entries += 1
         subject_label, predicate_label, object_label = [str(value).strip() for value in entry["triple"]]
-        subject_subtopic = str(entry["subject"].get("subtopic", "")).strip() or "Unknown Subtopic"
-        subject_topic = str(entry["subject"].get("main_topic", "")).strip() or "Unknown Topic"
-        object_subtopic = str(entry["object"].get("subtopic", "")).strip() or "Unknown Subtopic"
-        object_topic = str(entry["object"].get("main_topic", "")).strip() or "Unknown Topic"
+        subject_label, object_label = self._alias("entity", subject_label), self._alias("entity", object_label)
+        subject_subtopic, subject_topic = self._hierarchy(entry["subject"])
+        object_subtopic, object_topic = self._hierarchy(entry["object"])
         sentence_value = entry.get("sentence", "")
         if isinstance(sentence_value, list):
             sentence = " ".join(str(item).strip() for item in sentence_value if str(item).strip())
         else:
             sentence = str(sentence_value).strip()
         chunk_id = str(entry.get("chunk_id", ""))
+        doc_id = str(entry.get("doc_id") or "")
 
         subject_node = f"entity_{clean_id(subject_label)}"
         subject_subtopic_node = f"subtopic_{clean_id(subject_subtopic)}"
@@ -148,6 +211,10 @@ def convert_json_to_gexf(input_file: str, output_file: str | None = None) -> str
             edge["label"] = " / ".join(sorted(labels))
             edge["sentence"] = " / ".join(sorted(sentences))
             edge["chunk_ids"] = " / ".join(sorted(chunk_ids))
+            if doc_id:
+                doc_ids = set(filter(None, str(edge.get("doc_ids", "")).split(" / ")))
+                doc_ids.add(doc_id)
+                edge["doc_ids"] = " / ".join(sorted(doc_ids))
             edge["relation_type"] = "predicate_relation"
             edge["weight"] = int(edge.get("weight", 1)) + 1
         else:
@@ -160,13 +227,65 @@ def convert_json_to_gexf(input_file: str, output_file: str | None = None) -> str
                 chunk_ids=chunk_id,
                 weight=1,
             )
+            if doc_id:
+                graph[subject_node][object_node]["doc_ids"] = doc_id
+
+        if not sentence:
+            return None
+        edge_key = (subject_node, object_node) if subject_node <= object_node else (object_node, subject_node)
+        provenance = self._sentence_chunks.setdefault(edge_key, {}).setdefault(sentence, set())
+        if chunk_id:
+            provenance.add(chunk_id)
+        if sentence in self._sentences:
+            return None
+        self._sentences.add(sentence)
+        return sentence
+
+    def _alias(self, node_type: str, label: str) -> str:
+        return self.aliases.get(node_type, {}).get(label, label)
+
+    def _hierarchy(self, side: dict[str, Any]) -> tuple[str, str]:
+        subtopic, topic = hierarchy_labels(side)
+        return self._alias("subtopic", subtopic), self._alias("topic", topic)
+
+    def finish(self) -> nx.Graph:
+        """Attach per-sentence chunk provenance to the predicate edges and return the graph."""
+
+        for (source_node, target_node), provenance in self._sentence_chunks.items():
+            self.graph[source_node][target_node]["sentence_chunk_ids"] = json.dumps(
+                {sentence: sorted(chunk_ids) for sentence, chunk_ids in sorted(provenance.items())},
+                ensure_ascii=False,
+            )
+        return self.graph
+
 
+
+def write_graph(graph: nx.Graph, output_path: Path) -> str:
     output_path.parent.mkdir(parents=True, exist_ok=True)
     nx.write_gexf(graph, output_path)
     print(f"Wrote GEXF graph to {output_path}")
     return str(output_path)
 
 
+
+def convert_json_to_gexf(
+    input_file: str,
+    output_file: str | None = None,
+    aliases: dict[str, dict[str, str]] | None = None,
+) -> str:
+    input_path = Path(input_file)
+    output_path = Path(output_file) if output_file else input_path.with_suffix(".gexf")
+
+    entries = load_entries(input_path)
+    if not entries:
+        raise ValueError(f"No valid triples found in {input_path}")
+
+    accumulator = GraphAccumulator(aliases)
+    for entry in entries:
+        accumulator.add(entry)
+    return write_graph(accumulator.finish(), output_path)
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Convert graph JSON blocks into a GEXF graph.")
     parser.add_argument("input_file", help="Path to the extracted graph JSON file")
@@ -0,0 +1,178 @@
+"""Token-aware scheduling of model-call jobs for graph construction.
+
+``JobScheduler`` runs jobs on a thread pool with a fixed number in flight. Jobs
+are pulled lazily from their source into a bounded lookahead buffer and started
+largest estimated cost first, so long calls begin early instead of holding up
+the end of the run. Once the buffer is empty and workers would otherwise sit
+idle, a job that has been running longer than a percentile of the observed
+seconds-per-cost of finished jobs is issued a second time, and whichever
+attempt finishes first wins.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+
+import heapq
+import itertools
+import math
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Iterator
+
+from utils.tracing import percentile
+
+# Finished jobs whose latency defines the straggler threshold.
+_LATENCY_WINDOW = 1000
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate used to order jobs; about four characters per token."""
+
+    return max(1, math.ceil(len(text) / 4))
+
+
+@dataclass
+class _Job:
+    payload: Any
+    cost: float
+    started: float = 0.0
+    attempts: int = 0
+    running: int = 0
+    done: bool = False
+
+
+@dataclass
+class JobScheduler:
+    """Run ``worker(payload)`` for ``(cost, payload)`` jobs and yield their outcomes.
+
+    ``max_in_flight`` bounds the jobs running at once and ``lookahead`` the jobs
+    buffered for ordering. Reissues only use idle slots: attempts still running,
+    including abandoned ones, count against ``max_in_flight``.
+    ``straggler_percentile`` of 0 disables reissuing; no job is reissued before
+    ``straggler_min_samples`` jobs have finished, and no job runs more than twice.
+    """
+
+    worker: Callable[[Any], Any]
+    max_in_flight: int = 10
+    lookahead: int = 256
+    straggler_percentile: float = 95.0
+    straggler_min_samples: int = 10
+    stats: dict[str, int] = field(
+        default_factory=lambda: {"jobs": 0, "reissued": 0, "reissue_wins": 0, "failed_attempts": 0}
+    )
+
+    def run(self, jobs: Iterable[tuple[float, Any]]) -> Iterator[tuple[Any, Any, BaseException | None]]:
+        """Yield ``(payload, result, error)`` for every job in completion order."""
+
+        source = iter(jobs)
+        exhausted = False
+        queue: list[tuple[float, int, _Job]] = []
+        order = itertools.count()
+        running: dict[Future, tuple[_Job, float, bool]] = {}
+        seconds_per_cost: deque[float] = deque(maxlen=_LATENCY_WINDOW)
+        window = max(1, self.max_in_flight)
+        unfinished = 0
+
+        executor = ThreadPoolExecutor(max_workers=window * 2, thread_name_prefix="thrag-extract")
+
+        def start(job: _Job, reissue: bool) -> None:
+            now = time.perf_counter()
+            if not reissue:
+                job.started = now
+            job.attempts += 1
+            job.running += 1
+            running[executor.submit(self.worker, job.payload)] = (job, now, reissue)
+
+        try:
+            while True:
+                while True:
+                    while not exhausted and len(queue) < self.lookahead:
+                        try:
+                            cost, payload = next(source)
+                        except StopIteration:
+                            exhausted = True
+                            break
+                        heapq.heappush(queue, (-cost, next(order), _Job(payload, max(float(cost), 1.0))))
+                    if not queue or len(running) >= window:
+                        break
+                    _cost, _order, job = heapq.heappop(queue)
+                    self.stats["jobs"] += 1
+                    unfinished += 1
+                    start(job, reissue=False)
+
+                if not unfinished:
+                    return
+
+                # Only wake up for stragglers when a reissue could start right away.
+                rate = self._straggler_rate(seconds_per_cost)
+                idle = rate is not None and not queue and len(running) < window
+                timeout = self._next_deadline(running, rate) if idle else None
+                done, _pending = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job, attempt_started, reissue = running.pop(future)
+                    job.running -= 1
+                    if job.done:
+                        continue
+                    error = future.exception()
+                    if error is not None:
+                        self.stats["failed_attempts"] += 1
+                        if job.running:
+                            continue
+                        job.done = True
+                        unfinished -= 1
+                        yield job.payload, None, error
+                        continue
+
+                    job.done = True
+                    unfinished -= 1
+                    seconds_per_cost.append((time.perf_counter() - attempt_started) / job.cost)
+                    if reissue:
+                        self.stats["reissue_wins"] += 1
+                    yield job.payload, future.result(), None
+
+                if idle:
+                    for job in self._stragglers(running, rate)[: max(0, window - len(running))]:
+                        self.stats["reissued"] += 1
+                        start(job, reissue=True)
+        finally:
+            # Abandoned straggler attempts finish in the background; their results are dropped.
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _straggler_rate(self, seconds_per_cost: deque[float]) -> float | None:
+        """Seconds per unit of cost beyond which a running job counts as a straggler."""
+
+        if self.straggler_percentile <= 0 or len(seconds_per_cost) < max(1, self.straggler_min_samples):
+            return None
+        return percentile(list(seconds_per_cost), self.straggler_percentile)
+
+    def _stragglers(self, running: dict[Future, tuple[_Job, float, bool]], rate: float | None) -> list[_Job]:
+        if rate is None:
+            return []
+        now = time.perf_counter()
+        return [
+            job
+            for job, _attempt_started, _reissue in list(running.values())
+            if not job.done and job.attempts == 1 and now - job.started > rate * job.cost
+        ]
+
+    def _next_deadline(self, running: dict[Future, tuple[_Job, float, bool]], rate: float | None) -> float | None:
+        """Seconds until the next running job would become a straggler."""
+
+        if rate is None:
+            return None
+        now = time.perf_counter()
+        deadlines = [
+            max(0.0, job.started + rate * job.cost - now)
+            for job, _attempt_started, _reissue in running.values()
+            if not job.done and job.attempts == 1
+        ]
+        return min(deadlines) + 1e-3 if deadlines else None
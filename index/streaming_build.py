@@ -0,0 +1,194 @@
+"""Streaming graph build for TH-RAG.
+
+The staged build runs extraction, GEXF conversion, and edge embedding one after
+another, so the embedding endpoint idles while the extraction endpoint works and
+the other way round. The streaming build passes every extracted block through a
+bounded queue to a consumer that grows the graph in memory and embeds evidence
+sentences as soon as they are first seen. When extraction ends only the GEXF
+write and the FAISS index build remain, and the index is built from the vectors
+that are already there.
+
+Triples are added in completion order rather than chunk order, so node and
+edge order in the GEXF file, and the label kept for entities whose names differ
+only in case or punctuation, can differ from a staged build. The sentences and
+their provenance are the same.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+
+import argparse
+import queue
+import threading
+import time
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any
+
+import networkx as nx
+import numpy as np
+
+from config import THRAGConfig, get_config
+from index.edge_embedding import build_edge_index
+from index.embedders import CachedEmbedder, Embedder, create_embedder
+from index.graph_construction import run_graph_construction
+from index.json_to_gexf import GraphAccumulator, write_graph
+
+_DONE = object()
+
+
+class StreamingGraphBuilder:
+    """Consume extracted blocks into a growing graph and embed new sentences in the background.
+
+    ``put`` is the ``on_block`` callback for extraction. It blocks while the
+    queue is full, which keeps extraction from running far ahead of the graph.
+    At most ``max_workers`` embedding batches are in flight; a batch that fails
+    is left for the final index build to embed again.
+    """
+
+    def __init__(self, embedder: Embedder, queue_blocks: int = 64, max_workers: int = 4) -> None:
+        self.embedder = embedder
+        self.accumulator = GraphAccumulator()
+        self.vectors: dict[str, np.ndarray] = {}
+        self.blocks = 0
+        self.failed_batches = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, queue_blocks))
+        self._max_workers = max(1, max_workers)
+        self._pending: list[str] = []
+        self._in_flight: dict[Future, list[str]] = {}
+        self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="thrag-stream-embed")
+        self._error: BaseException | None = None
+        self._thread = threading.Thread(target=self._consume, name="thrag-stream-graph", daemon=True)
+        self._thread.start()
+
+    def put(self, block: dict[str, Any]) -> None:
+        if self._error is not None:
+            raise RuntimeError("Streaming graph build failed") from self._error
+        self._queue.put(block)
+
+    def close(self) -> nx.Graph:
+        """Wait for queued blocks and in-flight embeddings, then return the finished graph."""
+
+        self._queue.put(_DONE)
+        self._thread.join()
+        if self._error is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            raise RuntimeError("Streaming graph build failed") from self._error
+        self._submit_pending()
+        self._collect(wait_all=True)
+        self._executor.shutdown()
+        return self.accumulator.finish()
+
+    def abort(self) -> None:
+        """Stop the consumer after extraction failed, dropping unembedded sentences."""
+
+        self._queue.put(_DONE)
+        self._thread.join()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _consume(self) -> None:
+        while True:
+            block = self._queue.get()
+            if block is _DONE:
+                return
+            if self._error is not None:
+                continue
+            try:
+                self.blocks += 1
+                self._pending.extend(self.accumulator.add_block(block))
+                if len(self._pending) >= self.embedder.batch_size:
+                    self._submit_pending()
+            except BaseException as exc:
+                self._error = exc
+
+    def _submit_pending(self) -> None:
+        while self._pending:
+            if len(self._in_flight) >= self._max_workers:
+                self._collect(wait_all=False)
+            batch = self._pending[: self.embedder.batch_size]
+            del self._pending[: self.embedder.batch_size]
+            self._in_flight[self._executor.submit(self.embedder.embed_batch, batch)] = batch
+
+    def _collect(self, wait_all: bool) -> None:
+        if not self._in_flight:
+            return
+        done, _running = wait(self._in_flight, return_when=ALL_COMPLETED if wait_all else FIRST_COMPLETED)
+        for future in done:
+            batch = self._in_flight.pop(future)
+            try:
+                self.vectors.update(zip(batch, future.result()))
+            except Exception as exc:
+                self.failed_batches += 1
+                print(f"Embedding {len(batch)} streamed sentences failed; they are retried at finalisation: {exc}")
+
+
+def run_streaming_build(config: THRAGConfig, force_rebuild: bool = False) -> str:
+    """Extract, build the GEXF graph, and index edge sentences with the stages overlapped."""
+
+    if config.rewrites_graph_labels():
+        raise ValueError(
+            "The streaming build cannot rewrite graph labels; unset ENTITY_CANONICALIZATION and TOPIC_CONSOLIDATION "
+            "or use the staged build."
+        )
+    embedder = create_embedder(config)
+    builder = StreamingGraphBuilder(embedder, config.stream_queue_blocks, config.max_workers)
+    started = time.perf_counter()
+    try:
+        run_graph_construction(config, force_rebuild=force_rebuild, on_block=builder.put)
+    except BaseException:
+        builder.abort()
+        raise
+    graph = builder.close()
+    extraction_seconds = time.perf_counter() - started
+    if not builder.accumulator.entries:
+        raise ValueError(f"No valid triples found in {config.get_graph_json_file()}")
+
+    gexf_path = write_graph(graph, config.get_graph_gexf_file())
+    config.mark_step_completed("json_to_gexf", output_file=gexf_path, streamed=True)
+
+    cached = CachedEmbedder(embedder, builder.vectors)
+    index_path = build_edge_index(config, cached)
+    report = {
+        "blocks": builder.blocks,
+        "triples": builder.accumulator.entries,
+        "embedded_during_extraction": len(builder.vectors) - cached.misses,
+        "embedded_at_finalisation": cached.misses,
+        "failed_batches": builder.failed_batches,
+        "extraction_seconds": extraction_seconds,
+        "finalisation_seconds": time.perf_counter() - started - extraction_seconds,
+    }
+    config.mark_step_completed(
+        "streaming_build",
+        gexf_file=gexf_path,
+        index_file=index_path,
+        **report,
+    )
+    print(
+        f"Streaming build: {report['blocks']} blocks, {report['embedded_during_extraction']} sentences embedded "
+        f"during extraction, {report['embedded_at_finalisation']} at finalisation; "
+        f"extraction {extraction_seconds:.1f}s, finalisation {report['finalisation_seconds']:.1f}s"
+    )
+    return index_path
+
+
+def main(dataset_name: str, force_rebuild: bool = False) -> str:
+    config = get_config(dataset_name)
+    print(f"Streaming graph build for dataset: {dataset_name}")
+    return run_streaming_build(config, force_rebuild=force_rebuild)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the graph and edge index with extraction and embedding overlapped.")
+    parser.add_argument("--dataset", required=True, help="Dataset name under data/<dataset>/")
+    parser.add_argument("--force", action="store_true", help="Recompute chunk extraction even if output artifacts exist.")
+    args = parser.parse_args()
+    from utils.profiling import enable_stack_dumps
+
+    enable_stack_dumps(get_config(args.dataset))
+    main(dataset_name=args.dataset, force_rebuild=args.force)
@@ -12,21 +12,16 @@ if str(PROJECT_ROOT) not in sys.path:
 
 import json
 import time
-from typing import List, Tuple
-
-import networkx as nx
-from openai import OpenAI
+from typing import TYPE_CHECKING, List, Tuple
 
 from config import get_config
 from prompt.subtopic_choice import SUBTOPIC_CHOICE_PROMPT
+from utils.hedging import model_call
+from utils.tracing import record_usage, span
 
-config = get_config()
-
-SUBTOPIC_CHOICE_MIN = config.subtopic_choice_min
-SUBTOPIC_CHOICE_MAX = config.subtopic_choice_max
-DEFAULT_MODEL = config.default_model
-MAX_RETRIES = config.max_retries
-RETRY_BACKOFF = config.retry_backoff
+if TYPE_CHECKING:
+    import networkx as nx
+    from openai import OpenAI
 
 
 def extract_subtopics_for_topic(graph: nx.Graph, topic_node_id: str) -> List[Tuple[str, str]]:
@@ -39,17 +34,45 @@ def extract_subtopics_for_topic(graph: nx.Graph, topic_node_id: str) -> List[Tup
     ]
 
 
+def build_subtopic_prompt(
+    question: str,
+    topic_label: str,
+    subtopic_labels: list[str],
+    min_subtopics: int,
+    max_subtopics: int,
+) -> str:
+    """Fill the subtopic selection prompt for one question and topic."""
+
+    return (
+        SUBTOPIC_CHOICE_PROMPT
+        .replace("{{TOPIC_LABEL}}", topic_label)
+        .replace("{{SUBTOPIC_LIST}}", json.dumps(subtopic_labels, ensure_ascii=False))
+        .replace("{question}", question)
+        .replace("{min_subtopics}", str(min_subtopics))
+        .replace("{max_subtopics}", str(max_subtopics))
+    )
+
+
 def choose_subtopics_for_topic(
     *,
     question: str,
     topic_nid: str,
     graph: nx.Graph,
     client: OpenAI,
-    model: str = DEFAULT_MODEL,
-    max_subtopics: int = SUBTOPIC_CHOICE_MAX,
-    min_subtopics: int = SUBTOPIC_CHOICE_MIN,
+    model: str | None = None,
+    max_subtopics: int | None = None,
+    min_subtopics: int | None = None,
 ) -> list[str]:
-    """Return the ordered list of subtopics chosen by the LLM."""
+    """Return the ordered list of subtopics chosen by the LLM.
+
+    Unset arguments default to ``DEFAULT_MODEL``, ``SUBTOPIC_CHOICE_MAX``, and
+    ``SUBTOPIC_CHOICE_MIN``.
+    """
+
+    config = get_config()
+    model = model or config.default_model
+    max_subtopics = config.subtopic_choice_max if max_subtopics is None else max_subtopics
+    min_subtopics = config.subtopic_choice_min if min_subtopics is None else min_subtopics
 
     if graph.nodes[topic_nid].get("type") != "topic":
         raise ValueError(f"Node {topic_nid} is not a topic node.")
@@ -65,26 +88,32 @@ def choose_subtopics_for_topic(
     min_subtopics = max(1, min(min_subtopics, len(subtopic_labels)))
     max_subtopics = max(min_subtopics, min(max_subtopics, len(subtopic_labels)))
 
-    prompt = (
-        SUBTOPIC_CHOICE_PROMPT
-        .replace("{{TOPIC_LABEL}}", str(graph.nodes[topic_nid].get("label", "")))
-        .replace("{{SUBTOPIC_LIST}}", json.dumps(subtopic_labels, ensure_ascii=False))
-        .replace("{question}", question)
-        .replace("{min_subtopics}", str(min_subtopics))
-        .replace("{max_subtopics}", str(max_subtopics))
+    prompt = build_subtopic_prompt(
+        question,
+        str(graph.nodes[topic_nid].get("label", "")),
+        subtopic_labels,
+        min_subtopics,
+        max_subtopics,
     )
 
-    for attempt in range(1, MAX_RETRIES + 1):
+    for attempt in range(1, config.max_retries + 1):
         try:
-            response = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": "You select relevant subtopics from a fixed list."},
-                    {"role": "user", "content": prompt},
-                ],
-                response_format={"type": "json_object"},
-                temperature=config.answer_temperature,
-            )
+            with span("subtopic_choice", topic=topic_nid, attempt=attempt):
+                response = model_call(
+                    "subtopic_choice",
+                    lambda: client.chat.completions.create(
+                        model=model,
+                        messages=[
+                            {"role": "system", "content": "You select relevant subtopics from a fixed list."},
+                            {"role": "user", "content": prompt},
+                        ],
+                        response_format={"type": "json_object"},
+                        temperature=config.answer_temperature,
+                        timeout=config.stage_timeout("subtopic_choice"),
+                    ),
+                    config,
+                )
+                record_usage(response)
             content = response.choices[0].message.content or "{}"
             payload = json.loads(content)
             chosen = payload.get("subtopics", [])
@@ -98,8 +127,8 @@ def choose_subtopics_for_topic(
             raise ValueError("The model did not return any valid subtopics.")
         except Exception as exc:
             print(f"Subtopic selection attempt {attempt} failed: {exc}")
-            if attempt < MAX_RETRIES:
-                time.sleep(RETRY_BACKOFF)
+            if attempt < config.max_retries:
+                time.sleep(config.retry_backoff)
 
     print("Subtopic selection fell back to the first available subtopics.")
     return subtopic_labels[:max_subtopics]
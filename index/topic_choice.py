@@ -11,20 +11,16 @@ if str(PROJECT_ROOT) not in sys.path:
 
 
 import json
-from typing import List
-
-import networkx as nx
-from openai import OpenAI
+from typing import TYPE_CHECKING, List
 
 from config import get_config
 from prompt.topic_choice import TOPIC_CHOICE_PROMPT
+from utils.hedging import model_call
+from utils.tracing import record_usage, span
 
-config = get_config()
-
-DEFAULT_MODEL = config.default_model
-TOPIC_CHOICE_MIN = config.topic_choice_min
-TOPIC_CHOICE_MAX = config.topic_choice_max
-MAX_RETRIES = config.max_retries
+if TYPE_CHECKING:
+    import networkx as nx
+    from openai import OpenAI
 
 
 def extract_graph_topic_labels(graph: nx.Graph) -> List[str]:
@@ -42,16 +38,38 @@ def extract_graph_topic_labels(graph: nx.Graph) -> List[str]:
     return labels
 
 
+def build_topic_prompt(question: str, topic_labels: list[str], min_topics: int, max_topics: int) -> str:
+    """Fill the topic selection prompt for one question."""
+
+    return (
+        TOPIC_CHOICE_PROMPT
+        .replace("{{TOPIC_LIST}}", json.dumps(topic_labels, ensure_ascii=False))
+        .replace("{{question}}", question)
+        .replace("{min_topics}", str(min_topics))
+        .replace("{max_topics}", str(max_topics))
+    )
+
+
 def choose_topics_from_graph(
     question: str,
     graph: nx.Graph,
     client: OpenAI,
-    model: str = DEFAULT_MODEL,
-    max_topics: int = TOPIC_CHOICE_MAX,
-    min_topics: int = TOPIC_CHOICE_MIN,
-    max_retries: int = MAX_RETRIES,
+    model: str | None = None,
+    max_topics: int | None = None,
+    min_topics: int | None = None,
+    max_retries: int | None = None,
 ) -> List[str]:
-    """Ask the LLM to select relevant topic labels from the graph."""
+    """Ask the LLM to select relevant topic labels from the graph.
+
+    Unset arguments default to ``DEFAULT_MODEL``, ``TOPIC_CHOICE_MAX``,
+    ``TOPIC_CHOICE_MIN``, and ``MAX_RETRIES``.
+    """
+
+    config = get_config()
+    model = model or config.default_model
+    max_topics = config.topic_choice_max if max_topics is None else max_topics
+    min_topics = config.topic_choice_min if min_topics is None else min_topics
+    max_retries = config.max_retries if max_retries is None else max_retries
 
     topic_labels = extract_graph_topic_labels(graph)
     if not topic_labels:
@@ -60,25 +78,26 @@ def choose_topics_from_graph(
     min_topics = max(1, min(min_topics, len(topic_labels)))
     max_topics = max(min_topics, min(max_topics, len(topic_labels)))
 
-    prompt = (
-        TOPIC_CHOICE_PROMPT
-        .replace("{{TOPIC_LIST}}", json.dumps(topic_labels, ensure_ascii=False))
-        .replace("{{question}}", question)
-        .replace("{min_topics}", str(min_topics))
-        .replace("{max_topics}", str(max_topics))
-    )
+    prompt = build_topic_prompt(question, topic_labels, min_topics, max_topics)
 
     last_error: Exception | None = None
     for attempt in range(1, max_retries + 1):
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "You select relevant topic labels from a fixed list."},
-                {"role": "user", "content": prompt},
-            ],
-            response_format={"type": "json_object"},
-            temperature=config.answer_temperature,
-        )
+        with span("topic_choice", attempt=attempt):
+            response = model_call(
+                "topic_choice",
+                lambda: client.chat.completions.create(
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": "You select relevant topic labels from a fixed list."},
+                        {"role": "user", "content": prompt},
+                    ],
+                    response_format={"type": "json_object"},
+                    temperature=config.answer_temperature,
+                    timeout=config.stage_timeout("topic_choice"),
+                ),
+                config,
+            )
+            record_usage(response)
         content = response.choices[0].message.content or "{}"
 
         try:
@@ -0,0 +1,447 @@
+"""Merge synonymous topic and subtopic labels and cap each topic's fan-out.
+
+Extraction labels both sides of every triple with a free-form main topic and
+subtopic, so a large corpus accumulates many near-synonym labels ("Sport",
+"Sports", "Sporting events"). ``choose_topics_from_graph`` sends every topic
+label in one prompt and ``choose_subtopics_for_topic`` every subtopic of a
+chosen topic, so each synonym makes every selection prompt longer. This stage
+maps topic and subtopic labels to canonical labels before the graph is built:
+
+- labels with the same ``label_key`` are merged outright;
+- every label is compared with its ``neighbors`` nearest labels of the same
+  kind (cosine of the dataset's embeddings, searched with FAISS) and pairs at
+  least ``threshold`` similar are merged. Labels whose numbers differ are never
+  paired. With ``TOPIC_MERGE_LLM=true`` the pairs are first sent to the model
+  in batches and only the pairs it confirms as synonyms are merged;
+- a topic left with more than ``max_subtopics`` subtopics keeps its most
+  frequent ones and folds every other subtopic into the most similar kept one.
+  Subtopic nodes are shared between topics, so a folded subtopic is folded
+  everywhere; this never raises the fan-out of another topic.
+
+``GraphAccumulator`` then rewrites the ``has_subtopic`` and ``has_topic`` edges
+with the canonical labels. The report written next to the graph records the
+merges, the graph reduction, and the token counts of the topic and subtopic
+selection prompts before and after, for every question in ``qa.json``.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+
+import argparse
+import json
+import re
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Iterable
+
+import numpy as np
+import tiktoken
+
+from config import THRAGConfig, get_config
+from index.embedders import Embedder, create_embedder
+from index.entity_canonicalization import UnionFind, canonical_label, graph_counts, label_key, reduction
+from index.json_to_gexf import hierarchy_labels, load_entries
+from index.subtopic_choice import build_subtopic_prompt
+from index.topic_choice import build_topic_prompt
+from prompt.topic_merge import TOPIC_MERGE_PROMPT
+from utils.hedging import model_call
+from utils.tracing import summarize_values
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+_DIGITS = re.compile(r"\d+")
+
+Confirm = Callable[[str, list[tuple[str, str]]], list[bool]]
+
+
+def hierarchy_counts(
+    entries: Iterable[dict[str, Any]],
+    aliases: dict[str, dict[str, str]] | None = None,
+) -> tuple[Counter[str], Counter[str], dict[str, Counter[str]]]:
+    """Topic and subtopic label counts and the subtopic counts under each topic."""
+
+    aliases = aliases or {}
+    subtopic_aliases, topic_aliases = aliases.get("subtopic", {}), aliases.get("topic", {})
+    topics: Counter[str] = Counter()
+    subtopics: Counter[str] = Counter()
+    topic_subtopics: dict[str, Counter[str]] = defaultdict(Counter)
+    for entry in entries:
+        for side in ("subject", "object"):
+            subtopic, topic = hierarchy_labels(entry[side])
+            subtopic, topic = subtopic_aliases.get(subtopic, subtopic), topic_aliases.get(topic, topic)
+            topics[topic] += 1
+            subtopics[subtopic] += 1
+            topic_subtopics[topic][subtopic] += 1
+    return topics, subtopics, topic_subtopics
+
+
+def nearest_pairs(vectors: np.ndarray, neighbors: int, threshold: float) -> list[tuple[int, int, float]]:
+    """Row pairs among each row's ``neighbors`` nearest rows with cosine of at least ``threshold``."""
+
+    import faiss
+
+    if len(vectors) < 2 or neighbors <= 0:
+        return []
+    index = faiss.IndexFlatIP(vectors.shape[1])
+    index.add(np.ascontiguousarray(vectors, dtype="float32"))
+    scores, rows = index.search(np.ascontiguousarray(vectors, dtype="float32"), min(neighbors + 1, len(vectors)))
+    pairs: dict[tuple[int, int], float] = {}
+    for left, (row_scores, row_ids) in enumerate(zip(scores, rows)):
+        for score, right in zip(row_scores, row_ids):
+            if right < 0 or right == left or score < threshold:
+                continue
+            pairs[(min(left, int(right)), max(left, int(right)))] = float(score)
+    return sorted(((left, right, score) for (left, right), score in pairs.items()), key=lambda pair: -pair[2])
+
+
+def confirm_pairs(
+    kind: str,
+    pairs: list[tuple[str, str]],
+    client: OpenAI,
+    model: str,
+    config: THRAGConfig,
+    batch_size: int = 50,
+) -> list[bool]:
+    """Ask the model which label pairs are synonyms; unanswered batches are not merged."""
+
+    def confirm_batch(batch: list[tuple[str, str]]) -> list[bool]:
+        lines = "\n".join(
+            f"{number}. {json.dumps(list(pair), ensure_ascii=False)}" for number, pair in enumerate(batch, start=1)
+        )
+        prompt = TOPIC_MERGE_PROMPT.replace("{kind}", kind).replace("{{PAIRS}}", lines)
+        for attempt in range(1, config.max_retries + 1):
+            try:
+                response = model_call(
+                    "topic_merge",
+                    lambda: client.chat.completions.create(
+                        model=model,
+                        messages=[
+                            {"role": "system", "content": "You decide which graph labels are synonyms."},
+                            {"role": "user", "content": prompt},
+                        ],
+                        response_format={"type": "json_object"},
+                        temperature=0,
+                        timeout=config.stage_timeout("topic_merge"),
+                    ),
+                    config,
+                )
+                chosen = json.loads(response.choices[0].message.content or "{}").get("synonyms")
+                if not isinstance(chosen, list):
+                    raise ValueError("The model response did not contain a list under 'synonyms'.")
+                confirmed = {int(number) for number in chosen}
+                return [number in confirmed for number in range(1, len(batch) + 1)]
+            except Exception as exc:
+                print(f"{kind.capitalize()} merge confirmation attempt {attempt} failed: {exc}")
+                if attempt < config.max_retries:
+                    time.sleep(config.retry_backoff)
+        print(f"Leaving {len(batch)} {kind} pairs unmerged after failed confirmations.")
+        return [False] * len(batch)
+
+    batches = [pairs[start : start + batch_size] for start in range(0, len(pairs), batch_size)]
+    with ThreadPoolExecutor(max_workers=max(1, min(config.max_workers, len(batches) or 1))) as executor:
+        return [answer for answers in executor.map(confirm_batch, batches) for answer in answers]
+
+
+def merge_labels(
+    kind: str,
+    counts: Counter[str],
+    embedder: Embedder,
+    *,
+    threshold: float = 0.9,
+    neighbors: int = 5,
+    confirm: Confirm | None = None,
+    max_workers: int = 1,
+) -> dict[str, Any]:
+    """Cluster the labels of one kind and return the alias map with the evidence for each merge.
+
+    ``vectors`` maps every canonical label to its embedding, for folding.
+    """
+
+    labels_by_key: dict[str, list[str]] = defaultdict(list)
+    for label in counts:
+        labels_by_key[label_key(label) or label].append(label)
+    keys = sorted(labels_by_key)
+    representatives = [canonical_label(labels_by_key[key], counts) for key in keys]
+    merges = Counter({"same_key": sum(len(labels) - 1 for labels in labels_by_key.values())})
+
+    vectors = (
+        embedder.embed_many(representatives, max_workers=max_workers, desc=f"Embedding {kind} labels")
+        if keys
+        else np.zeros((0, 1), dtype="float32")
+    )
+    pairs = [
+        (left, right)
+        for left, right, _score in nearest_pairs(vectors, neighbors, threshold)
+        if _DIGITS.findall(keys[left]) == _DIGITS.findall(keys[right])
+    ]
+    accepted = (
+        confirm(kind, [(representatives[left], representatives[right]) for left, right in pairs])
+        if confirm and pairs
+        else [True] * len(pairs)
+    )
+    union = UnionFind(keys)
+    for (left, right), accept in zip(pairs, accepted):
+        if accept:
+            merges["embedding"] += union.union(keys[left], keys[right])
+        else:
+            merges["rejected"] += 1
+
+    rows = {key: row for row, key in enumerate(keys)}
+    clusters: dict[str, list[str]] = defaultdict(list)
+    for key in keys:
+        clusters[union.find(key)].extend(labels_by_key[key])
+
+    aliases: dict[str, str] = {}
+    canonical_vectors: dict[str, np.ndarray] = {}
+    merged_clusters: list[dict[str, Any]] = []
+    for root, members in clusters.items():
+        canonical = canonical_label(members, counts)
+        aliases.update({label: canonical for label in members if label != canonical})
+        canonical_vectors[canonical] = vectors[rows[label_key(canonical) or canonical]]
+        if len(members) > 1:
+            labels = sorted(members, key=counts.__getitem__, reverse=True)
+            merged_clusters.append({"canonical": canonical, "labels": labels})
+    merged_clusters.sort(key=lambda cluster: (-len(cluster["labels"]), cluster["canonical"]))
+
+    return {
+        "aliases": aliases,
+        "clusters": merged_clusters,
+        "merges": dict(merges),
+        "candidate_pairs": len(pairs),
+        "vectors": canonical_vectors,
+    }
+
+
+def cap_fanout(
+    topic_subtopics: dict[str, Counter[str]],
+    vectors: dict[str, np.ndarray],
+    max_subtopics: int,
+) -> dict[str, str]:
+    """Fold the least frequent subtopics of each over-wide topic into its most similar kept subtopic.
+
+    Topics are visited from the widest down, and a subtopic folded under one
+    topic resolves to its target under every other topic too.
+    """
+
+    folds: dict[str, str] = {}
+    if max_subtopics <= 0:
+        return folds
+
+    def resolve(label: str) -> str:
+        while label in folds:
+            label = folds[label]
+        return label
+
+    for topic in sorted(topic_subtopics, key=lambda name: (-len(topic_subtopics[name]), name)):
+        current: Counter[str] = Counter()
+        for subtopic, count in topic_subtopics[topic].items():
+            current[resolve(subtopic)] += count
+        if len(current) <= max_subtopics:
+            continue
+        ranked = sorted(current, key=lambda label: (-current[label], label))
+        kept = ranked[:max_subtopics]
+        kept_vectors = np.stack([vectors[label] for label in kept])
+        for subtopic in ranked[max_subtopics:]:
+            folds[subtopic] = kept[int(np.argmax(kept_vectors @ vectors[subtopic]))]
+    return {label: resolve(label) for label in folds}
+
+
+def consolidate_entries(
+    entries: list[dict[str, Any]],
+    embedder: Embedder,
+    *,
+    threshold: float = 0.9,
+    neighbors: int = 5,
+    max_subtopics: int = 50,
+    confirm: Confirm | None = None,
+    entity_aliases: dict[str, str] | None = None,
+    max_workers: int = 1,
+) -> dict[str, Any]:
+    """Merge the topic and subtopic labels of ``entries`` and report the graph reduction it gives."""
+
+    started = time.perf_counter()
+    topic_counts, subtopic_counts, _topic_subtopics = hierarchy_counts(entries)
+    options = {"threshold": threshold, "neighbors": neighbors, "confirm": confirm, "max_workers": max_workers}
+    topics = merge_labels("topic", topic_counts, embedder, **options)
+    subtopics = merge_labels("subtopic", subtopic_counts, embedder, **options)
+
+    merged_hierarchy = hierarchy_counts(entries, {"subtopic": subtopics["aliases"], "topic": topics["aliases"]})[2]
+    folds = cap_fanout(merged_hierarchy, subtopics.pop("vectors"), max_subtopics)
+    topics.pop("vectors")
+    subtopic_aliases = {}
+    for label in subtopic_counts:
+        target = subtopics["aliases"].get(label, label)
+        target = folds.get(target, target)
+        if target != label:
+            subtopic_aliases[label] = target
+
+    aliases = {"subtopic": subtopic_aliases, "topic": topics["aliases"]}
+    entity = {"entity": entity_aliases or {}}
+    before, after = graph_counts(entries, entity), graph_counts(entries, {**entity, **aliases})
+    return {
+        "aliases": aliases,
+        "clusters": {"topic": topics["clusters"], "subtopic": subtopics["clusters"]},
+        "folds": dict(sorted(folds.items())),
+        "report": {
+            "topic_labels": len(topic_counts),
+            "subtopic_labels": len(subtopic_counts),
+            "topic_merges": topics["merges"],
+            "subtopic_merges": subtopics["merges"],
+            "candidate_pairs": {"topic": topics["candidate_pairs"], "subtopic": subtopics["candidate_pairs"]},
+            "subtopics_folded": len(folds),
+            "max_subtopics": max_subtopics,
+            "seconds": time.perf_counter() - started,
+            "graph": reduction(before, after),
+        },
+    }
+
+
+def token_counter(model: str) -> Callable[[str], int]:
+    try:
+        encoding = tiktoken.encoding_for_model(model)
+    except KeyError:
+        encoding = tiktoken.get_encoding("cl100k_base")
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+def selection_prompt_tokens(
+    questions: list[str],
+    hierarchy: dict[str, Counter[str]],
+    config: THRAGConfig,
+    count_tokens: Callable[[str], int],
+) -> dict[str, Any]:
+    """Token counts of the topic and subtopic selection prompts over one topic hierarchy.
+
+    The topic prompt is counted for every question. Subtopic prompts are counted
+    once per topic without the question, whose tokens are added back per query;
+    ``per_query`` estimates one topic prompt plus ``TOPIC_CHOICE_MAX`` subtopic
+    prompts of average size, since the topics a question selects are not known
+    at build time.
+    """
+
+    topic_labels = list(hierarchy)
+    min_topics = max(1, min(config.topic_choice_min, len(topic_labels)))
+    max_topics = max(min_topics, min(config.topic_choice_max, len(topic_labels)))
+    subtopic_tokens = []
+    for topic, subtopics in hierarchy.items():
+        min_subtopics = max(1, min(config.subtopic_choice_min, len(subtopics)))
+        max_subtopics = max(min_subtopics, min(config.subtopic_choice_max, len(subtopics)))
+        prompt = build_subtopic_prompt("", topic, list(subtopics), min_subtopics, max_subtopics)
+        subtopic_tokens.append(count_tokens(prompt))
+    mean_subtopic = sum(subtopic_tokens) / len(subtopic_tokens) if subtopic_tokens else 0.0
+
+    topic_tokens: list[float] = []
+    per_query: list[float] = []
+    for question in questions or [""]:
+        topic_prompt = count_tokens(build_topic_prompt(question, topic_labels, min_topics, max_topics))
+        topic_tokens.append(topic_prompt)
+        per_query.append(topic_prompt + max_topics * (mean_subtopic + count_tokens(question)))
+    return {
+        "topics": len(topic_labels),
+        "topic_prompt": summarize_values(topic_tokens),
+        "subtopic_prompt": summarize_values(subtopic_tokens),
+        "per_query": summarize_values(per_query),
+    }
+
+
+def prompt_token_report(
+    entries: list[dict[str, Any]],
+    aliases: dict[str, dict[str, str]],
+    questions: list[str],
+    config: THRAGConfig,
+    count_tokens: Callable[[str], int] | None = None,
+) -> dict[str, Any]:
+    count_tokens = count_tokens or token_counter(config.default_model)
+    before = selection_prompt_tokens(questions, hierarchy_counts(entries)[2], config, count_tokens)
+    after = selection_prompt_tokens(questions, hierarchy_counts(entries, aliases)[2], config, count_tokens)
+    return {
+        "questions": len(questions),
+        "before": before,
+        "after": after,
+        "reduction": {
+            key: 1 - after[key]["mean"] / before[key]["mean"] if before[key]["mean"] else 0.0
+            for key in ("topic_prompt", "subtopic_prompt", "per_query")
+        },
+    }
+
+
+def load_question_texts(config: THRAGConfig) -> list[str]:
+    qa_path = config.get_questions_file()
+    if not qa_path.exists():
+        return []
+    with qa_path.open("r", encoding="utf-8") as handle:
+        payload = json.load(handle)
+    return [str(item["query"]) for item in payload if isinstance(item, dict) and "query" in item]
+
+
+def consolidate_dataset(
+    config: THRAGConfig,
+    embedder: Embedder | None = None,
+    *,
+    client: OpenAI | None = None,
+    entity_aliases: dict[str, str] | None = None,
+    count_tokens: Callable[[str], int] | None = None,
+) -> dict[str, dict[str, str]]:
+    """Write the topic alias file of a dataset's graph JSON and return its subtopic and topic aliases."""
+
+    graph_json_path = config.get_graph_json_file()
+    if not graph_json_path.exists():
+        raise FileNotFoundError(f"Graph JSON file not found. Run graph_construction first: {graph_json_path}")
+
+    confirm = None
+    if config.topic_merge_llm:
+        if client is None:
+            from utils.openai_client import create_client
+
+            client = create_client(config)
+
+        def confirm(kind: str, pairs: list[tuple[str, str]]) -> list[bool]:
+            return confirm_pairs(kind, pairs, client, config.default_model, config)
+
+    entries = load_entries(graph_json_path)
+    result = consolidate_entries(
+        entries,
+        embedder or create_embedder(config),
+        threshold=config.topic_merge_threshold,
+        neighbors=config.topic_merge_neighbors,
+        max_subtopics=config.topic_max_subtopics,
+        confirm=confirm,
+        entity_aliases=entity_aliases,
+        max_workers=config.max_workers,
+    )
+    result["report"]["prompt_tokens"] = prompt_token_report(
+        entries, result["aliases"], load_question_texts(config), config, count_tokens
+    )
+    output_path = config.get_topic_aliases_file()
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with output_path.open("w", encoding="utf-8") as handle:
+        json.dump(result, handle, indent=2, ensure_ascii=False)
+
+    report = result["report"]
+    graph, tokens = report["graph"], report["prompt_tokens"]
+    print(
+        f"[{config.dataset_name}] Consolidated topics {graph['topic_nodes']['before']} -> "
+        f"{graph['topic_nodes']['after']} and subtopics {graph['subtopic_nodes']['before']} -> "
+        f"{graph['subtopic_nodes']['after']} ({report['subtopics_folded']} folded by the fan-out cap); "
+        f"mean selection prompt tokens per query {tokens['before']['per_query']['mean']:.0f} -> "
+        f"{tokens['after']['per_query']['mean']:.0f}. Aliases written to {output_path}"
+    )
+    return result["aliases"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Merge the topic and subtopic labels of a dataset's extracted graph."
+    )
+    parser.add_argument("--dataset", required=True, help="Dataset name under data/<dataset>/")
+    args = parser.parse_args()
+    consolidate_dataset(get_config(args.dataset))
@@ -1,12 +1,24 @@
-"""Unified pipeline runner for the TH-RAG research codebase."""
+"""Unified pipeline runner for the TH-RAG research codebase.
+
+Steps form a dependency graph and run as soon as the steps they depend on have
+finished, so independent steps such as short and long answer generation run
+concurrently. Whether a step needs to run is decided by its manifest under
+``results/manifests/<dataset>/``, which records the content hashes of the
+step's input files and prompts and the settings it ran with. Several datasets
+can be given at once; they run in parallel under one shared OpenAI rate budget
+and each keeps its own state file under ``temp/state/``.
+"""
 
 from __future__ import annotations
 
 import argparse
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
 from pathlib import Path
-from typing import Callable
+from typing import Any, Callable
 
 from config import THRAGConfig, get_config
+from utils.manifests import changed_files, file_sha256, hash_files, load_manifest, save_manifest
 
 PROJECT_ROOT = Path(__file__).resolve().parent
 
@@ -26,6 +38,69 @@ STEP_GROUPS = {
 }
 
 
+STEP_DEPENDENCIES = {
+    "graph_construction": [],
+    "json_to_gexf": ["graph_construction"],
+    "edge_embedding": ["json_to_gexf"],
+    "answer_generation_short": ["edge_embedding"],
+    "answer_generation_long": ["edge_embedding"],
+    "evaluation_f1": ["answer_generation_short"],
+}
+
+_SELECTION_PROMPTS = ["prompt/topic_choice.py", "prompt/subtopic_choice.py"]
+STEP_PROMPTS = {
+    "graph_construction": ["prompt/extract_graph.py"],
+    "answer_generation_short": ["prompt/answer_short.py", *_SELECTION_PROMPTS],
+    "answer_generation_long": ["prompt/answer.py", *_SELECTION_PROMPTS],
+}
+
+_SELECTION_SETTINGS = [
+    "chat_model",
+    "default_model",
+    "answer_temperature",
+    "answer_max_tokens",
+    "topic_choice_min",
+    "topic_choice_max",
+    "subtopic_choice_min",
+    "subtopic_choice_max",
+]
+STEP_SETTINGS = {
+    "graph_construction": [
+        "default_model",
+        "max_tokens",
+        "overlap",
+        "max_tokens_response",
+        "extraction_pack_tokens",
+        "extraction_pack_max_chunks",
+        "document_extensions",
+    ],
+    "json_to_gexf": [
+        "entity_canonicalization",
+        "canonical_string_threshold",
+        "canonical_embed_threshold",
+        "canonical_max_block_size",
+        "topic_consolidation",
+        "topic_merge_threshold",
+        "topic_merge_neighbors",
+        "topic_merge_llm",
+        "topic_max_subtopics",
+    ],
+    "edge_embedding": [
+        "embed_backend",
+        "embed_model",
+        "embed_dimensions",
+        "embed_dim_reduction",
+        "hashing_embed_dim",
+        "local_embed_model_path",
+        "index_storage",
+        "pq_m",
+        "pq_nbits",
+    ],
+    "answer_generation_short": [*_SELECTION_SETTINGS, "top_k1", "top_k2"],
+    "answer_generation_long": [*_SELECTION_SETTINGS, "top_k1_long", "top_k2_long"],
+}
+
+
 def resolve_steps(requested_steps: list[str] | None) -> list[str]:
     """Expand group aliases and preserve the canonical execution order."""
 
@@ -45,7 +120,7 @@ def resolve_steps(requested_steps: list[str] | None) -> list[str]:
 
 def expected_outputs(config: THRAGConfig) -> dict[str, list[Path]]:
     return {
-        "graph_construction": [config.get_graph_json_file(), config.get_kv_store_file()],
+        "graph_construction": [config.get_graph_json_file(), config.get_chunk_store_file()],
         "json_to_gexf": [config.get_graph_gexf_file()],
         "edge_embedding": [config.get_edge_index_file(), config.get_edge_payload_file()],
         "answer_generation_short": [
@@ -60,22 +135,109 @@ def expected_outputs(config: THRAGConfig) -> dict[str, list[Path]]:
     }
 
 
-def step_is_complete(config: THRAGConfig, step_name: str) -> bool:
-    outputs = expected_outputs(config)[step_name]
-    if all(path.exists() for path in outputs):
-        return True
+def corpus_files(config: THRAGConfig) -> list[Path]:
+    """The files a dataset's corpus is read from."""
+
+    source = config.get_corpus_input()
+    if source.is_dir() or source.suffix == ".jsonl":
+        from index.documents import discover_documents
+
+        documents = [document.path for document in discover_documents(source, config.document_extensions)]
+        return documents if source.is_dir() else [source, *documents]
+    return [source]
+
+
+def step_inputs(config: THRAGConfig, step_name: str) -> list[Path]:
+    """Files whose content a step's outputs are derived from."""
+
+    if step_name == "graph_construction":
+        return corpus_files(config)
+    if step_name == "json_to_gexf":
+        return [config.get_graph_json_file()]
+    if step_name == "edge_embedding":
+        return [config.get_graph_gexf_file()]
+    if step_name in {"answer_generation_short", "answer_generation_long"}:
+        return [
+            config.get_questions_file(),
+            config.get_graph_gexf_file(),
+            config.get_chunk_store_file(),
+            config.get_edge_index_file(),
+            config.get_edge_payload_file(),
+        ]
+    return [config.get_questions_file(), config.get_answer_file(answer_type="short")]
+
+
+def step_settings(config: THRAGConfig, step_name: str) -> list[str]:
+    """Settings a step's outputs depend on under ``config``."""
 
-    state = config.get_dataset_state()
-    return bool(state.get(step_name, {}).get("completed")) and all(path.exists() for path in outputs)
+    settings = list(STEP_SETTINGS.get(step_name, []))
+    if step_name == "json_to_gexf" and config.rewrites_graph_labels():
+        # Label merging embeds the labels; without it the graph does not depend on the embedder.
+        settings += ["embed_backend", "embed_model"]
+    return settings
+
+
+def step_prompts(config: THRAGConfig, step_name: str) -> list[str]:
+    """Prompt files a step's outputs depend on under ``config``."""
+
+    prompts = list(STEP_PROMPTS.get(step_name, []))
+    if step_name == "json_to_gexf" and config.topic_consolidation and config.topic_merge_llm:
+        # Only LLM-confirmed topic merges send the topic_merge prompt.
+        prompts.append("prompt/topic_merge.py")
+    return prompts
+
+
+def step_fingerprint(
+    config: THRAGConfig,
+    step_name: str,
+    manifest: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    """Hashes of a step's inputs and prompts and the settings it depends on."""
+
+    previous_inputs = (manifest or {}).get("inputs", {})
+    return {
+        "inputs": hash_files(step_inputs(config, step_name), previous_inputs),
+        "prompts": {name: file_sha256(PROJECT_ROOT / name) for name in step_prompts(config, step_name)},
+        "settings": {key: getattr(config, key) for key in step_settings(config, step_name)},
+    }
+
+
+def stale_reasons(
+    config: THRAGConfig,
+    step_name: str,
+    fingerprint: dict[str, Any],
+    manifest: dict[str, Any] | None,
+) -> list[str]:
+    """Why a step must run again; an empty list means its outputs are up to date."""
+
+    missing = [path.name for path in expected_outputs(config)[step_name] if not path.exists()]
+    if missing:
+        return [f"missing output {name}" for name in missing]
+    if manifest is None:
+        return ["no manifest"]
+
+    reasons = [f"input {Path(path).name} changed" for path in changed_files(fingerprint["inputs"], manifest["inputs"])]
+    reasons.extend(
+        f"prompt {name} changed"
+        for name in sorted(set(fingerprint["prompts"]) | set(manifest.get("prompts", {})))
+        if fingerprint["prompts"].get(name) != manifest.get("prompts", {}).get(name)
+    )
+    reasons.extend(
+        f"setting {key} changed"
+        for key in sorted(set(fingerprint["settings"]) | set(manifest.get("settings", {})))
+        if fingerprint["settings"].get(key) != manifest.get("settings", {}).get(key)
+    )
+    return reasons
 
 
 def validate_inputs(config: THRAGConfig, steps: list[str]) -> None:
     graph_steps = {"graph_construction", "json_to_gexf", "edge_embedding"}
     answer_steps = {"answer_generation_short", "answer_generation_long", "evaluation_f1"}
 
-    if graph_steps.intersection(steps) and not config.get_contexts_file().exists():
+    if graph_steps.intersection(steps) and not config.get_corpus_input().exists():
         raise FileNotFoundError(
-            f"Dataset '{config.dataset_name}' is missing contexts.txt at {config.get_contexts_file()}"
+            f"Dataset '{config.dataset_name}' has no contexts.txt, documents/ directory, or manifest.jsonl "
+            f"under {config.get_dataset_dir()}"
         )
 
     if answer_steps.intersection(steps) and not config.get_questions_file().exists():
@@ -91,7 +253,7 @@ def run_graph_construction(dataset_name: str, force_rebuild: bool) -> str:
 
 
 def run_json_to_gexf(dataset_name: str, force_rebuild: bool) -> str:
-    from index.json_to_gexf import convert_json_to_gexf
+    from index.json_to_gexf import convert_json_to_gexf, dataset_label_aliases
 
     config = get_config(dataset_name)
     graph_json_path = config.get_graph_json_file()
@@ -100,11 +262,13 @@ def run_json_to_gexf(dataset_name: str, force_rebuild: bool) -> str:
             f"Graph JSON file not found. Run graph_construction first: {graph_json_path}"
         )
 
-    output_path = convert_json_to_gexf(str(graph_json_path), str(config.get_graph_gexf_file()))
+    aliases = dataset_label_aliases(config) or {}
+    output_path = convert_json_to_gexf(str(graph_json_path), str(config.get_graph_gexf_file()), aliases)
     config.mark_step_completed(
         "json_to_gexf",
         output_file=output_path,
         force_rebuild=force_rebuild,
+        **{f"{kind}_aliases": len(kind_aliases) for kind, kind_aliases in aliases.items()},
     )
     return output_path
 
@@ -112,7 +276,14 @@ def run_json_to_gexf(dataset_name: str, force_rebuild: bool) -> str:
 def run_edge_embedding(dataset_name: str, force_rebuild: bool) -> str:
     from index.edge_embedding import build_index_for_dataset
 
-    return build_index_for_dataset(dataset_name=dataset_name, rebuild=force_rebuild)
+    # The pipeline only runs this step when the graph or embedding settings changed.
+    return build_index_for_dataset(dataset_name=dataset_name, rebuild=True)
+
+
+def run_streaming_build(dataset_name: str, force_rebuild: bool) -> str:
+    from index.streaming_build import run_streaming_build as streaming_build
+
+    return streaming_build(get_config(dataset_name), force_rebuild=force_rebuild)
 
 
 def run_answer_generation_short(dataset_name: str, force_rebuild: bool) -> str:
@@ -143,35 +314,192 @@ STEP_HANDLERS: dict[str, Callable[[str, bool], object]] = {
 }
 
 
+def execute_step(
+    config: THRAGConfig,
+    step_name: str,
+    force_rebuild: bool,
+    stream_build: bool = False,
+    profile_modes: list[str] | None = None,
+) -> tuple[str, object]:
+    """Run one step if it is stale (or forced) and record its manifest.
+
+    Returns ``("completed", result)`` or ``("skipped", None)``. Only changed
+    settings or prompts make graph construction start over; changed input files
+    alone let it reuse the extraction of unchanged chunks. With ``stream_build``
+    graph construction also builds the GEXF graph and edge index, and records
+    their manifests so those steps are skipped. ``profile_modes`` runs the step
+    under ``utils.profiling.profile_step``.
+    """
+
+    manifest_path = config.get_step_manifest_file(step_name)
+    manifest = load_manifest(manifest_path)
+    fingerprint = step_fingerprint(config, step_name, manifest)
+
+    if force_rebuild:
+        reasons = ["forced"]
+    else:
+        reasons = stale_reasons(config, step_name, fingerprint, manifest)
+        if reasons == ["no manifest"]:
+            # Outputs built before manifests existed are adopted as up to date.
+            save_manifest(manifest_path, {"step": step_name, **fingerprint, "adopted": True})
+            print(f"[{config.dataset_name}/{step_name}] Skipped: recorded the fingerprint of existing outputs.")
+            return "skipped", None
+        if not reasons:
+            print(f"[{config.dataset_name}/{step_name}] Skipped: up to date.")
+            return "skipped", None
+
+    print(f"[{config.dataset_name}/{step_name}] Running ({'; '.join(reasons)})")
+    rebuild = force_rebuild or any(reason.startswith(("setting", "prompt")) for reason in reasons)
+    started = time.perf_counter()
+    streamed = stream_build and step_name == "graph_construction"
+    handler = run_streaming_build if streamed else STEP_HANDLERS[step_name]
+    if profile_modes:
+        from utils.profiling import profile_step
+
+        with profile_step(config, step_name, profile_modes):
+            result = handler(config.dataset_name, rebuild)
+    else:
+        result = handler(config.dataset_name, rebuild)
+    seconds = time.perf_counter() - started
+    save_manifest(manifest_path, {"step": step_name, **fingerprint, "completed_at": time.time(), "seconds": seconds})
+    if streamed:
+        for follower in ("json_to_gexf", "edge_embedding"):
+            save_manifest(
+                config.get_step_manifest_file(follower),
+                {"step": follower, **step_fingerprint(config, follower), "completed_at": time.time(), "streamed": True},
+            )
+    print(f"[{config.dataset_name}/{step_name}] Completed in {seconds:.1f}s.")
+    return "completed", result
+
+
 def run_pipeline(
     dataset_name: str,
     requested_steps: list[str] | None = None,
     force_rebuild: bool = False,
+    workers: int | None = None,
+    stream_build: bool | None = None,
+    profile_modes: list[str] | None = None,
+    profile_steps: list[str] | None = None,
 ) -> dict[str, object]:
+    """Run the requested steps, each as soon as the selected steps it depends on are done.
+
+    A failed step blocks the steps that depend on it; independent steps still
+    run, and the first failure is raised once nothing is left to run.
+    ``stream_build`` (default ``STREAM_BUILD``) overlaps the three graph-build
+    steps when all of them are selected. ``profile_modes`` (default
+    ``PROFILE_MODES``) profiles ``profile_steps`` (default ``PROFILE_STEPS``, or
+    every selected step) and writes the dumps under ``results/profiles/``.
+    """
+
     config = get_config(dataset_name)
     steps = resolve_steps(requested_steps)
     validate_inputs(config, steps)
+    workers = max(1, workers or config.pipeline_workers)
+    stream_build = config.stream_build if stream_build is None else stream_build
+    stream_build = stream_build and set(STEP_GROUPS["graph_build"]) <= set(steps)
+    if stream_build and config.rewrites_graph_labels():
+        print(
+            "Streaming graph build disabled: ENTITY_CANONICALIZATION and TOPIC_CONSOLIDATION "
+            "rewrite labels from every triple before the graph is built."
+        )
+        stream_build = False
+    profile_modes = config.profile_modes if profile_modes is None else profile_modes
+    if profile_modes:
+        from utils.profiling import parse_profile_modes
+
+        profile_modes = parse_profile_modes(profile_modes)
+    profiled = set(resolve_steps(profile_steps or config.profile_steps or steps))
 
     print(f"Running TH-RAG pipeline for dataset: {dataset_name}")
-    print(f"Steps: {', '.join(steps)}")
+    print(f"Steps: {', '.join(steps)} ({workers} at a time{', streaming graph build' if stream_build else ''})")
     print("=" * 72)
 
     results: dict[str, object] = {}
-
-    for index, step_name in enumerate(steps, start=1):
-        print(f"\nStep {index}: {step_name}")
-        print("-" * 72)
-
-        if not force_rebuild and step_is_complete(config, step_name):
-            print("Skipped because the expected outputs already exist. Use --force to rebuild.")
-            continue
-
-        results[step_name] = STEP_HANDLERS[step_name](dataset_name, force_rebuild)
-        print("Completed.")
+    status: dict[str, str] = {}
+    errors: dict[str, BaseException] = {}
+    pending = list(steps)
+    running: dict[Future, str] = {}
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thrag-step") as executor:
+        while pending or running:
+            for step_name in list(pending):
+                dependencies = [name for name in STEP_DEPENDENCIES[step_name] if name in steps]
+                if any(status.get(name) in {"failed", "blocked"} for name in dependencies):
+                    pending.remove(step_name)
+                    status[step_name] = "blocked"
+                    print(f"[{config.dataset_name}/{step_name}] Not run because a step it depends on failed.")
+                elif all(status.get(name) in {"completed", "skipped"} for name in dependencies):
+                    pending.remove(step_name)
+                    modes = profile_modes if step_name in profiled else None
+                    future = executor.submit(execute_step, config, step_name, force_rebuild, stream_build, modes)
+                    running[future] = step_name
+
+            if not running:
+                continue
+            done, _running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                step_name = running.pop(future)
+                try:
+                    status[step_name], result = future.result()
+                except Exception as exc:
+                    status[step_name] = "failed"
+                    errors[step_name] = exc
+                    print(f"[{config.dataset_name}/{step_name}] Failed: {exc}")
+                    continue
+                if status[step_name] == "completed":
+                    results[step_name] = result
 
     print("\n" + "=" * 72)
     print("Pipeline finished.")
     print_summary(config, steps)
+    if errors:
+        raise next(iter(errors.values()))
+    return results
+
+
+def run_datasets(
+    dataset_names: list[str],
+    requested_steps: list[str] | None = None,
+    force_rebuild: bool = False,
+    workers: int | None = None,
+    stream_build: bool | None = None,
+    dataset_workers: int | None = None,
+    profile_modes: list[str] | None = None,
+    profile_steps: list[str] | None = None,
+) -> dict[str, dict[str, object]]:
+    """Run the pipeline for several datasets at once.
+
+    Up to ``dataset_workers`` (default ``DATASET_WORKERS``) datasets run in
+    parallel, each with its own step graph and state file. All of them share
+    the process-wide OpenAI rate budget. A failed dataset does not stop the
+    others; the first failure is raised once every dataset has finished.
+    """
+
+    dataset_names = list(dict.fromkeys(dataset_names))
+    dataset_workers = max(1, min(len(dataset_names), dataset_workers or get_config().dataset_workers))
+    results: dict[str, dict[str, object]] = {}
+    errors: dict[str, BaseException] = {}
+
+    with ThreadPoolExecutor(max_workers=dataset_workers, thread_name_prefix="thrag-dataset") as executor:
+        futures = {
+            executor.submit(
+                run_pipeline, name, requested_steps, force_rebuild, workers, stream_build, profile_modes, profile_steps
+            ): name
+            for name in dataset_names
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except Exception as exc:
+                errors[name] = exc
+
+    if len(dataset_names) > 1:
+        print("\n" + "=" * 72)
+        for name in dataset_names:
+            print(f"- {name}: {'failed: ' + str(errors[name]) if name in errors else 'done'}")
+    if errors:
+        raise next(iter(errors.values()))
     return results
 
 
@@ -195,7 +523,7 @@ def list_datasets() -> None:
     evaluated = set(config.list_evaluated_datasets())
 
     if not available:
-        print("No datasets found under data/. Add data/<dataset>/contexts.txt to begin.")
+        print("No datasets found under data/. Add data/<dataset>/contexts.txt or documents/ to begin.")
         return
 
     print("Available datasets")
@@ -215,7 +543,11 @@ def list_datasets() -> None:
 
 def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Run the TH-RAG pipeline.")
-    parser.add_argument("--dataset", help="Dataset name under data/<dataset>/")
+    parser.add_argument(
+        "--dataset",
+        nargs="+",
+        help="Dataset name(s) under data/<dataset>/; several datasets are built in parallel.",
+    )
     parser.add_argument(
         "--steps",
         nargs="+",
@@ -228,7 +560,35 @@ def build_parser() -> argparse.ArgumentParser:
     parser.add_argument(
         "--force",
         action="store_true",
-        help="Rebuild outputs even if the target artifacts already exist.",
+        help="Rebuild outputs even if their manifests show them up to date.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Independent steps run at once (default: PIPELINE_WORKERS).",
+    )
+    parser.add_argument(
+        "--dataset-workers",
+        type=int,
+        help="Datasets run at once when several are given (default: DATASET_WORKERS).",
+    )
+    parser.add_argument(
+        "--stream-build",
+        action="store_true",
+        default=None,
+        help="Overlap extraction, graph building, and edge embedding (default: STREAM_BUILD).",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="+",
+        metavar="MODE",
+        help="Profile steps with any of: cpu, sample, memory, timers (default: PROFILE_MODES).",
+    )
+    parser.add_argument(
+        "--profile-steps",
+        nargs="+",
+        metavar="STEP",
+        help="Steps or step groups to profile (default: PROFILE_STEPS, or every selected step).",
     )
     parser.add_argument(
         "--list-datasets",
@@ -250,11 +610,19 @@ def main() -> None:
     if not args.dataset:
         parser.error("--dataset is required unless --list-datasets is used.")
 
+    from utils.profiling import enable_stack_dumps
+
+    enable_stack_dumps(get_config(), label="+".join(dict.fromkeys(args.dataset)))
     try:
-        run_pipeline(
-            dataset_name=args.dataset,
+        run_datasets(
+            dataset_names=args.dataset,
             requested_steps=args.steps,
             force_rebuild=args.force,
+            workers=args.workers,
+            stream_build=args.stream_build,
+            dataset_workers=args.dataset_workers,
+            profile_modes=args.profile,
+            profile_steps=args.profile_steps,
         )
     except Exception as exc:
         print(f"Pipeline failed: {exc}")
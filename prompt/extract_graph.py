@@ -63,3 +63,80 @@ Example output:
 Input document:
 {{document}}
 """
+
+PACKED_EXTRACTION_PROMPT = """
+You are an information extraction system.
+
+Goal:
+Extract factual (subject, relation, object) triples from each of several independent documents and assign a subject and object subtopic plus main topic.
+
+Instructions:
+1. Each document is wrapped in <chunk id="..."> and </chunk> tags. Treat every document separately.
+2. Extract factual triples grounded in specific sentences of that document.
+3. Resolve pronouns within the same document so the triples use explicit referents.
+4. For the subject and object of each triple, assign:
+   - subtopic: a specific category
+   - main_topic: a broader category
+5. Return only valid JSON: one object whose keys are the chunk ids and whose values are the triple lists of those documents. Include every chunk id, with an empty list if a document has no triples.
+
+Expected format:
+{
+  "chunk-id-1": [
+    {
+      "triple": ["subject", "relation", "object"],
+      "sentence": "Supporting sentence from that document.",
+      "subject": {
+        "subtopic": "Specific category",
+        "main_topic": "Broader category"
+      },
+      "object": {
+        "subtopic": "Specific category",
+        "main_topic": "Broader category"
+      }
+    }
+  ],
+  "chunk-id-2": []
+}
+
+Example documents:
+<chunk id="a">
+Inez is an Estonian new media artist. She lives in Finland.
+</chunk>
+<chunk id="b">
+It rained.
+</chunk>
+
+Example output:
+{
+  "a": [
+    {
+      "triple": ["Inez", "is", "an Estonian new media artist"],
+      "sentence": "Inez is an Estonian new media artist.",
+      "subject": {
+        "subtopic": "New Media Artist",
+        "main_topic": "Art"
+      },
+      "object": {
+        "subtopic": "Nationality",
+        "main_topic": "Culture"
+      }
+    },
+    {
+      "triple": ["Inez", "lives in", "Finland"],
+      "sentence": "She lives in Finland.",
+      "subject": {
+        "subtopic": "New Media Artist",
+        "main_topic": "Art"
+      },
+      "object": {
+        "subtopic": "Country",
+        "main_topic": "Geography"
+      }
+    }
+  ],
+  "b": []
+}
+
+Input documents:
+{{documents}}
+"""
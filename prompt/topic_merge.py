@@ -0,0 +1,22 @@
+TOPIC_MERGE_PROMPT = """
+Goal:
+Decide which of the numbered pairs of {kind} labels from a knowledge graph name the same {kind}, so that each such pair can become one node.
+Return only valid JSON.
+
+Instructions:
+1. Two labels are synonyms when everything filed under one label belongs under the other as well.
+2. A label that is broader, narrower, or only related to the other is not a synonym.
+3. Return the numbers of the synonymous pairs only.
+
+Output format:
+{
+  "synonyms": [1, 3]
+}
+
+Candidate pairs:
+{{PAIRS}}
+"""
+
+
+def get_topic_merge_prompt() -> str:
+    return TOPIC_MERGE_PROMPT
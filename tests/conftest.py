@@ -1 +1,45 @@
 """Pytest configuration for TH-RAG."""
+
+from __future__ import annotations
+
+from typing import Any, Callable
+
+import pytest
+import tiktoken
+
+from config import THRAGConfig
+
+
+@pytest.fixture
+def byte_level_encoding(monkeypatch) -> tiktoken.Encoding:
+    """One token per byte, used for every model encoding so no tokenizer file is downloaded."""
+
+    encoding = tiktoken.Encoding(
+        "bytes",
+        pat_str=r"""\s*[\r\n]|\s+(?!\S)|\s|[^\s]+""",
+        mergeable_ranks={bytes([value]): value for value in range(256)},
+        special_tokens={},
+    )
+    monkeypatch.setattr("index.chunking.tiktoken.encoding_for_model", lambda _name: encoding)
+    return encoding
+
+
+@pytest.fixture
+def make_config(tmp_path, monkeypatch, byte_level_encoding) -> Callable[..., THRAGConfig]:
+    """Build fake-backend configs whose data, index, and temp directories live under ``tmp_path``.
+
+    Chunks are 80 byte-level tokens without overlap, extracted by two workers;
+    keyword arguments override any config attribute.
+    """
+
+    monkeypatch.setenv("OPENAI_BACKEND", "fake")
+
+    def make(dataset_name: str, **settings: Any) -> THRAGConfig:
+        config = THRAGConfig(dataset_name)
+        config.data_dir, config.index_results_dir, config.temp_dir = tmp_path / "data", tmp_path / "index", tmp_path
+        config.max_tokens, config.overlap, config.max_workers = 80, 0, 2
+        for name, value in settings.items():
+            setattr(config, name, value)
+        return config
+
+    return make
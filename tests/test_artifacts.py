@@ -0,0 +1,76 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from config import THRAGConfig
+from generate.artifacts import ArtifactManager, estimate_artifact_bytes
+from index.chunk_store import InMemoryChunkStore
+
+
+
+def test_artifact_manager_evicts_least_recently_used_datasets() -> None:
+    manager = ArtifactManager(loader=lambda name: SimpleNamespace(name=name, size_bytes=40), memory_budget_bytes=100)
+
+    manager.get("a")
+    manager.get("b")
+    manager.get("a")
+    manager.get("c")
+
+    assert manager.loaded() == ["a", "c"]
+    stats = manager.stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 1
+    assert stats["used_bytes"] == 80
+
+
+
+def test_artifact_budget_counts_in_memory_size_not_file_size(tmp_path) -> None:
+    config = THRAGConfig("sized")
+    config.index_results_dir = tmp_path
+    for path, size in [
+        (config.get_graph_gexf_file(), 1000),
+        (config.get_edge_index_file(), 400),
+        (config.get_edge_payload_file(), 100),
+        (config.get_kv_store_file(), 50),
+    ]:
+        path.write_bytes(b"x" * size)
+
+    size_bytes = estimate_artifact_bytes(config, InMemoryChunkStore({}))
+    assert size_bytes == 2200 + 400 + 500 + 50
+
+    manager = ArtifactManager(
+        loader=lambda name: SimpleNamespace(name=name, size_bytes=size_bytes), memory_budget_bytes=2 * 1550
+    )
+    manager.get("a")
+    manager.get("b")
+    assert manager.loaded() == ["b"]
+
+
+
+def test_artifact_manager_prefetch_is_joined_by_get() -> None:
+    started = threading.Event()
+    release = threading.Event()
+    calls: list[str] = []
+
+    def slow_loader(name: str) -> SimpleNamespace:
+        calls.append(name)
+        started.set()
+        release.wait(timeout=5)
+        return SimpleNamespace(name=name, size_bytes=1)
+
+    manager = ArtifactManager(loader=slow_loader)
+    future = manager.prefetch("a")
+    assert started.wait(timeout=5)
+    assert manager.stats()["loading"] == ["a"]
+
+    result: list[SimpleNamespace] = []
+    waiter = threading.Thread(target=lambda: result.append(manager.get("a")))
+    waiter.start()
+    time.sleep(0.05)
+    release.set()
+    waiter.join(timeout=5)
+
+    assert result[0] is future.result()
+    assert calls == ["a"]
+    assert manager.reload("a")["generation"] == 2
+    manager.shutdown()
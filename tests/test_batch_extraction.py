@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+from index import batch_extraction, graph_construction
+
+
+def test_batch_extraction_matches_sync_and_resumes_submitted_batches(tmp_path, monkeypatch, make_config) -> None:
+    config = make_config("batched")
+    config.fake_batch_dir, config.fake_batch_polls = str(tmp_path / "fake_batches"), 2
+    config.batch_max_requests, config.batch_poll_seconds = 4, 0
+    config.get_contexts_file().parent.mkdir(parents=True)
+    config.get_contexts_file().write_text(
+        " ".join(["TH-RAG stores evidence in FAISS.", "Graph Construction feeds Edge Embedding."] * 12),
+        encoding="utf-8",
+    )
+
+    graph_construction.run_graph_construction(config, force_rebuild=True)
+    sync_blocks = json.loads(config.get_graph_json_file().read_text(encoding="utf-8"))
+
+    config.extraction_mode = "batch"
+    original_wait = batch_extraction.BatchExtractor.wait
+
+    def interrupted_wait(self) -> None:
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(batch_extraction.BatchExtractor, "wait", interrupted_wait)
+    with pytest.raises(KeyboardInterrupt):
+        graph_construction.run_graph_construction(config, force_rebuild=True)
+    manifest = json.loads((config.get_batch_dir() / "batches.json").read_text(encoding="utf-8"))
+    assert sum(len(batch["chunks"]) for batch in manifest["batches"]) == len(sync_blocks) > 4
+
+    monkeypatch.setattr(batch_extraction.BatchExtractor, "wait", original_wait)
+    graph_construction.run_graph_construction(config, force_rebuild=True)
+    batch_blocks = json.loads(config.get_graph_json_file().read_text(encoding="utf-8"))
+    assert batch_blocks == sync_blocks
+
+    report = config.get_dataset_state()["graph_construction"]["extraction"]
+    assert report["chunks"] == report["resumed"] == len(sync_blocks)
+    assert report["submitted"] == report["failed"] == 0
+    assert report["batches"] == len(manifest["batches"]) == -(-len(sync_blocks) // 4)
@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from index.chunk_store import InMemoryChunkStore, KVStoreJsonWriter, SQLiteChunkStore, write_chunk_store
+
+
+
+@pytest.mark.parametrize("compression", ["none", "zlib"])
+def test_sqlite_chunk_store_round_trips_chunks_by_id(tmp_path, compression) -> None:
+    chunks = {f"chunk-{index:05d}": f"Chunk {index} mentions TH-RAG and Ünïcode. " * 20 for index in range(1200)}
+    path = tmp_path / "demo_chunks.sqlite"
+
+    assert write_chunk_store(path, chunks.items(), compression=compression, batch_size=100) == 1200
+
+    store = SQLiteChunkStore(path)
+    assert len(store) == 1200
+    assert store.compression == compression
+    assert store.get("chunk-00007") == chunks["chunk-00007"]
+    assert store.get("missing") is None
+    assert "chunk-01199" in store
+
+    wanted = [f"chunk-{index:05d}" for index in range(0, 1200, 2)] + ["missing"]
+    assert store.get_many(wanted) == InMemoryChunkStore(chunks).get_many(wanted)
+    assert not path.with_name(path.name + ".tmp").exists()
+
+
+
+def test_kv_store_json_writer_keeps_previous_store_on_error(tmp_path) -> None:
+    path = tmp_path / "kv_store_text_chunks.json"
+    with KVStoreJsonWriter(path) as writer:
+        writer.add("chunk-00000", "First run.")
+
+    with pytest.raises(RuntimeError):
+        with KVStoreJsonWriter(path) as writer:
+            writer.add("chunk-00000", "Second run.")
+            raise RuntimeError("interrupted")
+
+    assert json.loads(path.read_text(encoding="utf-8"))["chunk-00000"]["content"] == "First run."
+    assert not path.with_name(path.name + ".tmp").exists()
@@ -0,0 +1,80 @@
+import json
+import random
+
+import pytest
+import tiktoken
+from tiktoken_ext.openai_public import r50k_pat_str
+
+from config import THRAGConfig
+from index import graph_construction
+from index.chunk_store import SQLiteChunkStore
+from index.chunking import iter_file_chunks, iter_text_segments
+
+CL100K_PAT_STR = (
+    r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}++|\p{N}{1,3}+| ?[^\s\p{L}\p{N}]++[\r\n]*+|\s++$|\s*[\r\n]|\s+(?!\S)|\s"""
+)
+
+
+def byte_level_encoding(name: str, pat_str: str) -> tiktoken.Encoding:
+    ranks = {bytes([value]): value for value in range(256)}
+    for merge in [b"th", b"he", b"in", b"an", b"the", b"\n\n", b"\n\n\n", b" \n", b" t", b" the", b"ing", b". "]:
+        ranks.setdefault(merge, len(ranks))
+    return tiktoken.Encoding(name, pat_str=pat_str, mergeable_ranks=ranks, special_tokens={})
+
+
+def write_corpus(path) -> None:
+    rng = random.Random(3)
+    words = ["the", "graph", "thing", "answer", "Ünïcode", "42", "isn't", "there", "...", "-", "retrieval"]
+    documents = []
+    for _ in range(120):
+        lines = [" ".join(rng.choice(words) for _ in range(rng.randint(1, 14))) for _ in range(rng.randint(1, 5))]
+        documents.append(rng.choice(["\n", "\n ", "  \n"]).join(lines) + rng.choice([".", "", " "]))
+    separators = ["\n\n", "\n\n\n", "\n \n", "\n"]
+    text = "".join(document + rng.choice(separators) for document in documents)
+    path.write_text(text, encoding="utf-8")
+
+
+
+@pytest.mark.parametrize("pat_str", [CL100K_PAT_STR, r50k_pat_str], ids=["cl100k", "r50k"])
+def test_streaming_chunks_match_whole_text_chunking(tmp_path, monkeypatch, pat_str) -> None:
+    encoding = byte_level_encoding("test", pat_str)
+    monkeypatch.setattr(graph_construction.tiktoken, "encoding_for_model", lambda _name: encoding)
+    corpus = tmp_path / "contexts.txt"
+    write_corpus(corpus)
+    text = corpus.read_text(encoding="utf-8")
+
+    segments = list(iter_text_segments(corpus, encoding, segment_chars=500))
+    assert len(segments) > 5
+    assert "".join(segments) == text
+
+    expected = graph_construction.chunk_text(text, 120, 30, "test")
+    streamed = list(iter_file_chunks(corpus, 120, 30, encoding=encoding, workers=1, segment_chars=500))
+    assert streamed == expected
+
+
+
+def test_graph_construction_streams_chunks_into_extraction(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("OPENAI_BACKEND", "fake")
+    encoding = byte_level_encoding("test", CL100K_PAT_STR)
+    monkeypatch.setattr(graph_construction.tiktoken, "encoding_for_model", lambda _name: encoding)
+    monkeypatch.setattr("index.chunking.tiktoken.encoding_for_model", lambda _name: encoding)
+
+    config = THRAGConfig("demo")
+    config.data_dir = tmp_path / "data"
+    config.index_results_dir = tmp_path / "index"
+    config.temp_dir = tmp_path
+    config.max_tokens, config.overlap, config.max_workers = 120, 30, 2
+    corpus = config.get_contexts_file()
+    corpus.parent.mkdir(parents=True)
+    write_corpus(corpus)
+
+    graph_construction.run_graph_construction(config)
+
+    expected = graph_construction.chunk_text(corpus.read_text(encoding="utf-8"), 120, 30, "test")
+    blocks = json.loads(config.get_graph_json_file().read_text(encoding="utf-8"))
+    assert [block["chunk_id"] for block in blocks] == [f"chunk-{index:05d}" for index in range(len(expected))]
+    assert [block["content"] for block in blocks] == expected
+    store = SQLiteChunkStore(config.get_chunk_store_file())
+    assert len(store) == len(expected) and store.get("chunk-00003") == expected[3]
+    kv_store = json.loads(config.get_kv_store_file().read_text(encoding="utf-8"))
+    assert kv_store["chunk-00003"]["content"] == expected[3]
@@ -1,3 +1,9 @@
+import json
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
 from config import THRAGConfig
 
 
@@ -11,3 +17,47 @@ def test_dataset_paths_are_consistent() -> None:
     assert config.get_kv_store_file().name == "demo_kv_store.json"
     assert config.get_answer_file(answer_type="short").name == "demo_answers_short.json"
     assert config.get_evaluation_file(eval_method="f1").name == "demo_eval_f1.json"
+
+
+
+def _mark_steps(temp_dir: str, dataset: str, worker: int) -> None:
+    config = THRAGConfig(dataset)
+    config.temp_dir = Path(temp_dir)
+    for step in range(5):
+        config.mark_step_completed(f"step-{worker}-{step}")
+
+
+def test_state_updates_from_threads_and_processes_are_not_lost(tmp_path) -> None:
+    legacy = THRAGConfig("legacy")
+    legacy.temp_dir = tmp_path
+    legacy.get_pipeline_state_file().write_text(json.dumps({"legacy": {"old": {"completed": True}}}), encoding="utf-8")
+    assert legacy.get_dataset_state() == {"old": {"completed": True}}
+
+    jobs = [(str(tmp_path), dataset, worker) for dataset in ["a", "b", "legacy"] for worker in range(4)]
+    with ThreadPoolExecutor(max_workers=6) as threads, ProcessPoolExecutor(max_workers=3) as processes:
+        futures = [
+            (threads if index % 2 else processes).submit(_mark_steps, *job) for index, job in enumerate(jobs)
+        ]
+        for future in futures:
+            future.result()
+
+    state = legacy.load_pipeline_state()
+    expected = {f"step-{worker}-{step}" for worker in range(4) for step in range(5)}
+    assert set(state["a"]) == set(state["b"]) == expected
+    assert set(state["legacy"]) == expected | {"old"}
+    assert sorted(path.name for path in legacy.get_state_dir().glob("*.json")) == ["a.json", "b.json", "legacy.json"]
+
+
+
+def test_entry_points_import_without_heavy_libraries() -> None:
+    script = (
+        "import sys, config\n"
+        "import pipeline, index.build_graph, index.graph_construction, index.edge_embedding, generate.Retriever\n"
+        "print(sorted(name for name in ('faiss', 'networkx', 'openai') if name in sys.modules))\n"
+        "print(config.get_config('probe') is config.get_config('probe'))\n"
+    )
+    completed = subprocess.run(
+        [sys.executable, "-c", script], cwd=Path(__file__).resolve().parent.parent, capture_output=True, text=True
+    )
+    assert completed.returncode == 0, completed.stderr
+    assert completed.stdout.split("\n")[:2] == ["[]", "True"]
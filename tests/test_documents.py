@@ -0,0 +1,70 @@
+import json
+import os
+
+from index import graph_construction
+from index.chunk_store import SQLiteChunkStore
+from index.documents import discover_documents, document_chunk_id
+
+
+def count_extractions(monkeypatch) -> list[str]:
+    calls: list[str] = []
+    original = graph_construction.call_model
+
+    def counting_call_model(client, model_name, text, chunk_id):
+        calls.append(chunk_id)
+        return original(client, model_name, text, chunk_id)
+
+    monkeypatch.setattr(graph_construction, "call_model", counting_call_model)
+    return calls
+
+
+
+def test_document_directory_ingestion_skips_unchanged_documents(make_config, monkeypatch) -> None:
+    config = make_config("corpus", max_tokens=60, overlap=10, chunk_workers=1)
+    documents_dir = config.get_documents_dir()
+    (documents_dir / "nested").mkdir(parents=True)
+    (documents_dir / "alpha.txt").write_text("TH-RAG stores evidence in FAISS. " * 4, encoding="utf-8")
+    (documents_dir / "nested" / "beta.md").write_text("Graph Construction feeds Edge Embedding. " * 3, encoding="utf-8")
+    (documents_dir / "gamma.txt").write_text("Retrieval ranks edges.", encoding="utf-8")
+    (documents_dir / "ignored.json").write_text("{}", encoding="utf-8")
+    assert config.get_corpus_input() == documents_dir
+
+    calls = count_extractions(monkeypatch)
+    graph_construction.run_graph_construction(config)
+    first_calls = len(calls)
+    blocks = json.loads(config.get_graph_json_file().read_text(encoding="utf-8"))
+    assert {block["doc_id"] for block in blocks} == {"alpha.txt", "gamma.txt", "nested/beta.md"}
+    assert first_calls == len(blocks) > 3
+    assert blocks[0]["chunk_id"] == document_chunk_id("alpha.txt", 0)
+
+    store = SQLiteChunkStore(config.get_chunk_store_file())
+    assert store.get_doc_ids([document_chunk_id("gamma.txt", 0)]) == {document_chunk_id("gamma.txt", 0): "gamma.txt"}
+    kv_store = json.loads(config.get_kv_store_file().read_text(encoding="utf-8"))
+    assert kv_store[document_chunk_id("nested/beta.md", 0)]["doc_id"] == "nested/beta.md"
+
+    alpha = documents_dir / "alpha.txt"
+    stat = alpha.stat()
+    os.utime(alpha, ns=(stat.st_atime_ns, stat.st_mtime_ns + 5_000_000_000))
+    (documents_dir / "gamma.txt").write_text("Retrieval ranks predicate edges.", encoding="utf-8")
+    (documents_dir / "nested" / "beta.md").unlink()
+    (documents_dir / "delta.txt").write_text("Evaluation scores answers.", encoding="utf-8")
+
+    graph_construction.run_graph_construction(config)
+    assert sorted(calls[first_calls:]) == [document_chunk_id("delta.txt", 0), document_chunk_id("gamma.txt", 0)]
+    blocks = json.loads(config.get_graph_json_file().read_text(encoding="utf-8"))
+    assert [block["doc_id"] for block in blocks].count("nested/beta.md") == 0
+    assert blocks[-1]["content"] == "Retrieval ranks predicate edges."
+    state = json.loads(config.get_document_state_file().read_text(encoding="utf-8"))
+    assert sorted(state["documents"]) == ["alpha.txt", "delta.txt", "gamma.txt"]
+
+
+
+def test_manifest_lists_documents_with_explicit_ids(tmp_path) -> None:
+    (tmp_path / "docs").mkdir()
+    (tmp_path / "docs" / "a.txt").write_text("first", encoding="utf-8")
+    (tmp_path / "b.txt").write_text("second", encoding="utf-8")
+    manifest = tmp_path / "manifest.jsonl"
+    manifest.write_text('{"path": "docs/a.txt", "doc_id": "paper-1"}\n\n"b.txt"\n', encoding="utf-8")
+
+    documents = discover_documents(manifest)
+    assert [(document.doc_id, document.path.name) for document in documents] == [("paper-1", "a.txt"), ("b.txt", "b.txt")]
@@ -0,0 +1,95 @@
+import json
+
+import numpy as np
+import pytest
+
+from index.edge_embedding import (
+    EdgeEmbedderFAISS,
+    EdgeIndexSearcher,
+    built_index_storage,
+    create_faiss_index,
+    index_meta_path,
+)
+from index.embedders import HashingEmbedder
+from index.json_to_gexf import convert_json_to_gexf
+
+
+def write_graph(tmp_path):
+    graph_json = tmp_path / "graph.json"
+    graph_json.write_text(
+        json.dumps(
+            [
+                {
+                    "chunk_id": "chunk-00000",
+                    "triples": [
+                        {
+                            "triple": ["TH-RAG", "uses", "FAISS"],
+                            "sentence": "TH-RAG uses FAISS.",
+                            "subject": {"subtopic": "System", "main_topic": "Research"},
+                            "object": {"subtopic": "Index", "main_topic": "Infrastructure"},
+                        },
+                        {
+                            "triple": ["Retriever", "reads", "GEXF"],
+                            "sentence": "The retriever reads the GEXF graph.",
+                            "subject": {"subtopic": "System", "main_topic": "Research"},
+                            "object": {"subtopic": "Format", "main_topic": "Infrastructure"},
+                        },
+                    ],
+                }
+            ]
+        ),
+        encoding="utf-8",
+    )
+    graph_gexf = tmp_path / "graph.gexf"
+    convert_json_to_gexf(str(graph_json), str(graph_gexf))
+    return graph_json, graph_gexf
+
+
+
+def test_hashing_embedder_is_deterministic_and_order_preserving() -> None:
+    embedder = HashingEmbedder(dim=128, batch_size=2)
+    texts = ["TH-RAG uses FAISS.", "th-rag uses faiss", "The weather is sunny.", "TH-RAG uses FAISS."]
+
+    vectors = embedder.embed_many(texts, max_workers=3)
+    assert vectors.shape == (4, 128)
+    assert np.allclose(vectors[0], vectors[3])
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+    assert vectors[0] @ vectors[1] > vectors[0] @ vectors[2]
+
+
+
+def test_index_metadata_rejects_a_different_query_embedder(tmp_path) -> None:
+    graph_json, graph_gexf = write_graph(tmp_path)
+    paths = {
+        "gexf_path": str(graph_gexf),
+        "embedding_model": "unused",
+        "openai_api_key": None,
+        "index_path": str(tmp_path / "edges.faiss"),
+        "payload_path": str(tmp_path / "edges.npy"),
+    }
+
+    builder = EdgeEmbedderFAISS(**paths, embedder=HashingEmbedder(dim=64))
+    builder.build_index(max_workers=1)
+    assert json.loads(index_meta_path(paths["index_path"]).read_text())["embedder"]["backend"] == "hashing"
+
+    graph_gexf.unlink()
+    searcher = EdgeIndexSearcher(paths["index_path"], paths["payload_path"], embedder=HashingEmbedder(dim=64))
+    searcher.load_index()
+    assert searcher.search("Which index does TH-RAG use?", top_k=1)[0]["target"] == "FAISS"
+
+    with pytest.raises(ValueError, match="was built with embedder"):
+        EdgeIndexSearcher(paths["index_path"], paths["payload_path"], embedder=HashingEmbedder(dim=32)).load_index()
+
+
+
+@pytest.mark.parametrize("storage", ["flat", "fp16", "sq8", "pq"])
+def test_create_faiss_index_storage_options_find_exact_matches(storage) -> None:
+    vectors = HashingEmbedder(dim=64).embed_many([f"Entity {index} is related to record {index}." for index in range(300)])
+    index = create_faiss_index(vectors, storage, pq_m=16)
+
+    _scores, found = index.search(vectors[:20], 5)
+    assert index.ntotal == 300
+    assert built_index_storage(index) == storage
+    small_index = create_faiss_index(vectors[:100], storage, pq_m=16)
+    assert built_index_storage(small_index) == ("sq8" if storage == "pq" else storage)
+    assert np.mean([row in found[row] for row in range(20)]) >= 0.9
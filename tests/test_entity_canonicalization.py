@@ -0,0 +1,91 @@
+import json
+from collections import Counter
+
+import networkx as nx
+
+import pipeline
+from config import THRAGConfig
+from index.embedders import HashingEmbedder
+from index.entity_canonicalization import cluster_entity_labels, label_key
+
+
+def triple(subject: str, object_: str, sentence: str) -> dict:
+    labels = {"subtopic": "Countries", "main_topic": "Geography"}
+    return {"triple": [subject, "borders", object_], "sentence": sentence, "subject": labels, "object": labels}
+
+
+
+def test_cluster_entity_labels_merges_variants_but_not_different_entities() -> None:
+    counts = Counter(
+        {
+            "U.S.": 5,
+            "the United States": 1,
+            "United States": 3,
+            "USA": 2,
+            "United States of America": 1,
+            "Apple Inc.": 1,
+            "Apple Inc": 2,
+            "Windows 10": 1,
+            "Windows 11": 1,
+            "New York": 2,
+            "New York City": 2,
+        }
+    )
+
+    result = cluster_entity_labels(counts, HashingEmbedder(dim=256))
+
+    assert label_key("The U.S.") == label_key("US") == "us"
+    assert result["aliases"] == {
+        "the United States": "U.S.",
+        "United States": "U.S.",
+        "United States of America": "USA",
+        "Apple Inc.": "Apple Inc",
+    }
+    assert result["merges"]["acronym"] == 2
+    assert {"canonical": "U.S.", "labels": ["U.S.", "United States", "the United States"]} in result["clusters"]
+
+
+
+def test_cluster_entity_labels_keeps_labels_that_differ_only_in_symbols() -> None:
+    counts = Counter(
+        {"C": 3, "C++": 2, "C#": 1, "F": 1, "F#": 1, ".NET": 1, "NET": 2, "C++ compiler": 1, "C# compiler": 1}
+    )
+
+    result = cluster_entity_labels(counts, HashingEmbedder(dim=256), string_threshold=0.8, embed_threshold=0.8)
+
+    assert [label_key(label) for label in ("C++", "C#", ".NET", "AT&T")] == ["c++", "c#", ".net", "at&t"]
+    assert result["aliases"] == {}
+
+
+
+def test_json_to_gexf_step_canonicalizes_entities_and_reports_reduction(tmp_path, monkeypatch) -> None:
+    config = THRAGConfig("canon")
+    config.index_results_dir, config.temp_dir = tmp_path / "index", tmp_path
+    config.embed_backend = "hashing"
+    config.entity_canonicalization = True
+    config.index_results_dir.mkdir()
+    blocks = [
+        {
+            "chunk_id": "chunk-00000",
+            "triples": [
+                triple("Canada", "U.S.", "Canada borders the U.S."),
+                triple("Mexico", "United States", "Mexico borders the United States."),
+                triple("Mexico", "the United States", "Mexico shares a border with the United States."),
+            ],
+        }
+    ]
+    config.get_graph_json_file().write_text(json.dumps(blocks), encoding="utf-8")
+    monkeypatch.setattr(pipeline, "get_config", lambda _name=None: config)
+
+    pipeline.run_json_to_gexf("canon", force_rebuild=False)
+
+    graph = nx.read_gexf(config.get_graph_gexf_file())
+    entities = sorted(data["label"] for _node, data in graph.nodes(data=True) if data["type"] == "entity")
+    assert entities == ["Canada", "Mexico", "United States"]
+    assert "Canada borders the U.S." in graph["entity_canada"]["entity_united_states"]["sentence"]
+
+    report = json.loads(config.get_entity_aliases_file().read_text(encoding="utf-8"))["report"]
+    assert report["graph"]["entity_nodes"] == {"before": 5, "after": 3, "reduction": 0.4}
+    assert report["graph"]["predicate_edges"]["after"] == 2
+    assert report["graph"]["index_vectors"]["after"] == 3
+    assert config.get_dataset_state()["json_to_gexf"]["entity_aliases"] == 2
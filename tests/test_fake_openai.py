@@ -0,0 +1,39 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+from index.graph_construction import call_model
+from index.topic_choice import choose_topics_from_graph
+from utils.fake_openai import FakeBackendError, FakeBackendSettings, FakeOpenAI
+
+
+def test_fake_embeddings_are_deterministic_unit_vectors() -> None:
+    client = FakeOpenAI(FakeBackendSettings(embedding_dim=64))
+
+    first = client.embeddings.create(input=["TH-RAG uses FAISS."], model="fake").data[0].embedding
+    second = client.embeddings.create(input="TH-RAG uses FAISS.", model="fake").data[0].embedding
+
+    assert first == second
+    assert len(first) == 64
+    assert np.isclose(np.linalg.norm(first), 1.0)
+
+
+
+def test_fake_extraction_and_topic_choice_are_schema_valid() -> None:
+    client = FakeOpenAI()
+    block = call_model(client, "fake", "TH-RAG stores evidence in FAISS. Graph Construction feeds Edge Embedding.", "chunk-00000")
+    assert [item["triple"][0] for item in block["triples"]] == ["TH-RAG", "Graph Construction"]
+
+    graph = nx.Graph()
+    for index, label in enumerate(["Retrieval", "Indexing", "Evaluation"]):
+        graph.add_node(f"topic_{index}", label=label, type="topic")
+    topics = choose_topics_from_graph("How does indexing work?", graph, client, min_topics=1, max_topics=1)
+    assert topics == ["Indexing"]
+
+
+
+def test_fake_backend_injects_errors() -> None:
+    client = FakeOpenAI(FakeBackendSettings(error_rate=1.0))
+    with pytest.raises(FakeBackendError):
+        client.embeddings.create(input=["x"], model="fake")
+    assert client.stats.errors["embeddings"] == 1
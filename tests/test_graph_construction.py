@@ -1,9 +1,14 @@
 import json
 
+import faiss
 import networkx as nx
+import numpy as np
 
-from index.graph_construction import parse_triples_response
+from index import graph_construction
+from index.edge_embedding import build_edge_index, edge_sentence_provenance
+from index.graph_construction import parse_packed_triples_response, parse_triples_response
 from index.json_to_gexf import convert_json_to_gexf
+from index.streaming_build import run_streaming_build
 
 
 def test_parse_triples_response_accepts_top_level_list() -> None:
@@ -52,3 +57,98 @@ def test_convert_json_to_gexf_writes_graph(tmp_path) -> None:
     labels = {data["label"] for _, data in graph.nodes(data=True)}
     assert "TH-RAG" in labels
     assert "FAISS" in labels
+
+
+
+def test_convert_json_to_gexf_keeps_per_sentence_chunk_provenance(tmp_path) -> None:
+    triple = {
+        "triple": ["TH-RAG", "uses", "FAISS"],
+        "sentence": "TH-RAG uses FAISS.",
+        "subject": {"subtopic": "System", "main_topic": "Research"},
+        "object": {"subtopic": "Index", "main_topic": "Infrastructure"},
+    }
+    other = {**triple, "sentence": "FAISS powers TH-RAG retrieval."}
+    graph_json = tmp_path / "graph.json"
+    graph_json.write_text(
+        json.dumps(
+            [
+                {"chunk_id": "chunk-00000", "triples": [triple]},
+                {"chunk_id": "chunk-00001", "triples": [triple, other]},
+            ]
+        ),
+        encoding="utf-8",
+    )
+
+    output_path = tmp_path / "graph.gexf"
+    convert_json_to_gexf(str(graph_json), str(output_path))
+
+    graph = nx.read_gexf(output_path)
+    edge = graph["entity_th-rag"]["entity_faiss"]
+    assert edge_sentence_provenance(edge) == {
+        "FAISS powers TH-RAG retrieval.": ["chunk-00001"],
+        "TH-RAG uses FAISS.": ["chunk-00000", "chunk-00001"],
+    }
+
+
+
+def test_parse_packed_triples_response_splits_triples_by_chunk() -> None:
+    triple = {
+        "triple": ["TH-RAG", "uses", "FAISS"],
+        "sentence": "TH-RAG uses FAISS.",
+        "subject": {"subtopic": "System", "main_topic": "Research"},
+        "object": {"subtopic": "Index", "main_topic": "Infrastructure"},
+    }
+    payload = "```json\n" + json.dumps({"chunk-00000": [triple, {"triple": ["bad"]}], "chunk-00001": []}) + "\n```"
+
+    parsed = parse_packed_triples_response(payload, ["chunk-00000", "chunk-00001", "chunk-00002"])
+    assert parsed == {"chunk-00000": [triple], "chunk-00001": []}
+
+
+
+def test_packed_extraction_matches_per_chunk_extraction(make_config) -> None:
+    sentences = ["TH-RAG stores evidence in FAISS.", "Graph Construction feeds Edge Embedding.", "It works."]
+    config = make_config("packed")
+    config.get_contexts_file().parent.mkdir(parents=True)
+    config.get_contexts_file().write_text(" ".join(sentences * 12), encoding="utf-8")
+
+    results = {}
+    for budget in [0, 400]:
+        config.extraction_pack_tokens = budget
+        graph_construction.run_graph_construction(config, force_rebuild=True)
+        blocks = json.loads(config.get_graph_json_file().read_text(encoding="utf-8"))
+        results[budget] = ([block["triples"] for block in blocks], config.get_dataset_state()["graph_construction"]["extraction"])
+
+    assert results[400][0] == results[0][0]
+    unpacked, packed = results[0][1], results[400][1]
+    assert unpacked["requests"] == unpacked["chunks"] == packed["chunks"] > 5
+    assert packed["requests"] == packed["packed_requests"] < unpacked["requests"] / 3
+    assert packed["requests_saved"] == packed["chunks"] - packed["requests"]
+    assert packed["prompt_tokens_saved"] > 0 == unpacked["prompt_tokens_saved"]
+
+
+
+def test_streaming_build_matches_staged_build(make_config) -> None:
+    config = make_config("streamed", fake_embed_dim=16, batch_size=2, stream_queue_blocks=2)
+    config.get_contexts_file().parent.mkdir(parents=True)
+    config.get_contexts_file().write_text(
+        " ".join(f"Paper {index} cites FAISS and Graph Construction." for index in range(20)), encoding="utf-8"
+    )
+
+    def built_index() -> tuple[int, dict[str, list[str]]]:
+        payloads = np.load(config.get_edge_payload_file(), allow_pickle=True)
+        sentences = {payload["sentence"]: sorted(payload["chunk_ids"]) for payload in payloads}
+        return faiss.read_index(str(config.get_edge_index_file())).ntotal, sentences
+
+    graph_construction.run_graph_construction(config, force_rebuild=True)
+    convert_json_to_gexf(str(config.get_graph_json_file()), str(config.get_graph_gexf_file()))
+    build_edge_index(config)
+    staged = built_index()
+
+    config.get_edge_index_file().unlink()
+    run_streaming_build(config, force_rebuild=True)
+    streamed = built_index()
+
+    assert streamed == staged and staged[0] == len(staged[1]) > 4
+    report = config.get_dataset_state()["streaming_build"]
+    assert report["embedded_during_extraction"] == staged[0]
+    assert report["embedded_at_finalisation"] == report["failed_batches"] == 0
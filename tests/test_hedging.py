@@ -0,0 +1,44 @@
+import itertools
+import time
+
+import pytest
+
+from utils.fake_openai import FakeBackendSettings, FakeOpenAI, FakeTimeoutError
+from utils.hedging import Hedger
+from utils.tracing import summarize_traces, trace_query
+
+
+def test_hedger_races_slow_calls_and_reports_tail_improvement() -> None:
+    hedger = Hedger(hedge_percentile=95, min_samples=20, max_rate=0.5, max_workers=4)
+    attempts = itertools.count()
+
+    def request() -> str:
+        # The first attempt of the 21st call hangs; its hedge answers quickly.
+        attempt = next(attempts)
+        time.sleep(0.5 if attempt == 20 else 0.01)
+        return f"answer-{attempt}"
+
+    with trace_query(query="q") as trace:
+        for _ in range(20):
+            hedger.call("topic_choice", request)
+        started = time.perf_counter()
+        assert hedger.call("topic_choice", request) == "answer-21"
+        assert time.perf_counter() - started < 0.3
+
+    time.sleep(0.6)
+    assert hedger.report()["topic_choice"] == {"calls": 21, "hedged": 1, "hedge_wins": 1, "hedge_rate": 1 / 21}
+    summary = summarize_traces([trace.to_dict()])["hedging"]["topic_choice"]
+    assert summary["calls"] == 21 and summary["hedged"] == summary["hedge_wins"] == 1
+    assert summary["unhedged_p99_seconds"] > 0.4 > summary["p99_seconds"]
+    assert summary["p99_improvement_seconds"] > 0.2
+
+
+
+def test_fake_backend_enforces_request_timeouts() -> None:
+    client = FakeOpenAI(FakeBackendSettings(latency_ms=200))
+
+    started = time.perf_counter()
+    with pytest.raises(FakeTimeoutError):
+        client.embeddings.create(input=["TH-RAG"], model="fake", timeout=0.02)
+    assert time.perf_counter() - started < 0.15
+    assert client.stats.errors["embeddings"] == 1
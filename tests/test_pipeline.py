@@ -1,4 +1,9 @@
-from pipeline import resolve_steps
+import hashlib
+import threading
+
+import pipeline
+from config import THRAGConfig
+from pipeline import resolve_steps, step_prompts, step_settings
 
 
 def test_resolve_steps_preserves_canonical_order() -> None:
@@ -22,3 +27,115 @@ def test_resolve_steps_expands_groups_without_duplicates() -> None:
         "answer_generation_short",
         "answer_generation_long",
     ]
+
+
+
+def test_graph_depends_on_the_embedder_only_when_labels_are_rewritten() -> None:
+    config = THRAGConfig("labels")
+    config.entity_canonicalization = config.topic_consolidation = False
+    assert "embed_model" not in step_settings(config, "json_to_gexf")
+
+    config.topic_consolidation = True
+    assert {"embed_backend", "embed_model"} <= set(step_settings(config, "json_to_gexf"))
+
+
+
+def test_graph_depends_on_the_topic_merge_prompt_only_when_merges_use_the_llm() -> None:
+    config = THRAGConfig("labels")
+    config.topic_consolidation, config.topic_merge_llm = True, False
+    assert step_prompts(config, "json_to_gexf") == []
+
+    config.topic_merge_llm = True
+    assert step_prompts(config, "json_to_gexf") == ["prompt/topic_merge.py"]
+
+
+
+def test_run_pipeline_reruns_only_stale_steps_and_overlaps_independent_ones(tmp_path, monkeypatch) -> None:
+    config = THRAGConfig("dag")
+    config.data_dir, config.results_dir = tmp_path / "data", tmp_path / "results"
+    config.index_results_dir, config.temp_dir = tmp_path / "index", tmp_path
+    config.generated_results_dir = config.evaluated_results_dir = config.chunks_dir = tmp_path / "out"
+    config.manifests_dir = tmp_path / "manifests"
+    config.get_dataset_dir().mkdir(parents=True)
+    config.get_contexts_file().write_text("TH-RAG uses FAISS.", encoding="utf-8")
+    config.get_questions_file().write_text("[]", encoding="utf-8")
+    monkeypatch.setattr(pipeline, "get_config", lambda _name=None: config)
+
+    calls: list[tuple[str, bool]] = []
+    # Both answer steps must be running at once for either to get past the barrier.
+    answers_overlap = [threading.Barrier(2, timeout=5)]
+
+    def handler(step_name: str):
+        def run(_dataset_name: str, force_rebuild: bool) -> str:
+            calls.append((step_name, force_rebuild))
+            if step_name.startswith("answer_generation") and answers_overlap:
+                answers_overlap[0].wait()
+            source = b"".join(path.read_bytes() for path in pipeline.step_inputs(config, step_name) if path.exists())
+            for path in pipeline.expected_outputs(config)[step_name]:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(hashlib.sha256(source).hexdigest().encode())
+            return step_name
+
+        return run
+
+    monkeypatch.setattr(pipeline, "STEP_HANDLERS", {name: handler(name) for name in pipeline.STEP_SEQUENCE})
+
+    pipeline.run_pipeline("dag")
+    assert sorted(name for name, _force in calls) == sorted(pipeline.STEP_SEQUENCE)
+
+    calls.clear()
+    answers_overlap.clear()
+    pipeline.run_pipeline("dag")
+    assert calls == []
+
+    config.top_k1_long += 1
+    pipeline.run_pipeline("dag", workers=1)
+    assert calls == [("answer_generation_long", True)]
+
+    calls.clear()
+    config.get_contexts_file().write_text("TH-RAG uses FAISS and SQLite.", encoding="utf-8")
+    pipeline.run_pipeline("dag")
+    assert calls[:3] == [("graph_construction", False), ("json_to_gexf", False), ("edge_embedding", False)]
+    assert sorted(calls[3:]) == [
+        ("answer_generation_long", False),
+        ("answer_generation_short", False),
+        ("evaluation_f1", False),
+    ]
+
+
+
+def test_run_datasets_builds_datasets_in_parallel_with_separate_state(tmp_path, monkeypatch) -> None:
+    configs = {}
+    for name in ["alpha", "beta"]:
+        config = THRAGConfig(name)
+        config.data_dir, config.results_dir = tmp_path / "data", tmp_path / "results"
+        config.index_results_dir, config.temp_dir = tmp_path / "index", tmp_path
+        config.manifests_dir = tmp_path / "manifests"
+        config.get_dataset_dir().mkdir(parents=True)
+        config.get_contexts_file().write_text(f"{name} uses FAISS.", encoding="utf-8")
+        configs[name] = config
+    monkeypatch.setattr(pipeline, "get_config", lambda name=None: configs.get(name, configs["alpha"]))
+
+    # Each dataset's first step waits until the other dataset has started too.
+    datasets_overlap = threading.Barrier(2, timeout=5)
+
+    def handler(step_name: str):
+        def run(dataset_name: str, _force_rebuild: bool) -> str:
+            if step_name == "graph_construction":
+                datasets_overlap.wait()
+            config = configs[dataset_name]
+            for path in pipeline.expected_outputs(config)[step_name]:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_text(dataset_name, encoding="utf-8")
+            config.mark_step_completed(step_name)
+            return dataset_name
+
+        return run
+
+    monkeypatch.setattr(pipeline, "STEP_HANDLERS", {name: handler(name) for name in pipeline.STEP_SEQUENCE})
+
+    results = pipeline.run_datasets(["alpha", "beta"], ["graph_build"], dataset_workers=2)
+    for name, config in configs.items():
+        assert results[name] == {step: name for step in pipeline.STEP_GROUPS["graph_build"]}
+        assert set(config.get_dataset_state()) == set(pipeline.STEP_GROUPS["graph_build"])
+        assert config.get_dataset_state_file().exists()
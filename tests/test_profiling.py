@@ -0,0 +1,83 @@
+import faulthandler
+import json
+import os
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import pipeline
+from config import THRAGConfig
+from utils.profiling import enable_stack_dumps, parse_profile_modes, profile_step
+from utils.tracing import span
+
+
+def make_config(tmp_path, name: str = "profiled") -> THRAGConfig:
+    config = THRAGConfig(name)
+    config.data_dir, config.results_dir, config.temp_dir = tmp_path / "data", tmp_path / "results", tmp_path
+    config.index_results_dir, config.manifests_dir = tmp_path / "index", tmp_path / "manifests"
+    config.profiles_dir = tmp_path / "profiles"
+    return config
+
+
+def busy_pool_worker(seconds: float) -> int:
+    total, deadline = 0, time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        total += sum(range(200))
+    return total
+
+
+def test_profile_step_writes_every_dump_kind(tmp_path) -> None:
+    config = make_config(tmp_path)
+
+    modes = ["cpu", "sample", "memory", "timers"]
+    with profile_step(config, "graph_construction", modes, sample_interval=0.005) as dumps:
+        with span("extraction"), ThreadPoolExecutor(max_workers=2) as executor:
+            list(executor.map(busy_pool_worker, [0.15, 0.15]))
+        buffers = [bytearray(1 << 20) for _ in range(4)]
+    del buffers
+
+    assert set(dumps) == {"cpu", "sample", "memory", "timers"}
+    prefix = str(tmp_path / "profiles" / "profiled" / "graph_construction_")
+    assert all(name.startswith(prefix) for files in dumps.values() for name in files)
+    assert "cumulative" in open(dumps["cpu"][1], encoding="utf-8").read()
+    # Pool threads are only visible to the sampling profiler.
+    assert "busy_pool_worker" in open(dumps["sample"][0], encoding="utf-8").read()
+    assert open(dumps["memory"][1], encoding="utf-8").readline().startswith("Peak traced memory")
+    timers = json.load(open(dumps["timers"][0], encoding="utf-8"))
+    assert timers["step"] == "graph_construction" and timers["wall_seconds"] >= 0.15
+    assert [item["stage"] for item in timers["trace"]["spans"]] == ["extraction"]
+
+    with pytest.raises(ValueError):
+        parse_profile_modes("cpu,gpu")
+
+
+
+def test_pipeline_profiles_selected_steps(tmp_path, monkeypatch) -> None:
+    config = make_config(tmp_path, "dag")
+    config.get_graph_json_file().parent.mkdir(parents=True)
+    config.get_graph_json_file().write_text("[]", encoding="utf-8")
+
+    def write_gexf(_dataset_name: str, _force_rebuild: bool) -> str:
+        config.get_graph_gexf_file().write_text("<gexf/>", encoding="utf-8")
+        return "json_to_gexf"
+
+    monkeypatch.setitem(pipeline.STEP_HANDLERS, "json_to_gexf", write_gexf)
+    assert pipeline.execute_step(config, "json_to_gexf", True, profile_modes=["timers"]) == ("completed", "json_to_gexf")
+    assert len(list((tmp_path / "profiles" / "dag").glob("json_to_gexf_*.timers.json"))) == 1
+
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGUSR1"), reason="SIGUSR1 is not available on this platform")
+def test_sigusr1_dumps_all_thread_stacks(tmp_path) -> None:
+    config = make_config(tmp_path)
+    path = enable_stack_dumps(config)
+    try:
+        os.kill(os.getpid(), signal.SIGUSR1)
+        time.sleep(0.1)
+    finally:
+        faulthandler.unregister(signal.SIGUSR1)
+
+    dump = path.read_text(encoding="utf-8")
+    assert "test_sigusr1_dumps_all_thread_stacks" in dump and "most recent call first" in dump
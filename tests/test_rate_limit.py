@@ -0,0 +1,35 @@
+import time
+
+from config import THRAGConfig
+from utils import rate_limit
+from utils.openai_client import create_client
+from utils.rate_limit import RateLimitedClient, RateLimiter
+
+
+def test_clients_share_one_token_budget(monkeypatch) -> None:
+    monkeypatch.setenv("OPENAI_BACKEND", "fake")
+    monkeypatch.setattr(rate_limit, "_limiter", None)
+    config = THRAGConfig("limited")
+    config.fake_embed_dim, config.openai_tokens_per_minute = 8, 6000
+
+    first, second = create_client(config), create_client(config)
+    assert isinstance(first, RateLimitedClient) and first.limiter is second.limiter
+
+    # 100 tokens per second: the first request empties the bucket, the next waits for refill.
+    started = time.perf_counter()
+    first.embeddings.create(input=["x" * 4 * 6000], model="fake")
+    assert time.perf_counter() - started < 0.1
+    second.embeddings.create(input=["x" * 4 * 29], model="fake")
+    assert 0.2 < time.perf_counter() - started < 0.6
+    assert first.limiter.waited_seconds > 0.2
+    assert second.client.stats.calls["embeddings"] == 1
+
+
+
+def test_request_budget_spaces_out_calls_once_the_burst_is_spent() -> None:
+    limiter = RateLimiter(requests_per_minute=240)
+
+    started = time.perf_counter()
+    waits = [limiter.acquire() for _ in range(242)]
+    assert max(waits[:240]) < 0.05
+    assert 0.4 < time.perf_counter() - started < 0.8
@@ -0,0 +1,57 @@
+import threading
+import time
+
+from index.scheduler import JobScheduler
+
+
+
+def test_scheduler_starts_largest_jobs_first_within_lookahead() -> None:
+    started: list[str] = []
+    pulled: list[str] = []
+
+    def jobs():
+        for name, cost in [("a", 1), ("b", 5), ("c", 3), ("d", 9), ("e", 2)]:
+            pulled.append(name)
+            yield cost, name
+
+    def worker(name: str) -> str:
+        started.append(name)
+        assert len(pulled) <= len(started) + 3
+        return name.upper()
+
+    scheduler = JobScheduler(worker, max_in_flight=1, lookahead=3, straggler_percentile=0)
+    results = list(scheduler.run(jobs()))
+
+    assert started == ["b", "d", "c", "e", "a"]
+    assert sorted(result for _name, result, _error in results) == ["A", "B", "C", "D", "E"]
+    assert scheduler.stats["jobs"] == 5
+
+
+
+def test_scheduler_reissues_stragglers_and_reports_errors() -> None:
+    release = threading.Event()
+    attempts: dict[str, int] = {}
+    lock = threading.Lock()
+
+    def worker(name: str) -> str:
+        with lock:
+            attempts[name] = attempts.get(name, 0) + 1
+            attempt = attempts[name]
+        if name == "slow" and attempt == 1:
+            release.wait(5)
+        if name == "broken":
+            raise RuntimeError("boom")
+        time.sleep(0.01)
+        return f"{name}-{attempt}"
+
+    jobs = [(1, f"job-{index}") for index in range(8)] + [(1, "broken"), (1, "slow")]
+    scheduler = JobScheduler(worker, max_in_flight=2, lookahead=1, straggler_percentile=90, straggler_min_samples=4)
+    began = time.perf_counter()
+    results = {name: (result, error) for name, result, error in scheduler.run(jobs)}
+    elapsed = time.perf_counter() - began
+    release.set()
+
+    assert elapsed < 2
+    assert results["slow"] == ("slow-2", None)
+    assert isinstance(results["broken"][1], RuntimeError)
+    assert scheduler.stats["reissued"] == 1 and scheduler.stats["reissue_wins"] == 1
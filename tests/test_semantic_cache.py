@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import os
+import time
+
+from config import THRAGConfig
+from generate.graph_rag import GraphRAG
+from generate.semantic_cache import SemanticCache, normalize_query
+from index.chunk_store import InMemoryChunkStore
+from index.embedders import HashingEmbedder
+from prompt.answer_short import ANSWER_PROMPT
+from utils.fake_openai import FakeOpenAI
+
+
+class CountingRetriever:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def retrieve(self, query, top_k1=None, top_k2=None):
+        self.calls += 1
+        return {
+            "chunks": ["chunk-00000"],
+            "edges": [
+                {
+                    "source": "TH-RAG",
+                    "target": "FAISS",
+                    "label": "uses",
+                    "sentence": "TH-RAG uses FAISS.",
+                    "chunk_ids": ["chunk-00000"],
+                }
+            ],
+        }
+
+
+class CachedGraphRAG(GraphRAG):
+    def __init__(self, mode: str) -> None:
+        self.config = THRAGConfig("demo")
+        self.config.chat_model = "fake"
+        self.config.semantic_cache = mode
+        self.dataset_name = "demo"
+        self.answer_prompt = ANSWER_PROMPT
+        self.system_prompt = "Answer from the evidence."
+        self.default_top_k1 = 5
+        self.default_top_k2 = 2
+        self.temperature = 0.0
+        self.max_output_tokens = 64
+        self.client = FakeOpenAI()
+        self.chunk_store = InMemoryChunkStore({"chunk-00000": "TH-RAG stores predicate-edge evidence in a FAISS index."})
+        self.retriever = CountingRetriever()
+        self.semantic_cache = SemanticCache(HashingEmbedder(dim=256), threshold=0.8)
+
+    def _count_tokens(self, text: str) -> int:
+        return len(text.split())
+
+
+
+def test_semantic_cache_hits_near_duplicates_and_evicts(tmp_path) -> None:
+    index_path = tmp_path / "edges.faiss"
+    index_path.write_bytes(b"v1")
+    cache = SemanticCache(HashingEmbedder(dim=256), threshold=0.8, max_entries=2, ttl_seconds=60, index_path=index_path)
+
+    assert normalize_query("  Which INDEX does TH-RAG use?? ") == "which index does th-rag use"
+    assert cache.lookup("answer", "Which index does TH-RAG use?") is None
+    cache.store("answer", "Which index does TH-RAG use?", {"answer": "FAISS"})
+
+    assert cache.lookup("answer", "which index does th-rag use") == ({"answer": "FAISS"}, 1.0)
+    value, similarity = cache.lookup("answer", "Which index does TH-RAG use for search?")
+    assert value == {"answer": "FAISS"} and 0.8 <= similarity < 1.0
+    assert cache.lookup("answer", "How are chunks stored on disk?") is None
+    assert cache.lookup("retrieval", "Which index does TH-RAG use?") is None
+
+    cache.store("answer", "How are chunks stored on disk?", {"answer": "SQLite"})
+    cache.store("answer", "What does the judge measure?", {"answer": "F1"})
+    assert cache.lookup("answer", "Which index does TH-RAG use?") is None
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["entries"] == 2
+    assert stats["hits"] == 2 and stats["exact_hits"] == 1
+    assert stats["hit_rate"] == stats["hits"] / stats["lookups"]
+
+    cache.ttl_seconds = 0.01
+    time.sleep(0.02)
+    assert cache.lookup("answer", "What does the judge measure?") is None
+    assert cache.stats()["expirations"] == 1
+
+    cache.ttl_seconds = 60
+    cache.store("answer", "What does the judge measure?", {"answer": "F1"})
+    index_path.write_bytes(b"rebuilt")
+    os.utime(index_path, ns=(0, 0))
+    assert cache.lookup("answer", "What does the judge measure?") is None
+    assert cache.stats()["invalidations"] == 1 and cache.stats()["entries"] == 0
+
+
+
+def test_graph_rag_serves_near_duplicate_questions_from_the_cache() -> None:
+    rag = CachedGraphRAG("answer")
+    first = rag.answer_details("Which index does TH-RAG use?")
+    second = rag.answer_details("which index does TH-RAG use")
+    streamed = rag.stream_answer("Which index does TH-RAG use ?").consume()
+
+    assert rag.retriever.calls == 1
+    assert second["answer"] == streamed["answer"] == first["answer"]
+    record = second["trace"].to_dict()
+    assert record["cache"]["semantic_answer"] == {"hits": 1, "misses": 0}
+    assert "answer_generation" not in record["usage"]
+
+    retrieval_only = CachedGraphRAG("retrieval")
+    retrieval_only.answer_details("Which index does TH-RAG use?")
+    retrieval, trace = retrieval_only.retrieve("Which index does TH-RAG use")
+    assert retrieval_only.retriever.calls == 1
+    assert retrieval["chunks"] == ["chunk-00000"]
+    assert trace.to_dict()["cache"]["semantic_retrieval"] == {"hits": 1, "misses": 0}
@@ -0,0 +1,94 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from typing import Any
+
+import pytest
+
+from generate.artifacts import ArtifactManager
+from generate.server import QueryService, create_server
+from utils.tracing import span, trace_query
+
+
+class StaticRAG:
+    def __init__(self, dataset_name: str, generation: int) -> None:
+        self.dataset_name = dataset_name
+        self.generation = generation
+
+    def retrieve(self, query, top_k1=None, top_k2=None):
+        with trace_query(dataset=self.dataset_name, query=query) as trace:
+            with span("retrieval"):
+                result = {"chunks": [f"chunk-{self.generation}"], "edges": []}
+        return result, trace
+
+    def answer_details(self, query, top_k1=None, top_k2=None):
+        result, trace = self.retrieve(query)
+        return {"answer": f"generation {self.generation}", "chunk_ids": result["chunks"], "trace": trace}
+
+
+
+def post(base_url: str, path: str, payload: Any) -> dict:
+    request = urllib.request.Request(
+        base_url + path,
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+
+def test_server_answers_reloads_and_reports_stats() -> None:
+    loads: list[str] = []
+
+    def load(dataset_name: str) -> int:
+        loads.append(dataset_name)
+        return len(loads)
+
+    service = QueryService(["demo"], rag_factory=StaticRAG, artifacts=ArtifactManager(loader=load))
+    server = create_server(service, "127.0.0.1", 0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        assert post(base_url, "/answer", {"query": "q"})["answer"] == "generation 1"
+        assert post(base_url, "/retrieve", {"query": "q", "dataset": "demo"})["chunks"] == ["chunk-1"]
+        assert post(base_url, "/reload", {})["generation"] == 2
+        assert post(base_url, "/answer", {"query": "q"})["answer"] == "generation 2"
+
+        with urllib.request.urlopen(base_url + "/health") as response:
+            assert json.loads(response.read())["loaded"]["demo"]["generation"] == 2
+        with urllib.request.urlopen(base_url + "/stats") as response:
+            stats = json.loads(response.read())
+        assert stats["requests"]["answer"] == 2
+        assert stats["endpoints"]["answer"]["queries"] == 2
+        assert stats["datasets"]["demo"]["stages"]["retrieval"]["latency"]["count"] == 3
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert loads == ["demo", "demo"]
+
+
+
+def test_server_rejects_malformed_request_bodies() -> None:
+    service = QueryService(["demo"], rag_factory=StaticRAG, artifacts=ArtifactManager(loader=lambda _name: 1))
+    server = create_server(service, "127.0.0.1", 0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        assert post(base_url, "/retrieve", {"query": "q", "top_k1": "5"})["chunks"] == ["chunk-1"]
+        for payload in [
+            ["q"],
+            {"query": "q", "top_k1": "five"},
+            {"query": "q", "top_k2": 2.5},
+            {"query": "q", "top_k1": 0},
+        ]:
+            with pytest.raises(urllib.error.HTTPError) as error:
+                post(base_url, "/answer", payload)
+            assert error.value.code == 400
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert service.stats()["requests"]["errors"] == 4
@@ -0,0 +1,62 @@
+from config import THRAGConfig
+from generate.graph_rag import GraphRAG
+from index.chunk_store import InMemoryChunkStore
+from prompt.answer_short import ANSWER_PROMPT
+from utils.fake_openai import FakeBackendSettings, FakeOpenAI
+from utils.tracing import summarize_traces
+
+
+class StaticRetriever:
+    def retrieve(self, query, top_k1=None, top_k2=None):
+        return {
+            "chunks": ["chunk-00000"],
+            "edges": [
+                {
+                    "source": "TH-RAG",
+                    "target": "FAISS",
+                    "label": "uses",
+                    "sentence": "TH-RAG uses FAISS.",
+                    "chunk_ids": ["chunk-00000"],
+                }
+            ],
+        }
+
+
+class OfflineGraphRAG(GraphRAG):
+    def __init__(self, client: FakeOpenAI) -> None:
+        self.config = THRAGConfig("demo")
+        self.config.chat_model = "fake"
+        self.dataset_name = "demo"
+        self.answer_prompt = ANSWER_PROMPT
+        self.system_prompt = "Answer from the evidence."
+        self.default_top_k1 = 5
+        self.default_top_k2 = 2
+        self.temperature = 0.0
+        self.max_output_tokens = 64
+        self.client = client
+        self.chunk_store = InMemoryChunkStore({"chunk-00000": "TH-RAG stores predicate-edge evidence in a FAISS index."})
+        self.retriever = StaticRetriever()
+
+    def _count_tokens(self, text: str) -> int:
+        return len(text.split())
+
+
+
+def test_stream_answer_matches_answer_and_records_ttft() -> None:
+    rag = OfflineGraphRAG(FakeOpenAI(FakeBackendSettings(token_latency_ms=1)))
+
+    answer_stream = rag.stream_answer("Which index does TH-RAG use?")
+    pieces = list(answer_stream)
+    details = answer_stream.details
+    expected = rag.answer_details("Which index does TH-RAG use?")
+
+    assert len(pieces) > 1
+    assert details["answer"] == "".join(pieces).strip() == expected["answer"]
+    assert details["context_tokens"] == expected["context_tokens"] > 0
+    assert details["chunk_ids"] == ["chunk-00000"]
+
+    record = answer_stream.trace.to_dict()
+    assert 0 < record["metrics"]["generation_ttft_seconds"] <= record["metrics"]["ttft_seconds"]
+    assert record["metrics"]["tokens_per_second"] > 0
+    assert record["usage"]["answer_generation"]["completion_tokens"] > 0
+    assert summarize_traces([record])["metrics"]["ttft_seconds"]["count"] == 1
@@ -0,0 +1,23 @@
+import json
+
+from bench.synthetic_graph import SyntheticGraphSpec, iter_synthetic_blocks, write_synthetic_graph_json
+from index.json_to_gexf import load_entries
+
+
+def test_synthetic_blocks_respect_requested_counts(tmp_path) -> None:
+    spec = SyntheticGraphSpec(triples=250, chunks=7, entities=40, topics=5, subtopics_per_topic=3, seed=1)
+    output_path = tmp_path / "synthetic.json"
+    resolved = write_synthetic_graph_json(output_path, spec)
+
+    blocks = json.loads(output_path.read_text(encoding="utf-8"))
+    assert resolved["chunks"] == len(blocks) == 7
+    entries = load_entries(output_path)
+    assert len(entries) == 250
+    assert {entry["subject"]["main_topic"] for entry in entries} <= {f"Topic {index}" for index in range(5)}
+    assert all(entry["triple"][0] != entry["triple"][2] for entry in entries)
+
+
+
+def test_synthetic_blocks_are_deterministic_for_a_seed() -> None:
+    spec = SyntheticGraphSpec(triples=50, seed=3)
+    assert list(iter_synthetic_blocks(spec)) == list(iter_synthetic_blocks(spec))
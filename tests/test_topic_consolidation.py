@@ -0,0 +1,82 @@
+import json
+from collections import Counter
+
+import networkx as nx
+
+import pipeline
+from config import THRAGConfig
+from index.embedders import HashingEmbedder
+from index.topic_consolidation import cap_fanout, confirm_pairs, consolidate_entries
+from utils.fake_openai import FakeOpenAI
+
+
+def triple(subject: str, object_: str, subtopic: str, topic: str) -> dict:
+    labels = {"subtopic": subtopic, "main_topic": topic}
+    return {
+        "triple": [subject, "relates to", object_],
+        "sentence": f"{subject} relates to {object_}.",
+        "subject": labels,
+        "object": labels,
+    }
+
+
+ENTRIES = [
+    triple("Ajax", "PSV", "Football", "Sports"),
+    triple("PSV", "Feyenoord", "Football", "Sports"),
+    triple("Ajax", "Feyenoord", "football", "sports"),
+    triple("Wimbledon", "Roland Garros", "Tennis", "Sport"),
+    triple("Federer", "Wimbledon", "Tennis", "Sports"),
+    triple("Federer", "Nadal", "Tennis players", "Sports"),
+    triple("ECB", "Fed", "Interest rates", "Finance"),
+    triple("ECB", "Euro", "Interest rates", "Finance"),
+]
+
+
+
+def test_consolidate_entries_merges_synonyms_and_caps_fanout() -> None:
+    result = consolidate_entries(ENTRIES, HashingEmbedder(dim=256), threshold=0.6, max_subtopics=2)
+
+    assert result["aliases"]["topic"] == {"sports": "Sports", "Sport": "Sports"}
+    assert result["aliases"]["subtopic"] == {"football": "Football", "Tennis players": "Tennis"}
+    report = result["report"]
+    assert report["topic_merges"] == {"same_key": 1, "embedding": 1}
+    assert (report["graph"]["topic_nodes"]["before"], report["graph"]["topic_nodes"]["after"]) == (3, 2)
+    assert report["graph"]["max_subtopics_per_topic"]["after"] == 2
+
+    vectors = {label: HashingEmbedder(dim=64).embed(label) for label in ["A", "B", "C", "A b"]}
+    folds = cap_fanout({"T": Counter({"A": 5, "B": 3, "C": 1, "A b": 1})}, vectors, max_subtopics=2)
+    assert set(folds) == {"C", "A b"} and folds["A b"] == "A"
+
+    answers = confirm_pairs("topic", [("Sport", "Sports"), ("Sports", "Finance")], FakeOpenAI(), "fake", THRAGConfig())
+    assert answers == [True, False]
+
+
+
+def test_json_to_gexf_step_consolidates_topics_and_reports_prompt_tokens(tmp_path, monkeypatch) -> None:
+    config = THRAGConfig("topics")
+    config.data_dir, config.index_results_dir, config.temp_dir = tmp_path / "data", tmp_path / "index", tmp_path
+    config.embed_backend = "hashing"
+    config.topic_consolidation = True
+    config.topic_merge_llm = True
+    config.topic_merge_threshold = 0.6
+    config.openai_backend = "fake"
+    config.index_results_dir.mkdir()
+    config.get_dataset_dir().mkdir(parents=True)
+    config.get_questions_file().write_text(json.dumps([{"query": "Who did Ajax play?"}]), encoding="utf-8")
+    config.get_graph_json_file().write_text(json.dumps([{"chunk_id": "chunk-00000", "triples": ENTRIES}]))
+    monkeypatch.setattr(pipeline, "get_config", lambda _name=None: config)
+    monkeypatch.setattr("index.topic_consolidation.token_counter", lambda _model: lambda text: len(text.split()))
+
+    pipeline.run_json_to_gexf("topics", force_rebuild=False)
+
+    graph = nx.read_gexf(config.get_graph_gexf_file())
+    topics = sorted(data["label"] for _node, data in graph.nodes(data=True) if data["type"] == "topic")
+    assert topics == ["Finance", "Sports"]
+    assert graph.has_edge("subtopic_tennis", "topic_sports") and "subtopic_tennis_players" not in graph
+
+    report = json.loads(config.get_topic_aliases_file().read_text(encoding="utf-8"))["report"]
+    tokens = report["prompt_tokens"]
+    assert tokens["questions"] == 1
+    assert tokens["after"]["topic_prompt"]["mean"] < tokens["before"]["topic_prompt"]["mean"]
+    assert tokens["reduction"]["per_query"] > 0
+    assert config.get_dataset_state()["json_to_gexf"]["topic_aliases"] == 2
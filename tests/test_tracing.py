@@ -0,0 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from utils.tracing import percentile, record_usage, span, submit_in_context, summarize_traces, trace_query
+
+
+def test_spans_and_usage_are_attributed_to_the_active_trace() -> None:
+    response = SimpleNamespace(usage=SimpleNamespace(prompt_tokens=12, completion_tokens=3))
+
+    def choose_subtopics() -> None:
+        with span("subtopic_choice"):
+            record_usage(response)
+
+    with trace_query(query="q") as trace:
+        with span("topic_choice"):
+            record_usage(response)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            for future in [submit_in_context(executor, choose_subtopics) for _ in range(2)]:
+                future.result()
+
+    record = trace.to_dict()
+    assert [item["stage"] for item in record["spans"]].count("subtopic_choice") == 2
+    assert record["usage"]["topic_choice"]["prompt_tokens"] == 12
+    assert record["usage"]["subtopic_choice"]["calls"] == 2
+    assert record["total_seconds"] is not None
+
+
+
+def test_summarize_traces_reports_percentiles_tokens_and_cache_rates() -> None:
+    records = [
+        {
+            "total_seconds": float(index),
+            "spans": [{"stage": "retrieval", "seconds": float(index)}],
+            "usage": {"answer_generation": {"calls": 1, "prompt_tokens": 10, "completion_tokens": 2}},
+            "cache": {"semantic": {"hits": index % 2, "misses": 1 - index % 2}},
+        }
+        for index in range(1, 101)
+    ]
+
+    summary = summarize_traces(records)
+    assert summary["queries"] == 100
+    assert summary["stages"]["retrieval"]["latency"]["p50"] == percentile([float(i) for i in range(1, 101)], 50)
+    assert percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.5 and percentile([], 95) == 0.0
+    assert summary["stages"]["answer_generation"]["tokens"]["prompt_tokens"] == 1000
+    assert summary["cache"]["semantic"]["hit_rate"] == 0.5
@@ -0,0 +1 @@
+"""Shared runtime utilities for TH-RAG."""
@@ -0,0 +1,634 @@
+"""Offline stand-in for the subset of the OpenAI client used by TH-RAG.
+
+The fake backend returns deterministic hash-based embeddings and canned,
+schema-valid JSON chat completions for every prompt family in ``prompt/``. It can
+inject latency and errors drawn from configurable distributions so that our own
+code paths, thread pools, and caches can be benchmarked without a network; calls
+whose sampled latency exceeds their ``timeout`` fail after ``timeout`` seconds.
+
+It also stands in for the Files and Batch APIs: uploaded files and batches are
+kept as files under ``batch_dir`` so that they survive across clients and
+processes, and a batch runs its chat completion requests once it has been
+polled ``batch_polls`` times.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import random
+import re
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+import numpy as np
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+_SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+_ENTITY_PATTERN = re.compile(r"\b[A-Z][\w-]*(?:\s+[A-Z][\w-]*)*")
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+_RANGE_PATTERN = re.compile(r"Choose between (\d+) and (\d+)")
+_STREAM_PIECE_PATTERN = re.compile(r"\s*\S+")
+_PACKED_CHUNK_PATTERN = re.compile(r'<chunk id="([^"]+)">\n(.*?)\n</chunk>', re.DOTALL)
+_MERGE_PAIR_PATTERN = re.compile(r"^(\d+)\. (\[.*\])$", re.MULTILINE)
+
+
+class FakeBackendError(RuntimeError):
+    """Injected failure raised by the fake backend."""
+
+
+class FakeTimeoutError(FakeBackendError):
+    """Raised after ``timeout`` seconds when a call's sampled latency exceeds it."""
+
+
+@dataclass
+class Usage:
+    prompt_tokens: int
+    completion_tokens: int = 0
+    total_tokens: int = 0
+
+
+@dataclass
+class Message:
+    content: str
+    role: str = "assistant"
+
+
+@dataclass
+class Choice:
+    message: Message
+    index: int = 0
+    finish_reason: str = "stop"
+
+
+@dataclass
+class ChatCompletion:
+    choices: list[Choice]
+    usage: Usage
+    model: str
+
+
+@dataclass
+class Delta:
+    content: str | None = None
+    role: str | None = None
+
+
+@dataclass
+class ChunkChoice:
+    delta: Delta
+    index: int = 0
+    finish_reason: str | None = None
+
+
+@dataclass
+class ChatCompletionChunk:
+    choices: list[ChunkChoice]
+    model: str
+    usage: Usage | None = None
+
+
+@dataclass
+class Embedding:
+    embedding: list[float]
+    index: int
+
+
+@dataclass
+class EmbeddingResponse:
+    data: list[Embedding]
+    usage: Usage
+    model: str
+
+
+@dataclass
+class FileObject:
+    id: str
+    bytes: int
+    filename: str
+    purpose: str
+    object: str = "file"
+
+
+@dataclass
+class FileContent:
+    text: str
+
+    def read(self) -> bytes:
+        return self.text.encode("utf-8")
+
+
+@dataclass
+class BatchRequestCounts:
+    total: int = 0
+    completed: int = 0
+    failed: int = 0
+
+
+@dataclass
+class Batch:
+    id: str
+    input_file_id: str
+    endpoint: str
+    completion_window: str
+    status: str = "validating"
+    output_file_id: str | None = None
+    error_file_id: str | None = None
+    request_counts: BatchRequestCounts = field(default_factory=BatchRequestCounts)
+    metadata: dict[str, str] | None = None
+    polls_remaining: int = 1
+    object: str = "batch"
+
+
+@dataclass
+class FakeBackendSettings:
+    embedding_dim: int = 1536
+    latency_ms: float = 0.0
+    latency_jitter_ms: float = 0.0
+    latency_distribution: str = "fixed"
+    error_rate: float = 0.0
+    seed: int = 0
+    token_latency_ms: float = 0.0
+    batch_dir: str | None = None
+    batch_polls: int = 1
+    topic_count: int = 8
+    subtopics_per_topic: int = 4
+
+
+def approximate_tokens(text: str) -> int:
+    """Cheap token estimate that does not need tiktoken encoding files."""
+
+    return max(1, math.ceil(len(text) / 4))
+
+
+def stable_hash(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def hash_embedding(text: str, dim: int) -> np.ndarray:
+    """Return a deterministic unit vector for ``text``."""
+
+    vector = np.random.default_rng(stable_hash(text)).standard_normal(dim).astype("float32")
+    return vector / np.linalg.norm(vector)
+
+
+def _message_text(messages: list[dict[str, Any]], role: str) -> str:
+    return "\n".join(str(item.get("content", "")) for item in messages if item.get("role") == role)
+
+
+def _section(prompt: str, heading: str) -> str:
+    """Return everything after the first ``heading`` in ``prompt``, stripped."""
+
+    _before, _marker, after = prompt.partition(heading)
+    return after.strip()
+
+
+def _json_list_after(prompt: str, heading: str) -> list[str]:
+    tail = _section(prompt, heading)
+    try:
+        payload = json.loads(tail[: tail.rindex("]") + 1])
+    except ValueError:
+        return []
+    return [str(item) for item in payload] if isinstance(payload, list) else []
+
+
+def _rank_labels(question: str, labels: list[str], limit: int) -> list[str]:
+    """Order labels by word overlap with the question, breaking ties by hash."""
+
+    question_words = set(_WORD_PATTERN.findall(question.lower()))
+    scored = sorted(
+        labels,
+        key=lambda label: (
+            -len(question_words & set(_WORD_PATTERN.findall(label.lower()))),
+            stable_hash(question + label),
+        ),
+    )
+    return scored[:limit]
+
+
+def _choice_limits(prompt: str, default: int) -> tuple[int, int]:
+    match = _RANGE_PATTERN.search(prompt)
+    if not match:
+        return default, default
+    return int(match.group(1)), int(match.group(2))
+
+
+def respond_topic_choice(prompt: str, settings: FakeBackendSettings) -> str:
+    labels = _json_list_after(prompt, "Allowed topics:")
+    low, high = _choice_limits(prompt, 5)
+    question = _section(prompt, "Question:").partition("Allowed topics:")[0].strip()
+    return json.dumps({"topics": _rank_labels(question, labels, (low + high) // 2)})
+
+
+def respond_subtopic_choice(prompt: str, settings: FakeBackendSettings) -> str:
+    labels = _json_list_after(prompt, "Allowed subtopics:")
+    low, high = _choice_limits(prompt, 10)
+    question = _section(prompt, "Question:").partition("Allowed subtopics:")[0].strip()
+    return json.dumps({"subtopics": _rank_labels(question, labels, (low + high) // 2)})
+
+
+def respond_topic_merge(prompt: str, settings: FakeBackendSettings) -> str:
+    """Confirm the candidate pairs whose labels share a word, ignoring a plural "s"."""
+
+    def words(label: str) -> set[str]:
+        return {word.removesuffix("s") for word in _WORD_PATTERN.findall(label.lower())}
+
+    synonyms = []
+    for number, pair in _MERGE_PAIR_PATTERN.findall(prompt.rpartition("Candidate pairs:")[2]):
+        left, right = json.loads(pair)
+        if words(left) & words(right):
+            synonyms.append(int(number))
+    return json.dumps({"synonyms": synonyms})
+
+
+def fake_topic_labels(entity: str, settings: FakeBackendSettings) -> dict[str, str]:
+    digest = stable_hash(entity.lower())
+    topic = digest % settings.topic_count
+    subtopic = (digest // settings.topic_count) % settings.subtopics_per_topic
+    return {"subtopic": f"Subtopic {topic}.{subtopic}", "main_topic": f"Topic {topic}"}
+
+
+def extract_fake_triples(document: str, settings: FakeBackendSettings) -> list[dict[str, Any]]:
+    """Build one schema-valid triple per sentence that names two entities."""
+
+    triples: list[dict[str, Any]] = []
+    for sentence in _SENTENCE_PATTERN.split(document.strip()):
+        sentence = sentence.strip()
+        entities = list(dict.fromkeys(match.group(0) for match in _ENTITY_PATTERN.finditer(sentence)))
+        if len(entities) < 2:
+            continue
+        subject, object_ = entities[0], entities[1]
+        triples.append(
+            {
+                "triple": [subject, "related to", object_],
+                "sentence": sentence,
+                "subject": fake_topic_labels(subject, settings),
+                "object": fake_topic_labels(object_, settings),
+            }
+        )
+    return triples
+
+
+def respond_extraction(prompt: str, settings: FakeBackendSettings) -> str:
+    document = prompt.rpartition("Input document:")[2]
+    return json.dumps(extract_fake_triples(document, settings))
+
+
+def respond_packed_extraction(prompt: str, settings: FakeBackendSettings) -> str:
+    documents = prompt.rpartition("Input documents:")[2]
+    return json.dumps(
+        {
+            chunk_id: extract_fake_triples(document, settings)
+            for chunk_id, document in _PACKED_CHUNK_PATTERN.findall(documents)
+        }
+    )
+
+
+def respond_evaluation(prompt: str, settings: FakeBackendSettings) -> str:
+    winner = "Answer 1" if stable_hash(prompt) % 2 == 0 else "Answer 2"
+    return json.dumps(
+        {
+            category: {"Winner": winner, "Explanation": "Deterministic fake judgement."}
+            for category in ["Comprehensiveness", "Diversity", "Empowerment", "Overall Winner"]
+        }
+    )
+
+
+def respond_answer(prompt: str, settings: FakeBackendSettings) -> str:
+    evidence = _section(prompt, "Evidence:").rpartition("Question:")[0]
+    for line in evidence.splitlines():
+        line = line.strip()
+        if line and not line.startswith("["):
+            return line
+    return "I do not have enough retrieved evidence to answer this question."
+
+
+Responder = Callable[[str, FakeBackendSettings], str]
+
+DEFAULT_RESPONDERS: list[tuple[str, Responder]] = [
+    ("Allowed topics:", respond_topic_choice),
+    ("Allowed subtopics:", respond_subtopic_choice),
+    ("Candidate pairs:", respond_topic_merge),
+    ("Input documents:", respond_packed_extraction),
+    ("Input document:", respond_extraction),
+    ("Overall Winner", respond_evaluation),
+    ("Evidence:", respond_answer),
+]
+
+
+@dataclass
+class FakeBackendStats:
+    calls: Counter = field(default_factory=Counter)
+    errors: Counter = field(default_factory=Counter)
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+class _FakeBackend:
+    def __init__(self, settings: FakeBackendSettings, responders: list[tuple[str, Responder]]) -> None:
+        self.settings = settings
+        self.responders = responders
+        self.stats = FakeBackendStats()
+        self._random = random.Random(settings.seed)
+        self._lock = threading.Lock()
+
+    def sample_latency(self) -> float:
+        settings = self.settings
+        with self._lock:
+            if settings.latency_distribution == "uniform":
+                value = self._random.uniform(
+                    max(0.0, settings.latency_ms - settings.latency_jitter_ms),
+                    settings.latency_ms + settings.latency_jitter_ms,
+                )
+            elif settings.latency_distribution == "exponential":
+                value = self._random.expovariate(1 / settings.latency_ms) if settings.latency_ms > 0 else 0.0
+            elif settings.latency_distribution == "lognormal":
+                sigma = settings.latency_jitter_ms / settings.latency_ms if settings.latency_ms > 0 else 0.0
+                value = settings.latency_ms * self._random.lognormvariate(0.0, sigma)
+            else:
+                value = settings.latency_ms
+        return max(0.0, value) / 1000
+
+    def simulate_call(self, endpoint: str, timeout: float | None = None) -> None:
+        delay = self.sample_latency()
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            with self._lock:
+                self.stats.calls[endpoint] += 1
+                self.stats.errors[endpoint] += 1
+            raise FakeTimeoutError(f"Request to {endpoint} timed out after {timeout:.3f}s.")
+        if delay:
+            time.sleep(delay)
+        with self._lock:
+            self.stats.calls[endpoint] += 1
+            failed = self._random.random() < self.settings.error_rate
+            if failed:
+                self.stats.errors[endpoint] += 1
+        if failed:
+            raise FakeBackendError(f"Injected failure for {endpoint}.")
+
+    def record_tokens(self, prompt_tokens: int, completion_tokens: int) -> None:
+        with self._lock:
+            self.stats.prompt_tokens += prompt_tokens
+            self.stats.completion_tokens += completion_tokens
+
+    def respond(self, prompt: str) -> str:
+        for marker, responder in self.responders:
+            if marker in prompt:
+                return responder(prompt, self.settings)
+        return "{}"
+
+
+class _FakeChatCompletions:
+    def __init__(self, backend: _FakeBackend) -> None:
+        self._backend = backend
+
+    def create(
+        self,
+        *,
+        model: str,
+        messages: list[dict[str, Any]],
+        stream: bool = False,
+        stream_options: dict[str, Any] | None = None,
+        timeout: float | None = None,
+        **_kwargs: Any,
+    ) -> ChatCompletion | Iterator[ChatCompletionChunk]:
+        self._backend.simulate_call("chat.completions", timeout)
+        prompt = _message_text(messages, "user")
+        content = self._backend.respond(prompt)
+        prompt_tokens = sum(approximate_tokens(str(item.get("content", ""))) for item in messages)
+        completion_tokens = approximate_tokens(content)
+        self._backend.record_tokens(prompt_tokens, completion_tokens)
+        usage = Usage(prompt_tokens, completion_tokens, prompt_tokens + completion_tokens)
+        if stream:
+            include_usage = bool((stream_options or {}).get("include_usage"))
+            return self._stream(model, content, usage if include_usage else None)
+        return ChatCompletion(
+            choices=[Choice(message=Message(content=content))],
+            usage=usage,
+            model=model,
+        )
+
+    def _stream(self, model: str, content: str, usage: Usage | None) -> Iterator[ChatCompletionChunk]:
+        """Yield ``content`` word by word, pausing ``token_latency_ms`` between pieces."""
+
+        delay = self._backend.settings.token_latency_ms / 1000
+        yield ChatCompletionChunk(choices=[ChunkChoice(delta=Delta(role="assistant", content=""))], model=model)
+        for piece in _STREAM_PIECE_PATTERN.findall(content):
+            if delay:
+                time.sleep(delay)
+            yield ChatCompletionChunk(choices=[ChunkChoice(delta=Delta(content=piece))], model=model)
+        yield ChatCompletionChunk(choices=[ChunkChoice(delta=Delta(), finish_reason="stop")], model=model)
+        if usage is not None:
+            yield ChatCompletionChunk(choices=[], model=model, usage=usage)
+
+
+class _FakeChat:
+    def __init__(self, backend: _FakeBackend) -> None:
+        self.completions = _FakeChatCompletions(backend)
+
+
+class _FakeEmbeddings:
+    def __init__(self, backend: _FakeBackend) -> None:
+        self._backend = backend
+
+    def create(
+        self,
+        *,
+        input: str | list[str],
+        model: str,
+        dimensions: int | None = None,
+        timeout: float | None = None,
+        **_kwargs: Any,
+    ) -> EmbeddingResponse:
+        self._backend.simulate_call("embeddings", timeout)
+        texts = [input] if isinstance(input, str) else list(input)
+        dim = dimensions or self._backend.settings.embedding_dim
+        prompt_tokens = sum(approximate_tokens(text) for text in texts)
+        self._backend.record_tokens(prompt_tokens, 0)
+        return EmbeddingResponse(
+            data=[Embedding(embedding=hash_embedding(text, dim).tolist(), index=index) for index, text in enumerate(texts)],
+            usage=Usage(prompt_tokens, 0, prompt_tokens),
+            model=model,
+        )
+
+
+class _FakeFiles:
+    def __init__(self, backend: _FakeBackend, root: Path) -> None:
+        self._backend = backend
+        self.root = root
+        self._root = root / "files"
+        self._root.mkdir(parents=True, exist_ok=True)
+
+    def create(self, *, file: Any, purpose: str, **_kwargs: Any) -> FileObject:
+        self._backend.simulate_call("files")
+        if isinstance(file, (str, Path)):
+            name, data = Path(file).name, Path(file).read_bytes()
+        elif isinstance(file, tuple):
+            name, data = file[0], file[1].read() if hasattr(file[1], "read") else file[1]
+        else:
+            name, data = Path(getattr(file, "name", "upload.jsonl")).name, file.read()
+        return self.write(data.decode("utf-8"), name, purpose)
+
+    def write(self, text: str, filename: str, purpose: str) -> FileObject:
+        file_id = f"file-{uuid.uuid4().hex[:24]}"
+        (self._root / f"{file_id}.data").write_text(text, encoding="utf-8")
+        record = FileObject(file_id, len(text.encode("utf-8")), filename, purpose)
+        (self._root / f"{file_id}.json").write_text(json.dumps(asdict(record)), encoding="utf-8")
+        return record
+
+    def content(self, file_id: str, **_kwargs: Any) -> FileContent:
+        self._backend.simulate_call("files")
+        path = self._root / f"{file_id}.data"
+        if not path.exists():
+            raise FakeBackendError(f"No such file: {file_id}")
+        return FileContent(path.read_text(encoding="utf-8"))
+
+
+class _FakeBatches:
+    """Batch API stand-in that runs a batch's requests on its ``batch_polls``-th poll."""
+
+    def __init__(self, backend: _FakeBackend, root: Path, files: _FakeFiles, chat: _FakeChatCompletions) -> None:
+        self._backend = backend
+        self._root = root / "batches"
+        self._root.mkdir(parents=True, exist_ok=True)
+        self._files = files
+        self._chat = chat
+
+    def _save(self, batch: Batch) -> Batch:
+        (self._root / f"{batch.id}.json").write_text(json.dumps(asdict(batch)), encoding="utf-8")
+        return batch
+
+    def _load(self, batch_id: str) -> Batch:
+        path = self._root / f"{batch_id}.json"
+        if not path.exists():
+            raise FakeBackendError(f"No such batch: {batch_id}")
+        payload = json.loads(path.read_text(encoding="utf-8"))
+        payload["request_counts"] = BatchRequestCounts(**payload["request_counts"])
+        return Batch(**payload)
+
+    def create(
+        self,
+        *,
+        input_file_id: str,
+        endpoint: str,
+        completion_window: str,
+        metadata: dict[str, str] | None = None,
+        **_kwargs: Any,
+    ) -> Batch:
+        self._backend.simulate_call("batches")
+        self._files.content(input_file_id)
+        batch = Batch(
+            id=f"batch_{uuid.uuid4().hex[:24]}",
+            input_file_id=input_file_id,
+            endpoint=endpoint,
+            completion_window=completion_window,
+            metadata=metadata,
+            polls_remaining=max(1, self._backend.settings.batch_polls),
+        )
+        return self._save(batch)
+
+    def retrieve(self, batch_id: str, **_kwargs: Any) -> Batch:
+        self._backend.simulate_call("batches")
+        batch = self._load(batch_id)
+        if batch.status in {"validating", "in_progress"}:
+            batch.polls_remaining -= 1
+            batch.status = "in_progress"
+            if batch.polls_remaining <= 0:
+                self._run(batch)
+            self._save(batch)
+        return batch
+
+    def cancel(self, batch_id: str, **_kwargs: Any) -> Batch:
+        batch = self._load(batch_id)
+        if batch.status in {"validating", "in_progress"}:
+            batch.status = "cancelled"
+            self._save(batch)
+        return batch
+
+    def _run(self, batch: Batch) -> None:
+        outputs: list[str] = []
+        errors: list[str] = []
+        for line in self._files.content(batch.input_file_id).text.splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            batch.request_counts.total += 1
+            try:
+                completion = self._chat.create(**request["body"])
+            except FakeBackendError as exc:
+                batch.request_counts.failed += 1
+                errors.append(
+                    json.dumps(
+                        {
+                            "id": f"batch_req_{uuid.uuid4().hex[:24]}",
+                            "custom_id": request["custom_id"],
+                            "response": None,
+                            "error": {"code": "injected_failure", "message": str(exc)},
+                        }
+                    )
+                )
+                continue
+            batch.request_counts.completed += 1
+            outputs.append(
+                json.dumps(
+                    {
+                        "id": f"batch_req_{uuid.uuid4().hex[:24]}",
+                        "custom_id": request["custom_id"],
+                        "response": {"status_code": 200, "body": asdict(completion)},
+                        "error": None,
+                    },
+                    ensure_ascii=False,
+                )
+            )
+        if outputs:
+            batch.output_file_id = self._files.write("\n".join(outputs) + "\n", "output.jsonl", "batch_output").id
+        if errors:
+            batch.error_file_id = self._files.write("\n".join(errors) + "\n", "errors.jsonl", "batch_output").id
+        batch.status = "completed"
+
+
+class FakeOpenAI:
+    """Drop-in replacement for ``openai.OpenAI`` covering chat and embedding calls."""
+
+    def __init__(
+        self,
+        settings: FakeBackendSettings | None = None,
+        responders: list[tuple[str, Responder]] | None = None,
+    ) -> None:
+        self.settings = settings or FakeBackendSettings()
+        if self.settings.latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(
+                f"Unknown fake latency distribution '{self.settings.latency_distribution}'. "
+                f"Expected one of: {', '.join(LATENCY_DISTRIBUTIONS)}."
+            )
+        self._backend = _FakeBackend(self.settings, responders or DEFAULT_RESPONDERS)
+        self.chat = _FakeChat(self._backend)
+        self.embeddings = _FakeEmbeddings(self._backend)
+        self._files: _FakeFiles | None = None
+        self._batches: _FakeBatches | None = None
+
+    @property
+    def files(self) -> _FakeFiles:
+        if self._files is None:
+            batch_root = Path(self.settings.batch_dir or tempfile.mkdtemp(prefix="thrag-fake-batches-"))
+            self._files = _FakeFiles(self._backend, batch_root)
+        return self._files
+
+    @property
+    def batches(self) -> _FakeBatches:
+        if self._batches is None:
+            self._batches = _FakeBatches(self._backend, self.files.root, self.files, self.chat.completions)
+        return self._batches
+
+    @property
+    def stats(self) -> FakeBackendStats:
+        return self._backend.stats
@@ -0,0 +1,177 @@
+"""Hedged model calls for idempotent TH-RAG requests.
+
+A hedged call starts the request and, if it has not answered after the
+``HEDGE_PERCENTILE`` latency of earlier calls of the same stage, sends an
+identical second request and returns whichever answer arrives first. Only
+requests where either answer is acceptable, such as topic and subtopic selection
+and embeddings, should be hedged. Hedges are capped at
+``HEDGE_MAX_RATE`` of a stage's calls so that a backend that is slow across the
+board is not sent twice the load.
+
+Calls, hedges, hedge wins, and the latency with and without hedging are
+recorded on the active trace, so trace summaries report the hedge rate and the
+p99 improvement per stage.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, TypeVar
+
+from config import THRAGConfig, get_config
+from utils.tracing import Trace, current_trace, percentile
+
+T = TypeVar("T")
+
+# Latencies of earlier calls that define a stage's hedge delay.
+_LATENCY_WINDOW = 1000
+
+
+class Hedger:
+    """Per-stage latency tracking and hedged execution of model calls."""
+
+    def __init__(
+        self,
+        hedge_percentile: float = 95.0,
+        min_samples: int = 20,
+        max_rate: float = 0.1,
+        max_workers: int = 64,
+    ) -> None:
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = max(1, min_samples)
+        self.max_rate = max_rate
+        self.stats: dict[str, dict[str, int]] = {}
+        self._latencies: dict[str, deque[float]] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="thrag-hedge")
+
+    def delay(self, stage: str) -> float | None:
+        """Seconds to wait before hedging a call of ``stage``, or None to not hedge."""
+
+        with self._lock:
+            latencies = list(self._latencies.get(stage, ()))
+        if self.hedge_percentile <= 0 or len(latencies) < self.min_samples:
+            return None
+        return percentile(latencies, self.hedge_percentile)
+
+    def _observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self._latencies.setdefault(stage, deque(maxlen=_LATENCY_WINDOW)).append(seconds)
+
+    def _count(self, stage: str, key: str) -> None:
+        with self._lock:
+            counters = self.stats.setdefault(stage, {"calls": 0, "hedged": 0, "hedge_wins": 0})
+            counters[key] += 1
+
+    def _may_hedge(self, stage: str) -> bool:
+        with self._lock:
+            counters = self.stats.get(stage, {"calls": 0, "hedged": 0})
+            return counters["hedged"] < self.max_rate * counters["calls"]
+
+    def call(self, stage: str, fn: Callable[[], T], hedge: bool = True) -> T:
+        """Run ``fn`` and, when ``hedge`` is set and it is slow, race a second ``fn``."""
+
+        trace = current_trace()
+        self._count(stage, "calls")
+        delay = self.delay(stage) if hedge else None
+        started = time.perf_counter()
+
+        if delay is None:
+            result = fn()
+            seconds = time.perf_counter() - started
+            self._observe(stage, seconds)
+            self._record(trace, stage, seconds, seconds, hedged=False, won=False)
+            return result
+
+        primary = self._executor.submit(fn)
+        done, _pending = wait([primary], timeout=delay)
+        if done or not self._may_hedge(stage):
+            result = primary.result()
+            seconds = time.perf_counter() - started
+            self._observe(stage, seconds)
+            self._record(trace, stage, seconds, seconds, hedged=False, won=False)
+            return result
+
+        self._count(stage, "hedged")
+        backup = self._executor.submit(fn)
+        pending: set[Future] = {primary, backup}
+        first_error: BaseException | None = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in sorted(done, key=lambda item: item is backup):
+                error = future.exception()
+                if error is not None:
+                    first_error = first_error or error
+                    continue
+
+                seconds = time.perf_counter() - started
+                won = future is backup
+                if won:
+                    self._count(stage, "hedge_wins")
+                    # The unhedged latency is known once the original request returns.
+                    primary.add_done_callback(
+                        lambda _future: self._finish_primary(trace, stage, seconds, time.perf_counter() - started)
+                    )
+                else:
+                    self._observe(stage, seconds)
+                    self._record(trace, stage, seconds, seconds, hedged=True, won=False)
+                return future.result()
+        assert first_error is not None
+        raise first_error
+
+    def _finish_primary(self, trace: Trace | None, stage: str, seconds: float, unhedged_seconds: float) -> None:
+        self._observe(stage, unhedged_seconds)
+        self._record(trace, stage, seconds, unhedged_seconds, hedged=True, won=True)
+
+    @staticmethod
+    def _record(
+        trace: Trace | None,
+        stage: str,
+        seconds: float,
+        unhedged_seconds: float,
+        *,
+        hedged: bool,
+        won: bool,
+    ) -> None:
+        if trace is not None:
+            trace.add_hedged_call(stage, seconds, unhedged_seconds, hedged=hedged, won=won)
+
+    def report(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            return {
+                stage: {**counters, "hedge_rate": counters["hedged"] / counters["calls"] if counters["calls"] else 0.0}
+                for stage, counters in sorted(self.stats.items())
+            }
+
+
+_HEDGER: Hedger | None = None
+_HEDGER_LOCK = threading.Lock()
+
+
+def get_hedger(config: THRAGConfig | None = None) -> Hedger:
+    """Process-wide hedger, configured from the first config it is requested with."""
+
+    global _HEDGER
+    with _HEDGER_LOCK:
+        if _HEDGER is None:
+            config = config or get_config()
+            _HEDGER = Hedger(
+                hedge_percentile=config.hedge_percentile,
+                min_samples=config.hedge_min_samples,
+                max_rate=config.hedge_max_rate,
+                max_workers=max(32, config.max_workers * 4),
+            )
+        return _HEDGER
+
+
+def model_call(stage: str, fn: Callable[[], T], config: THRAGConfig | None = None) -> T:
+    """Run a model request, hedged when ``stage`` is listed in ``HEDGE_STAGES``."""
+
+    config = config or get_config()
+    if stage not in config.hedge_stages:
+        return fn()
+    return get_hedger(config).call(stage, fn)
+
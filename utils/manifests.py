@@ -0,0 +1,57 @@
+"""Content-hash manifests that record what a pipeline step was built from.
+
+A manifest holds the SHA-256 of every input file of a step together with the
+prompt files and settings it ran with. A step is stale when any of these differ
+from the current ones. Input hashes are reused while a file's size and
+modification time are unchanged, so large unchanged inputs are not re-read.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+from typing import Any, Iterable
+
+from utils.locking import atomic_write_json, read_json
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_entry(path: Path, previous: dict[str, Any] | None = None) -> dict[str, Any]:
+    """Size, modification time, and SHA-256 of ``path``, reusing ``previous`` if the file is unchanged."""
+
+    stat = path.stat()
+    if previous and (previous.get("size"), previous.get("mtime_ns")) == (stat.st_size, stat.st_mtime_ns):
+        return dict(previous)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": file_sha256(path)}
+
+
+def hash_files(paths: Iterable[Path], previous: dict[str, dict[str, Any]] | None = None) -> dict[str, dict[str, Any]]:
+    """Map each existing path to its ``file_entry``; missing paths are left out."""
+
+    previous = previous or {}
+    return {str(path): file_entry(path, previous.get(str(path))) for path in paths if path.is_file()}
+
+
+def changed_files(current: dict[str, dict[str, Any]], recorded: dict[str, dict[str, Any]]) -> list[str]:
+    """Paths that were added, removed, or whose content differs between two ``hash_files`` results."""
+
+    return sorted(
+        path
+        for path in set(current) | set(recorded)
+        if current.get(path, {}).get("sha256") != recorded.get(path, {}).get("sha256")
+    )
+
+
+def load_manifest(path: Path) -> dict[str, Any] | None:
+    return read_json(path)
+
+
+def save_manifest(path: Path, manifest: dict[str, Any]) -> None:
+    atomic_write_json(path, manifest)
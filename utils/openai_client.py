@@ -0,0 +1,55 @@
+"""Client factory that selects the real OpenAI API or the offline fake backend."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from config import THRAGConfig, get_config
+from utils.rate_limit import RateLimitedClient, get_rate_limiter
+
+OPENAI_BACKENDS = ("openai", "fake")
+
+
+def create_client(config: THRAGConfig | None = None, *, api_key: str | None = None) -> Any:
+    """Return a client for ``OPENAI_BACKEND``; ``fake`` needs no key or network.
+
+    When ``OPENAI_REQUESTS_PER_MINUTE`` or ``OPENAI_TOKENS_PER_MINUTE`` is set,
+    the client draws from the rate budget shared by the whole process.
+    """
+
+    config = config or get_config()
+    limiter = get_rate_limiter(config)
+    client = _create_backend_client(config, api_key)
+    return RateLimitedClient(client, limiter) if limiter.enabled else client
+
+
+def _create_backend_client(config: THRAGConfig, api_key: str | None) -> Any:
+    backend = config.openai_backend
+
+    if backend == "fake":
+        from utils.fake_openai import FakeBackendSettings, FakeOpenAI
+
+        return FakeOpenAI(
+            FakeBackendSettings(
+                embedding_dim=config.fake_embed_dim,
+                latency_ms=config.fake_latency_ms,
+                latency_jitter_ms=config.fake_latency_jitter_ms,
+                latency_distribution=config.fake_latency_distribution,
+                error_rate=config.fake_error_rate,
+                seed=config.fake_seed,
+                token_latency_ms=config.fake_token_latency_ms,
+                batch_dir=config.fake_batch_dir,
+                batch_polls=config.fake_batch_polls,
+            )
+        )
+
+    if backend != "openai":
+        raise ValueError(f"Unknown OPENAI_BACKEND '{backend}'. Expected one of: {', '.join(OPENAI_BACKENDS)}.")
+
+    key = api_key or config.openai_api_key
+    if not key:
+        raise ValueError("OPENAI_API_KEY must be configured when OPENAI_BACKEND=openai.")
+
+    from openai import OpenAI
+
+    return OpenAI(api_key=key)
@@ -0,0 +1,246 @@
+"""Opt-in profiling of pipeline steps and on-demand stack dumps.
+
+``profile_step`` runs a block of work under any combination of:
+
+- ``cpu``: ``cProfile`` of the thread that runs the step, saved as a ``.prof``
+  file for ``pstats``/snakeviz plus a text summary sorted by cumulative time.
+- ``sample``: a sampling profiler that records the stacks of every thread at a
+  fixed interval, so work done in thread pools is included. Stacks are written
+  in the folded format read by flamegraph.pl and speedscope.
+- ``memory``: ``tracemalloc`` snapshot at the end of the step, saved as a
+  ``.tracemalloc`` file plus the top allocation sites and the peak.
+- ``timers``: wall-clock, CPU, and peak RSS of the step plus the spans recorded
+  by ``utils.tracing`` while it ran.
+
+Dumps go to ``results/profiles/<dataset>/<step>_<timestamp>.*``. The sampling
+profiler and ``tracemalloc`` see the whole process, so run steps one at a time
+(``--workers 1``) for clean attribution.
+
+``enable_stack_dumps`` makes ``SIGUSR1`` write the stack of every thread to
+``results/profiles/<dataset>/stacks.log`` without stopping the process.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import faulthandler
+import io
+import json
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterator, TextIO
+
+from config import THRAGConfig
+from utils.tracing import trace_query
+
+PROFILE_MODES = ("cpu", "sample", "memory", "timers")
+
+# Lines kept in the text summaries of cProfile and tracemalloc dumps.
+_SUMMARY_LINES = 40
+
+_tracemalloc_users = 0
+_tracemalloc_lock = threading.Lock()
+_stack_dump_handles: dict[str, TextIO] = {}
+
+
+def parse_profile_modes(modes: str | list[str] | None) -> list[str]:
+    """Validate a comma-separated string or list of profile modes."""
+
+    if isinstance(modes, str):
+        modes = modes.split(",")
+    selected = [mode.strip().lower() for mode in modes or [] if mode.strip()]
+    unknown = [mode for mode in selected if mode not in PROFILE_MODES]
+    if unknown:
+        raise ValueError(f"Unknown profile mode(s) {', '.join(unknown)}. Expected any of: {', '.join(PROFILE_MODES)}.")
+    return list(dict.fromkeys(selected))
+
+
+class SamplingProfiler:
+    """Collect the stacks of all threads every ``interval`` seconds from a background thread."""
+
+    def __init__(self, interval: float = 0.01) -> None:
+        self.interval = interval
+        self.samples = 0
+        self.stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="thrag-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    frames.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                frames.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(frames))] += 1
+            self.samples += 1
+
+    def write_folded(self, path: Path) -> None:
+        with path.open("w", encoding="utf-8") as handle:
+            for stack, count in self.stacks.most_common():
+                handle.write(f"{stack} {count}\n")
+
+
+def _start_tracemalloc() -> None:
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+        _tracemalloc_users += 1
+
+
+def _stop_tracemalloc() -> None:
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0:
+            tracemalloc.stop()
+
+
+def peak_rss_bytes() -> int | None:
+    try:
+        import resource
+    except ImportError:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+@contextmanager
+def profile_step(
+    config: THRAGConfig,
+    step_name: str,
+    modes: list[str],
+    sample_interval: float | None = None,
+) -> Iterator[dict[str, Any]]:
+    """Profile the enclosed block with ``modes``; yields a dict that maps each mode to its dump files."""
+
+    modes = parse_profile_modes(modes)
+    dumps: dict[str, Any] = {}
+    if not modes:
+        yield dumps
+        return
+
+    output_dir = config.get_profile_dir()
+    output_dir.mkdir(parents=True, exist_ok=True)
+    stem = output_dir / f"{step_name}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+
+    profiler = cProfile.Profile() if "cpu" in modes else None
+    sampler = SamplingProfiler(sample_interval or config.profile_sample_interval_ms / 1000) if "sample" in modes else None
+    if "memory" in modes:
+        _start_tracemalloc()
+        tracemalloc.reset_peak()
+    trace = None
+    started, cpu_started = time.perf_counter(), time.process_time()
+
+    try:
+        with ExitStack() as stack:
+            trace = (
+                stack.enter_context(trace_query(dataset=config.dataset_name, step=step_name))
+                if "timers" in modes
+                else None
+            )
+            if sampler is not None:
+                sampler.start()
+            if profiler is not None:
+                try:
+                    profiler.enable()
+                except ValueError as exc:
+                    # Python 3.12+ allows one cProfile at a time per process.
+                    print(f"[{config.dataset_name}/{step_name}] CPU profile skipped: {exc}")
+                    profiler = None
+            try:
+                yield dumps
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+                if sampler is not None:
+                    sampler.stop()
+    finally:
+        wall_seconds, cpu_seconds = time.perf_counter() - started, time.process_time() - cpu_started
+        _write_dumps(stem, dumps, profiler, sampler, "memory" in modes)
+        if trace is not None:
+            timers = {
+                "dataset": config.dataset_name,
+                "step": step_name,
+                "wall_seconds": wall_seconds,
+                "cpu_seconds": cpu_seconds,
+                "peak_rss_bytes": peak_rss_bytes(),
+                "trace": trace.to_dict(),
+            }
+            with stem.with_suffix(".timers.json").open("w", encoding="utf-8") as handle:
+                json.dump(timers, handle, indent=2, ensure_ascii=False)
+            dumps["timers"] = [str(stem.with_suffix(".timers.json"))]
+        for files in dumps.values():
+            for path in files:
+                print(f"[{config.dataset_name}/{step_name}] Profile written to {path}")
+
+
+def _write_dumps(
+    stem: Path,
+    dumps: dict[str, Any],
+    profiler: cProfile.Profile | None,
+    sampler: SamplingProfiler | None,
+    memory: bool,
+) -> None:
+    if profiler is not None:
+        profiler.dump_stats(stem.with_suffix(".prof"))
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(_SUMMARY_LINES)
+        stem.with_suffix(".cpu.txt").write_text(summary.getvalue(), encoding="utf-8")
+        dumps["cpu"] = [str(stem.with_suffix(".prof")), str(stem.with_suffix(".cpu.txt"))]
+
+    if sampler is not None:
+        sampler.write_folded(stem.with_suffix(".folded"))
+        dumps["sample"] = [str(stem.with_suffix(".folded"))]
+
+    if memory:
+        snapshot = tracemalloc.take_snapshot()
+        _current, peak = tracemalloc.get_traced_memory()
+        _stop_tracemalloc()
+        snapshot.dump(str(stem.with_suffix(".tracemalloc")))
+        lines = [f"Peak traced memory: {peak / 2**20:.1f} MiB", ""]
+        lines.extend(str(statistic) for statistic in snapshot.statistics("lineno")[:_SUMMARY_LINES])
+        stem.with_suffix(".memory.txt").write_text("\n".join(lines) + "\n", encoding="utf-8")
+        dumps["memory"] = [str(stem.with_suffix(".tracemalloc")), str(stem.with_suffix(".memory.txt"))]
+
+
+def enable_stack_dumps(config: THRAGConfig, label: str | None = None) -> Path | None:
+    """Make ``SIGUSR1`` append the stack of every thread to ``results/profiles/<label>/stacks.log``.
+
+    ``label`` defaults to the config's dataset. Returns the log path, or None
+    where the signal does not exist (Windows) or ``STACK_DUMP_SIGNAL`` is off.
+    """
+
+    if not config.stack_dump_signal or not hasattr(signal, "SIGUSR1"):
+        return None
+    path = config.profiles_dir / (label or config._require_dataset_name()) / "stacks.log"
+    if str(path) not in _stack_dump_handles:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # faulthandler writes to the file descriptor from the signal handler, so it stays open.
+        _stack_dump_handles[str(path)] = path.open("a", encoding="utf-8")
+    faulthandler.register(signal.SIGUSR1, file=_stack_dump_handles[str(path)], all_threads=True, chain=False)
+    print(f"Send SIGUSR1 (kill -USR1 {os.getpid()}) to dump all thread stacks to {path}")
+    return path
@@ -0,0 +1,136 @@
+"""Process-wide request and token budget for OpenAI calls.
+
+Every client from ``create_client`` shares one limiter, so datasets built in
+parallel by ``pipeline.py --dataset a b c`` draw from a single
+``OPENAI_REQUESTS_PER_MINUTE`` / ``OPENAI_TOKENS_PER_MINUTE`` budget instead of
+each assuming it has the whole account limit to itself. Both limits default to
+0, which disables limiting.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any
+
+from config import THRAGConfig
+
+# Characters per token used to estimate the size of a request before sending it.
+_CHARS_PER_TOKEN = 4
+
+
+class RateLimiter:
+    """Token buckets for requests and tokens per minute, refilled continuously."""
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0) -> None:
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.waited_seconds = 0.0
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.requests_per_minute > 0 or self.tokens_per_minute > 0
+
+    def _refill(self, now: float) -> None:
+        minutes = (now - self._updated) / 60
+        self._updated = now
+        if self.requests_per_minute > 0:
+            self._requests = min(self.requests_per_minute, self._requests + minutes * self.requests_per_minute)
+        if self.tokens_per_minute > 0:
+            self._tokens = min(self.tokens_per_minute, self._tokens + minutes * self.tokens_per_minute)
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Block until one request of about ``tokens`` tokens fits the budget; return the seconds waited."""
+
+        if not self.enabled:
+            return 0.0
+        # A request larger than the whole per-minute budget waits for a full bucket.
+        if self.tokens_per_minute > 0:
+            tokens = min(tokens, int(self.tokens_per_minute))
+        started = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                request_short = 1 - self._requests if self.requests_per_minute > 0 else 0.0
+                token_short = tokens - self._tokens if self.tokens_per_minute > 0 else 0.0
+                if request_short <= 0 and token_short <= 0:
+                    if self.requests_per_minute > 0:
+                        self._requests -= 1
+                    if self.tokens_per_minute > 0:
+                        self._tokens -= tokens
+                    waited = now - started
+                    self.waited_seconds += waited
+                    return waited
+                delay = max(
+                    request_short * 60 / self.requests_per_minute if request_short > 0 else 0.0,
+                    token_short * 60 / self.tokens_per_minute if token_short > 0 else 0.0,
+                )
+            time.sleep(delay)
+
+
+def estimate_tokens(request: dict[str, Any]) -> int:
+    """Rough prompt plus completion token count of a chat or embeddings request."""
+
+    if "input" in request:
+        inputs = request["input"]
+        texts = [inputs] if isinstance(inputs, str) else list(inputs)
+        return sum(len(str(text)) for text in texts) // _CHARS_PER_TOKEN + len(texts)
+    prompt = sum(len(str(message.get("content") or "")) for message in request.get("messages", []))
+    return prompt // _CHARS_PER_TOKEN + int(request.get("max_tokens") or 0)
+
+
+class _LimitedEndpoint:
+    def __init__(self, endpoint: Any, limiter: RateLimiter) -> None:
+        self._endpoint = endpoint
+        self._limiter = limiter
+
+    def create(self, **request: Any) -> Any:
+        self._limiter.acquire(estimate_tokens(request))
+        return self._endpoint.create(**request)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._endpoint, name)
+
+
+class _LimitedChat:
+    def __init__(self, chat: Any, limiter: RateLimiter) -> None:
+        self.completions = _LimitedEndpoint(chat.completions, limiter)
+        self._chat = chat
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._chat, name)
+
+
+class RateLimitedClient:
+    """OpenAI client wrapper that takes chat and embedding calls out of a shared budget.
+
+    Other endpoints, such as the Files and Batches APIs, pass through unchanged.
+    """
+
+    def __init__(self, client: Any, limiter: RateLimiter) -> None:
+        self.client = client
+        self.limiter = limiter
+        self.chat = _LimitedChat(client.chat, limiter)
+        self.embeddings = _LimitedEndpoint(client.embeddings, limiter)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.client, name)
+
+
+_limiter: RateLimiter | None = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter(config: THRAGConfig) -> RateLimiter:
+    """The limiter shared by every client in this process, created from the first config that asks."""
+
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(config.openai_requests_per_minute, config.openai_tokens_per_minute)
+        return _limiter
@@ -0,0 +1,321 @@
+"""Lightweight per-query tracing for TH-RAG retrieval and answer generation.
+
+A trace collects wall-clock spans per pipeline stage, token usage reported by
+OpenAI responses, cache lookup counters, and hedged-call statistics. Spans and
+usage are attached to the trace that is active in the current context, so
+instrumented code is a no-op when no trace has been started.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import json
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator
+
+_CURRENT_TRACE: contextvars.ContextVar["Trace | None"] = contextvars.ContextVar("thrag_trace", default=None)
+_CURRENT_STAGE: contextvars.ContextVar[str | None] = contextvars.ContextVar("thrag_stage", default=None)
+
+SUMMARY_PERCENTILES = (50, 95, 99)
+
+
+class Trace:
+    """Stage timings, token usage, and cache counters for a single query."""
+
+    def __init__(self, **metadata: Any) -> None:
+        self.metadata = metadata
+        self.started_at = time.time()
+        self.total_seconds: float | None = None
+        self.error: str | None = None
+        self.spans: list[dict[str, Any]] = []
+        self.usage: dict[str, dict[str, int]] = {}
+        self.cache: dict[str, dict[str, int]] = {}
+        self.metrics: dict[str, float] = {}
+        self.hedging: dict[str, dict[str, Any]] = {}
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add_span(self, stage: str, seconds: float, **attributes: Any) -> None:
+        with self._lock:
+            self.spans.append({"stage": stage, "seconds": seconds, **attributes})
+
+    def add_usage(self, stage: str, prompt_tokens: int, completion_tokens: int) -> None:
+        with self._lock:
+            usage = self.usage.setdefault(stage, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+            usage["calls"] += 1
+            usage["prompt_tokens"] += prompt_tokens
+            usage["completion_tokens"] += completion_tokens
+
+    def add_cache_lookup(self, name: str, hit: bool) -> None:
+        with self._lock:
+            counters = self.cache.setdefault(name, {"hits": 0, "misses": 0})
+            counters["hits" if hit else "misses"] += 1
+
+    def add_hedged_call(self, stage: str, seconds: float, unhedged_seconds: float, *, hedged: bool, won: bool) -> None:
+        """Record a model call that was eligible for hedging.
+
+        ``unhedged_seconds`` is how long the original request took, which differs
+        from ``seconds`` only when the hedge answered first.
+        """
+
+        with self._lock:
+            stats = self.hedging.setdefault(
+                stage, {"calls": 0, "hedged": 0, "hedge_wins": 0, "seconds": [], "unhedged_seconds": []}
+            )
+            stats["calls"] += 1
+            stats["hedged"] += int(hedged)
+            stats["hedge_wins"] += int(won)
+            stats["seconds"].append(seconds)
+            stats["unhedged_seconds"].append(unhedged_seconds)
+
+    def set_metric(self, name: str, value: float) -> None:
+        with self._lock:
+            self.metrics[name] = value
+
+    def finish(self) -> None:
+        if self.total_seconds is None:
+            self.total_seconds = time.perf_counter() - self._started
+
+    def stage_seconds(self, stage: str) -> float:
+        with self._lock:
+            return sum(span["seconds"] for span in self.spans if span["stage"] == stage)
+
+    def to_dict(self) -> dict[str, Any]:
+        with self._lock:
+            record = {
+                **self.metadata,
+                "started_at": self.started_at,
+                "total_seconds": self.total_seconds,
+                "spans": [dict(span) for span in self.spans],
+                "usage": {stage: dict(values) for stage, values in self.usage.items()},
+                "cache": {name: dict(values) for name, values in self.cache.items()},
+            }
+            if self.metrics:
+                record["metrics"] = dict(self.metrics)
+            if self.hedging:
+                record["hedging"] = {
+                    stage: {key: list(value) if isinstance(value, list) else value for key, value in stats.items()}
+                    for stage, stats in self.hedging.items()
+                }
+        if self.error is not None:
+            record["error"] = self.error
+        return record
+
+
+def current_trace() -> Trace | None:
+    return _CURRENT_TRACE.get()
+
+
+@contextmanager
+def activate_trace(trace: Trace) -> Iterator[Trace]:
+    """Make an existing trace current without finishing it on exit.
+
+    Used by streaming code that reports into one trace across several separate
+    blocks of work.
+    """
+
+    token = _CURRENT_TRACE.set(trace)
+    try:
+        yield trace
+    finally:
+        _CURRENT_TRACE.reset(token)
+
+
+@contextmanager
+def trace_query(**metadata: Any) -> Iterator[Trace]:
+    """Start a trace that instrumented code in this context reports into."""
+
+    trace = Trace(**metadata)
+    token = _CURRENT_TRACE.set(trace)
+    try:
+        yield trace
+    except BaseException as exc:
+        trace.error = str(exc)
+        raise
+    finally:
+        trace.finish()
+        _CURRENT_TRACE.reset(token)
+
+
+@contextmanager
+def span(stage: str, **attributes: Any) -> Iterator[None]:
+    """Time a block of work and attribute nested token usage to ``stage``."""
+
+    trace = _CURRENT_TRACE.get()
+    if trace is None:
+        yield
+        return
+
+    token = _CURRENT_STAGE.set(stage)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_span(stage, time.perf_counter() - started, **attributes)
+        _CURRENT_STAGE.reset(token)
+
+
+def record_usage(response: Any, stage: str | None = None) -> None:
+    """Attach the ``usage`` block of an OpenAI response to the active trace."""
+
+    trace = _CURRENT_TRACE.get()
+    if trace is None:
+        return
+
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    prompt_tokens = int(getattr(usage, "prompt_tokens", 0) or 0)
+    completion_tokens = int(getattr(usage, "completion_tokens", 0) or 0)
+    trace.add_usage(stage or _CURRENT_STAGE.get() or "unattributed", prompt_tokens, completion_tokens)
+
+
+def record_cache(name: str, hit: bool) -> None:
+    trace = _CURRENT_TRACE.get()
+    if trace is not None:
+        trace.add_cache_lookup(name, hit)
+
+
+def record_metric(name: str, value: float) -> None:
+    """Store a per-query scalar such as time-to-first-token on the active trace."""
+
+    trace = _CURRENT_TRACE.get()
+    if trace is not None:
+        trace.set_metric(name, value)
+
+
+def submit_in_context(executor: Executor, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+    """Submit work to a pool so that it reports into the caller's trace."""
+
+    context = contextvars.copy_context()
+    return executor.submit(context.run, fn, *args, **kwargs)
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Linear-interpolated percentile of ``values`` for ``q`` in [0, 100]."""
+
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize_values(values: list[float]) -> dict[str, float]:
+    summary: dict[str, float] = {"count": len(values)}
+    for q in SUMMARY_PERCENTILES:
+        summary[f"p{q}"] = percentile(values, q)
+    summary["mean"] = sum(values) / len(values) if values else 0.0
+    return summary
+
+
+def summarize_latencies(values: list[float]) -> dict[str, float]:
+    summary = summarize_values(values)
+    summary["total_seconds"] = sum(values)
+    return summary
+
+
+def summarize_traces(records: Iterable[dict[str, Any]]) -> dict[str, Any]:
+    """Aggregate trace records into per-stage latency, token, and cache statistics."""
+
+    totals: list[float] = []
+    stage_latencies: dict[str, list[float]] = defaultdict(list)
+    stage_usage: dict[str, dict[str, int]] = defaultdict(
+        lambda: {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+    )
+    cache: dict[str, dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0})
+    metrics: dict[str, list[float]] = defaultdict(list)
+    hedging: dict[str, dict[str, Any]] = defaultdict(
+        lambda: {"calls": 0, "hedged": 0, "hedge_wins": 0, "seconds": [], "unhedged_seconds": []}
+    )
+    errors = 0
+    query_count = 0
+
+    for record in records:
+        query_count += 1
+        if record.get("error"):
+            errors += 1
+        if record.get("total_seconds") is not None:
+            totals.append(float(record["total_seconds"]))
+        for item in record.get("spans", []):
+            stage_latencies[item["stage"]].append(float(item["seconds"]))
+        for stage, usage in record.get("usage", {}).items():
+            for key in ("calls", "prompt_tokens", "completion_tokens"):
+                stage_usage[stage][key] += int(usage.get(key, 0))
+        for name, counters in record.get("cache", {}).items():
+            cache[name]["hits"] += int(counters.get("hits", 0))
+            cache[name]["misses"] += int(counters.get("misses", 0))
+        for name, value in record.get("metrics", {}).items():
+            metrics[name].append(float(value))
+        for stage, stats in record.get("hedging", {}).items():
+            for key in ("calls", "hedged", "hedge_wins"):
+                hedging[stage][key] += int(stats.get(key, 0))
+            hedging[stage]["seconds"].extend(float(value) for value in stats.get("seconds", []))
+            hedging[stage]["unhedged_seconds"].extend(float(value) for value in stats.get("unhedged_seconds", []))
+
+    stages: dict[str, dict[str, Any]] = {}
+    for stage in sorted(set(stage_latencies) | set(stage_usage)):
+        stages[stage] = {
+            "latency": summarize_latencies(stage_latencies.get(stage, [])),
+            "tokens": dict(stage_usage[stage]),
+        }
+
+    cache_summary = {
+        name: {
+            **counters,
+            "hit_rate": counters["hits"] / (counters["hits"] + counters["misses"])
+            if counters["hits"] + counters["misses"]
+            else 0.0,
+        }
+        for name, counters in sorted(cache.items())
+    }
+
+    return {
+        "queries": query_count,
+        "errors": errors,
+        "total": summarize_latencies(totals),
+        "stages": stages,
+        "tokens": {
+            "prompt_tokens": sum(usage["prompt_tokens"] for usage in stage_usage.values()),
+            "completion_tokens": sum(usage["completion_tokens"] for usage in stage_usage.values()),
+        },
+        "cache": cache_summary,
+        "metrics": {name: summarize_values(values) for name, values in sorted(metrics.items())},
+        "hedging": {stage: summarize_hedging(stats) for stage, stats in sorted(hedging.items())},
+    }
+
+
+def summarize_hedging(stats: dict[str, Any]) -> dict[str, float]:
+    """Hedge rate and the p99 latency with and without hedging for one stage."""
+
+    p99 = percentile(stats["seconds"], 99)
+    unhedged_p99 = percentile(stats["unhedged_seconds"], 99)
+    return {
+        "calls": stats["calls"],
+        "hedged": stats["hedged"],
+        "hedge_wins": stats["hedge_wins"],
+        "hedge_rate": stats["hedged"] / stats["calls"] if stats["calls"] else 0.0,
+        "p99_seconds": p99,
+        "unhedged_p99_seconds": unhedged_p99,
+        "p99_improvement_seconds": unhedged_p99 - p99,
+    }
+
+
+def write_trace_records(path: Path, records: Iterable[dict[str, Any]]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as handle:
+        for record in records:
+            handle.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def write_trace_summary(path: Path, summary: dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as handle:
+        json.dump(summary, handle, indent=2, ensure_ascii=False)